@@ -0,0 +1,391 @@
+import time
+import numpy as np
+from typing import Optional, Tuple
+
+import agents.common as cm
+from agents.common import column_heights, make_move
+from agents.bitboard import BitBoard, ROWS, COLS
+from agents.agent_mcts.rollout import rollout_kernel, rollout_leaves, rngState
+from agents.agent_mcts.state import MCTSState
+
+# Array-backed MCTS: the tree is stored in preallocated numpy arrays, one entry
+# per node, and nodes refer to each other by index. The children of a node are
+# allocated together when it is expanded, so they occupy the consecutive
+# indices firstChild[node] ... firstChild[node] + numChildren[node] - 1.
+# Nodes do not store positions: the position of a node is rebuilt on a single
+# BitBoard copy while walking down from the root (and on a board copy, for the
+# compiled rollouts).
+#
+# wins[node] counts the simulations won by the player who made the move into
+# the node (a draw counts one half).
+#
+# Between moves the tree is kept (in an MCTSState) and re-rooted at the
+# grandchild reached by the agent's move and the opponent's reply: its subtree
+# is moved to the front of the arrays and the rest of the tree is dropped.
+
+NOT_TERMINAL: int = 0
+TERMINAL_WIN: int = 1 #the move into the node won the game
+TERMINAL_DRAW: int = 2 #the move into the node filled the board
+
+
+class ArrayTree:
+    '''
+    MCTS search tree of fixed capacity
+    :param capacity: the maximal number of nodes, once they are used up leaves are not expanded anymore
+    :param exploration: the exploration parameter of UCB1
+    '''
+
+    def __init__(self, capacity: int = 2**18, exploration: float = np.sqrt(2)):
+
+        self.capacity = capacity
+        self.exploration = exploration
+
+        self.visits = np.zeros(capacity, dtype=np.int32)
+        self.wins = np.zeros(capacity, dtype=np.float32)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.firstChild = np.full(capacity, -1, dtype=np.int32)
+        self.numChildren = np.zeros(capacity, dtype=np.int8)
+        self.move = np.full(capacity, -1, dtype=np.int8)
+        self.terminal = np.zeros(capacity, dtype=np.int8)
+        self.keys = np.zeros(capacity, dtype=np.uint64) #BitBoard.key() of the node's position
+
+        self.size = 0
+        self.position = BitBoard()
+        self.board = cm.initialize_game_state()
+        self.heights = [0] * COLS
+        self.player = cm.PLAYER1
+
+    @staticmethod
+    def node_bytes() -> int:
+        '''
+        Returns the memory used per node
+        '''
+        return sum(np.dtype(dtype).itemsize for dtype in
+                   (np.int32, np.float32, np.int32, np.int32, np.int8, np.int8, np.int8, np.uint64))
+
+    def set_root(self, board: np.ndarray, player: cm.BoardPiece) -> 'ArrayTree':
+        '''
+        Empties the tree and sets the position at the root
+        :param board: the board at the root
+        :param player: the player to move at the root
+        '''
+        self.position = BitBoard.from_board(board)
+        self.board, self.heights = board.copy(), column_heights(board)
+        self.player = player
+        self.size = 0
+        self.new_nodes(-1, 1)
+        self.keys[0] = self.position.key()
+
+        return self
+
+    def new_nodes(self, parent: int, n: int) -> int:
+        '''
+        Allocates n consecutive nodes
+        :return: the index of the first node
+        '''
+        first = self.size
+        nodes = slice(first, first + n)
+
+        self.visits[nodes] = 0
+        self.wins[nodes] = 0
+        self.parent[nodes] = parent
+        self.firstChild[nodes] = -1
+        self.numChildren[nodes] = 0
+        self.move[nodes] = -1
+        self.terminal[nodes] = NOT_TERMINAL
+        self.size += n
+
+        return first
+
+    def children(self, node: int) -> range:
+        first = self.firstChild[node]
+        return range(first, first + self.numChildren[node])
+
+    def expand(self, node: int, position: BitBoard, player: cm.BoardPiece) -> bool:
+        '''
+        Adds all children of a node
+        :param node: the node, position must be its position
+        :param position: the position of the node
+        :param player: the player to move at the node
+        :return: False if the tree is full (or there are no moves)
+        '''
+        moves = position.legal_moves()
+        if not moves or self.size + len(moves) > self.capacity:
+            return False
+
+        first = self.new_nodes(node, len(moves))
+        self.firstChild[node], self.numChildren[node] = first, len(moves)
+
+        for child, move in enumerate(moves, first):
+            position.play(move, player)
+            self.move[child] = move
+            self.keys[child] = position.key()
+            if position.connected_four(player):
+                self.terminal[child] = TERMINAL_WIN
+            elif position.nMoves == ROWS * COLS:
+                self.terminal[child] = TERMINAL_DRAW
+            position.undo(move)
+
+        return True
+
+    def select_child(self, node: int) -> int:
+        '''
+        Selects the child with the highest upper confidence bound (UCB1), unvisited children first
+        '''
+        first = self.firstChild[node]
+        visits = self.visits[first:first + self.numChildren[node]]
+
+        unvisited = np.flatnonzero(visits == 0)
+        if len(unvisited):
+            return first + int(np.random.choice(unvisited))
+
+        wins = self.wins[first:first + self.numChildren[node]]
+        ucb = wins / visits + self.exploration * np.sqrt(np.log(self.visits[node]) / visits)
+        return first + int(ucb.argmax())
+
+    def backpropagate(self, node: int, mover: cm.BoardPiece, winner: cm.BoardPiece):
+        '''
+        Adds the result of a simulation to a node and all its ancestors
+        :param node: the node the simulation started from
+        :param mover: the player who made the move into node
+        :param winner: the winner of the simulation (noPlayer for a draw)
+        '''
+        while node >= 0:
+            self.visits[node] += 1
+            if winner == mover:
+                self.wins[node] += 1
+            elif winner == cm.noPlayer:
+                self.wins[node] += .5
+
+            node = self.parent[node]
+            mover = mover % 2 + 1
+
+    def add_visits(self, node: int, n: int):
+        '''
+        Adds n visits without wins to a node and all its ancestors: a virtual loss
+        for every player on the path (removed again with n = -1)
+        '''
+        while node >= 0:
+            self.visits[node] += n
+            node = self.parent[node]
+
+    def select_leaf(self) -> Tuple[int, np.ndarray, cm.BoardPiece]:
+        '''
+        Runs the selection and the expansion
+        :return: the node to simulate from, its board and the player to move
+        '''
+        position = self.position.copy()
+        board, heights = self.board.copy(), list(self.heights)
+        player = self.player
+        node = 0
+
+        #Phase 1: Selection
+        while self.numChildren[node] > 0:
+            node = self.select_child(node)
+            position.play(self.move[node], player)
+            make_move(board, heights, self.move[node], player)
+            player = player % 2 + 1
+
+        #Phase 2: Expansion (of leaves that have been simulated before)
+        if self.terminal[node] == NOT_TERMINAL and (self.visits[node] > 0 or node == 0) \
+                and self.expand(node, position, player):
+            node = self.select_child(node)
+            position.play(self.move[node], player)
+            make_move(board, heights, self.move[node], player)
+            player = player % 2 + 1
+
+        return node, board, player
+
+    def iterate(self):
+        '''
+        Runs one iteration: selection, expansion, simulation and backpropagation
+        '''
+        node, board, player = self.select_leaf()
+
+        #Phase 3: Simulation
+        mover = player % 2 + 1
+        if self.terminal[node] == TERMINAL_WIN:
+            winner = mover
+        elif self.terminal[node] == TERMINAL_DRAW:
+            winner = cm.noPlayer
+        else:
+            winner = rollout_kernel(board, player, rngState)
+
+        #Phase 4: Backpropagation
+        self.backpropagate(node, mover, winner)
+
+    def iterate_batch(self, batchSize: int, threads: int = 1):
+        '''
+        Runs batchSize iterations with leaf parallelism: the leaves are selected one after the other,
+        each with a virtual loss on its path so that the next selections spread out, and the games
+        from all of them are played concurrently
+        :param batchSize: the number of leaves
+        :param threads: the number of threads for the games
+        '''
+        nodes, boards, players = [], [], []
+        for i in range(batchSize):
+            node, board, player = self.select_leaf()
+            self.add_visits(node, 1)
+            nodes.append(node)
+            boards.append(board)
+            players.append(player)
+
+        nodes, players = np.array(nodes), np.array(players)
+        movers = players % 2 + 1
+        winners = np.where(self.terminal[nodes] == TERMINAL_WIN, movers, cm.noPlayer)
+
+        running = np.flatnonzero(self.terminal[nodes] == NOT_TERMINAL)
+        if len(running):
+            winners[running] = rollout_leaves(np.stack([boards[i] for i in running]), players[running], threads)
+
+        for node, mover, winner in zip(nodes, movers, winners):
+            self.add_visits(node, -1)
+            self.backpropagate(node, mover, winner)
+
+    def search(self, numIters: Optional[int] = None, time_limit: Optional[float] = None,
+               batchSize: int = 1, threads: int = 1) -> 'ArrayTree':
+        '''
+        Runs iterations until one of the budgets runs out
+        :param numIters: the number of iterations (no limit if None)
+        :param time_limit: the time budget in ms (no limit if None)
+        :param batchSize: the number of leaves per batch, leaf parallelism if > 1 (cf. iterate_batch)
+        :param threads: the number of threads for the games of a batch
+        '''
+        if numIters is None and time_limit is None:
+            raise ValueError("MCTS needs a budget: numIters or time_limit")
+
+        deadline = None if time_limit is None else time.perf_counter() + time_limit / 1000
+        i = 0
+
+        while (numIters is None or i < numIters) and (deadline is None or time.perf_counter() < deadline):
+            if batchSize > 1:
+                n = batchSize if numIters is None else min(batchSize, numIters - i)
+                self.iterate_batch(n, threads)
+            else:
+                n = 1
+                self.iterate()
+            i += n
+
+        return self
+
+    def reroot(self, node: int) -> 'ArrayTree':
+        '''
+        Makes a node the root, keeping the statistics of its subtree and dropping the rest of the tree
+        :param node: the new root
+        '''
+        #The position of the new root:
+        path, ancestor = [], node
+        while ancestor > 0:
+            path.append(self.move[ancestor])
+            ancestor = self.parent[ancestor]
+
+        for move in reversed(path):
+            self.position.play(move, self.player)
+            make_move(self.board, self.heights, move, self.player)
+            self.player = self.player % 2 + 1
+
+        #Mark the subtree, one level per pass (children have larger indices than their parents):
+        n = self.size
+        parent = self.parent[node:n]
+        keep = np.zeros(n, dtype=bool)
+        keep[node] = True
+        while True:
+            grown = keep[node:] | (parent >= 0) & keep[np.maximum(parent, 0)]
+            if np.array_equal(grown, keep[node:]):
+                break
+            keep[node:] = grown
+
+        #Move it to the front, in order, so the children of a node stay consecutive:
+        kept = np.flatnonzero(keep)
+        index = np.cumsum(keep) - 1
+        m = len(kept)
+        parents, firstChildren = self.parent[kept], self.firstChild[kept]
+
+        for array in (self.visits, self.wins, self.numChildren, self.move, self.terminal, self.keys):
+            array[:m] = array[kept]
+        self.parent[:m] = np.where(parents >= 0, index[parents], -1)
+        self.firstChild[:m] = np.where(firstChildren >= 0, index[firstChildren], -1)
+        self.parent[0], self.move[0] = -1, -1
+        self.size = m
+
+        return self
+
+    def advance(self, board: np.ndarray, player: cm.BoardPiece) -> bool:
+        '''
+        Re-roots the tree at the grandchild of the root with a given position, e.g.
+        after the agent's move and the opponent's reply
+        :param board: the board of the position
+        :param player: the player to move in the position
+        :return: False if the position is not in the tree (the tree is unchanged then)
+        '''
+        if self.size == 0 or player != self.player:
+            return False
+
+        key = BitBoard.from_board(board).key()
+        for child in self.children(0):
+            for grandchild in self.children(child):
+                if self.keys[grandchild] == key:
+                    self.reroot(grandchild)
+                    return True
+
+        return False
+
+    def root_stats(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        '''
+        Returns the moves, visits and wins of the children of the root
+        '''
+        nodes = self.children(0)
+        return self.move[nodes].copy(), self.visits[nodes].copy(), self.wins[nodes].copy()
+
+    def best_move(self) -> cm.PlayerAction:
+        '''
+        Returns the most visited move at the root
+        '''
+        moves, visits, _ = self.root_stats()
+        return cm.PlayerAction(moves[visits.argmax()])
+
+
+LEAF_BATCH: int = 8 #leaves per batch and thread of leaf-parallel MCTS
+
+
+def generate_move_array(board: np.ndarray, player: cm.BoardPiece, saved_state: Optional[cm.SavedState],
+                        numIters: Optional[int] = 1000, time_limit: Optional[float] = None,
+                        workers: int = 1, parallel: str = 'root'
+) -> Tuple[cm.PlayerAction, Optional[cm.SavedState]]:
+    '''
+    Generates a move with the array-backed MCTS
+    :param board: the board
+    :param player: the player to move
+    :param saved_state: the MCTSState of the last move, its tree is reused if it contains the position
+    :param numIters: the number of simulations (no limit if None)
+    :param time_limit: the time budget in ms (no limit if None)
+    :param workers: the number of processes (root parallelism) or threads (leaf parallelism)
+    :param parallel: how the workers share the search if workers > 1: 'root': independent trees in worker
+    processes, merged at the root (cf. parallel.py; numIters is the budget of every tree and saved_state
+    is passed on unused), 'leaf': one tree, batches of leaves are simulated concurrently (cf. ArrayTree.iterate_batch)
+    :return: the most visited move and the MCTSState holding the tree
+    '''
+    if parallel not in ('root', 'leaf'):
+        raise ValueError("Unknown parallel mode: {}".format(parallel))
+
+    if workers > 1 and parallel == 'root':
+        from agents.agent_mcts.parallel import rootParallelSearch
+        moves, visits, _ = rootParallelSearch(board, player, numIters, time_limit, workers)
+        return cm.PlayerAction(moves[visits.argmax()]), saved_state
+
+    tree = saved_state.tree if isinstance(saved_state, MCTSState) and isinstance(saved_state.tree, ArrayTree) \
+        else ArrayTree()
+    reused = tree.advance(board, player)
+    if not reused:
+        tree.set_root(board, player)
+    reusedVisits = int(tree.visits[0])
+
+    batchSize = LEAF_BATCH * workers if workers > 1 else 1
+    tree.search(numIters, time_limit, batchSize, workers)
+    if tree.numChildren[0] == 0: #no iteration within the budget
+        tree.iterate()
+
+    cm.emit('mcts_search', engine='array', iterations=int(tree.visits[0]) - reusedVisits,
+            visits=int(tree.visits[0]), nodes=tree.size, reused=reused)
+
+    return tree.best_move(), MCTSState(tree)
@@ -1,21 +1,63 @@
 import numpy as np
 import agents.common as cm
 from agents.agent_mcts.node import Node
-from agents.agent_mcts.state import State
+from agents.agent_mcts.state import State, MCTSState
 from typing import Tuple, Optional
 
+NUM_ITERS: int = 10 #the budget if neither numIters nor time_limit is given
+
 def generate_move(board: np.ndarray,
                        player: cm.BoardPiece,
-                       saved_state: Optional[cm.SavedState]
+                       saved_state: Optional[cm.SavedState],
+                       numIters: Optional[int] = None,
+                       engine: str = 'node',
+                       time_limit: Optional[float] = None,
+                       workers: int = 1,
+                       parallel: str = 'root'
     ) -> Tuple[cm.PlayerAction, Optional[cm.SavedState]]:
+        '''
+        Generates a move with Monte Carlo Tree Search
+        The tree is returned in an MCTSState: passed back in with the next move, the search
+        continues from the node of the new position (after the opponent's reply) and keeps its statistics
+        :param board: the board
+        :param player: the player to move
+        :param saved_state: the saved state of the agent
+        :param numIters: the number of simulations (no limit if None and time_limit is given)
+        :param engine: the tree implementation, 'node': a tree of Node objects (node.py),
+        'array': a tree in preallocated arrays (array_tree.py)
+        :param time_limit: the time budget in ms, the search stops at whichever budget runs out first
+        :param workers: the number of workers, more than one needs the 'array' engine
+        :param parallel: 'root': independent trees in worker processes, merged at the root,
+        'leaf': one tree, batches of leaves are simulated concurrently on threads (cf. generate_move_array)
+        :return: an action and the MCTSState
+        '''
+        if numIters is None and time_limit is None:
+            numIters = NUM_ITERS
+
+        if engine == 'array':
+            from agents.agent_mcts.array_tree import generate_move_array
+            return generate_move_array(board, player, saved_state, numIters, time_limit, workers, parallel)
+
+        elif engine != 'node':
+            raise ValueError("Unknown MCTS engine: {}".format(engine))
 
-        gamestate = cm.check_end_state(board, player)
-        current_state = State(board, player, gamestate, None)
-        root = Node.make_root(current_state)
-        cm.pretty_print_board(root.state.board)
-        bestmove, _ = Node.mcts(root)
+        elif workers > 1:
+            raise ValueError("Parallel MCTS needs the 'array' engine")
 
-        return bestmove, saved_state
+        root = None
+        if isinstance(saved_state, MCTSState) and isinstance(saved_state.tree, Node):
+            root = saved_state.tree.find_grandchild(board, player)
+        reused = root is not None
 
+        if root is None:
+            gamestate = cm.check_end_state(board, player)
+            current_state = State(board.copy(), player, gamestate, None)
+            root = Node.make_root(current_state)
+        else:
+            root.set_parent(None)
 
+        cm.emit('mcts_root', engine='node', board=root.state.board, player=player, reused=reused,
+                visits=root.node_reached)
+        bestmove, _ = Node.mcts(root, numIters, time_limit)
 
+        return bestmove, MCTSState(root)
@@ -1,8 +1,9 @@
+import time
 import numpy as np
 import agents.common as cm
 from agents.agent_mcts.state import State
-from typing import List, Union, Tuple
-import copy as copy
+from agents.agent_mcts.rollout import rollout
+from typing import List, Union, Tuple, Optional
 
 
 class Node:
@@ -33,7 +34,7 @@ class Node:
         self.parent = parent
         self.node_reached = node_reached
         self.node_won = node_won
-        self.last_node = last_node,
+        self.last_node = last_node
         self.move = move
 
     #Getter and setter methods for class attributes:
@@ -128,6 +129,20 @@ class Node:
         root.set_last_node(root)
         return root
 
+    def find_grandchild(self, board: np.ndarray, player: cm.BoardPiece) -> Optional['Node']:
+        '''
+        Finds the node two moves below the root with a given position, e.g. after
+        the agent's move and the opponent's reply
+        :param board: the board of the position
+        :param player: the player to move in the position
+        :return: the grandchild, None if it has not been expanded
+        '''
+        for child in self.children:
+            for grandchild in child.children:
+                if grandchild.state.player == player and np.array_equal(grandchild.state.board, board):
+                    return grandchild
+        return None
+
     def depth(self) -> int:
         '''
         Returns depth of a tree
@@ -183,6 +198,12 @@ class Node:
 
         expanded_node = None
 
+        # The game is over: simulate from the node itself
+        if self.state.gamestate != cm.GameState.STILL_PLAYING:
+            self.increment_node_reached()
+            self.set_last_node(self)
+            return self, self
+
         possible_moves, *_ = np.where(self.state.board[5] == cm.noPlayer)
         lastMoves = np.array([child.state.lastMove for child in self.children])
         unexpanded_nodes = np.array([move for move in possible_moves if move not in lastMoves])
@@ -192,8 +213,8 @@ class Node:
             self.increment_node_reached()
             # Expand random child
             move = np.random.choice(unexpanded_nodes)  # Phase 1: Selection
-            new_state = copy.deepcopy(self.state.perform_move(move))
-            expanded_node = Node(new_state, [], self, 1, 0, None, move)  # node_reached == 1, node_won == 0
+            new_state = self.state.copy().perform_move(move).update_gamestate() #the only copy per expansion
+            expanded_node = Node(new_state, [], self, 1, 0, move, None)  # node_reached == 1, node_won == 0
             self.children.append(expanded_node)  # Phase 2: Expansion
             self.set_last_node(expanded_node)
             return self, expanded_node
@@ -204,11 +225,7 @@ class Node:
             self.increment_node_reached()
             children_ucb = np.array([child.ucb() for child in self.children])
             expand_child = children_ucb.argmax()  # select child with best score
-            last_move_parent = self.get_child(expand_child).state.lastMove
-            selected_child = copy.deepcopy(self.get_child(expand_child))
-            return selected_child.select_and_expand() # recursive call to subtree := expand by one
-            #self.set_child(expand_child, selected_child)  # append to tree
-            #selected_child.set_state(selected_child.state.set_lastMove(last_move_parent))
+            return self.get_child(expand_child).select_and_expand() # recursive call to subtree := expand by one
 
 
     def simulate_and_propagate(self, last_node: 'Node') -> 'Node':
@@ -222,24 +239,16 @@ class Node:
 
         #Phase 3: Simulate
 
-        current_state = copy.deepcopy(last_node.state)
-        #print('current_state: ', current_state.gamestate)
-
-        #Check for terminal state
-        while current_state.gamestate == cm.GameState.STILL_PLAYING:
-
-                #cm.pretty_print_board(current_state.board)
-                possible_moves, *_ = np.where(current_state.board[5] == cm.noPlayer)
-                move = np.random.choice(possible_moves) #Pick random move
-                current_state.perform_move(move) #Perform move
-                current_state.update_gamestate()
-                #print('current_state: ', current_state.gamestate, current_state.player)
-                #cm.pretty_print_board(current_state.board)
+        current_state = last_node.state.update_gamestate() #the expanding move may already have ended the game
+        outcome, loosing_player = current_state.get_gamestate(), current_state.get_player()
 
-        #cm.pretty_print_board(current_state.board)
+        #Random game in compiled code, on a copy of the board (cf. rollout.py)
+        if outcome == cm.GameState.STILL_PLAYING:
+            winner = rollout(current_state.board, current_state.player)
+            outcome = cm.GameState.IS_DRAW if winner == cm.noPlayer else cm.GameState.IS_LOSS
+            loosing_player = winner % 2 + 1
 
         #Phase 4: Backpropagation:
-        outcome, loosing_player = current_state.get_gamestate(), current_state.get_player()
         #print(outcome)
         #print(current_state.player)
 
@@ -249,7 +258,8 @@ class Node:
             while current_node is not None:
                 #print(current_node.state.player)
 
-                if current_node.state.get_player() != loosing_player: #player is winning player
+                #The player to move at the node lost: the move into the node won
+                if current_node.state.get_player() == loosing_player:
                     current_node.increment_node_won()
                     current_node = current_node.get_parent()
                 else:
@@ -262,22 +272,35 @@ class Node:
         return self
 
 
-    def mcts(self, numIters: int=10):
+    def mcts(self, numIters: Optional[int]=10, time_limit: Optional[float]=None):
         '''
         Sucessively expands the game tree to get an estimate of value function
-        :param numIters: number of node to expand
+        :param numIters: number of node to expand (no limit if None)
+        :param time_limit: the time budget in ms (no limit if None), the search stops at whichever budget runs out first
         :return:
         '''
 
         #current_tree = self
         #current_tree = current_tree.simulate_and_propagate() #Simulation for root node
 
-        for i in range(numIters):
+        if numIters is None and time_limit is None:
+            raise ValueError("MCTS needs a budget: numIters or time_limit")
+
+        deadline = None if time_limit is None else time.perf_counter() + time_limit / 1000
+        i = 0
+
+        while (numIters is None or i < numIters) and (deadline is None or time.perf_counter() < deadline):
 
             _, last_node = self.select_and_expand()
             self.simulate_and_propagate(last_node)
+            i += 1
+
+        cm.emit('mcts_search', engine='node', iterations=i, visits=self.node_reached)
+
+        if len(self.children) == 0: #no iterations: play a random move
+            possible_moves, *_ = np.where(self.state.board[5] == cm.noPlayer)
+            return np.random.choice(possible_moves), self
 
-        print(self.node_reached)
         children_ucb = np.array([child.ucb() for child in self.children])
         moves = np.array([child.state.lastMove for child in self.children])
         bestmove = moves[np.argmax(children_ucb)]
@@ -0,0 +1,95 @@
+import atexit
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from agents.common import BoardPiece, noPlayer
+from agents.agent_mcts import rollout
+from agents.agent_mcts.array_tree import ArrayTree
+
+# Root-parallel MCTS: every worker process grows its own tree from the same
+# position, with its own random seed, and the statistics of the children of
+# the roots are summed up afterwards. The trees never communicate, so the
+# workers only need the position and the budget.
+#
+# The workers are spawned, not forked, like those of agent_minimax/parallel.py:
+# forking after leaf-parallel MCTS has started numba's threads can deadlock.
+
+pool: Optional[ProcessPoolExecutor] = None
+poolWorkers: int = 0
+tree: Optional[ArrayTree] = None #the tree of a worker process, reused between searches
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    '''
+    Returns the worker pool, (re)creating it if the number of workers changed
+    :param workers: the number of worker processes
+    :return: the pool
+    '''
+    global pool, poolWorkers
+
+    if pool is None or poolWorkers != workers:
+        if pool is not None:
+            pool.shutdown(wait=True)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        poolWorkers = workers
+
+    return pool
+
+
+def shutdown_pool():
+    global pool, poolWorkers
+
+    if pool is not None:
+        pool.shutdown(wait=True)
+    pool, poolWorkers = None, 0
+
+atexit.register(shutdown_pool)
+
+
+def searchTree(board: np.ndarray, player: BoardPiece, numIters: Optional[int], time_limit: Optional[float],
+               seed: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Grows a tree in a worker process
+    :param seed: seeds the tree policy and the rollouts of the worker
+    :return: the moves, visits and wins of the children of the root
+    '''
+    global tree
+
+    if tree is None:
+        tree = ArrayTree()
+
+    np.random.seed(seed)
+    rollout.seed(seed)
+    tree.set_root(board, player).search(numIters, time_limit)
+    if tree.numChildren[0] == 0:
+        tree.iterate()
+
+    return tree.root_stats()
+
+
+def rootParallelSearch(board: np.ndarray, player: BoardPiece, numIters: Optional[int], time_limit: Optional[float],
+                       workers: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''
+    Root-parallel MCTS: independent trees in a pool of worker processes
+    :param board: the board
+    :param player: the player to move
+    :param numIters: the number of simulations per tree (no limit if None)
+    :param time_limit: the time budget in ms of every tree (no limit if None)
+    :param workers: the number of worker processes (and trees)
+    :return: the moves at the root with the visits and wins summed over all trees
+    '''
+    seeds = np.random.randint(0, 2**31 - 1, size=workers)
+    futures = [get_pool(workers).submit(searchTree, board, player, numIters, time_limit, int(seed))
+               for seed in seeds]
+
+    moves = np.arange(board.shape[1])
+    visits, wins = np.zeros(len(moves), dtype=np.int64), np.zeros(len(moves))
+    for future in futures:
+        treeMoves, treeVisits, treeWins = future.result()
+        np.add.at(visits, treeMoves, treeVisits)
+        np.add.at(wins, treeMoves, treeWins)
+
+    legal = np.flatnonzero(board[-1] == noPlayer)
+    return moves[legal], visits[legal], wins[legal]
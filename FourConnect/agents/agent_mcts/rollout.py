@@ -0,0 +1,172 @@
+import numba
+import numpy as np
+from numba import njit, prange
+from typing import Optional
+
+from agents.common import BoardPiece, noPlayer
+from agents.connect_four import connected_four_last
+
+# Random playouts for the simulation phase of MCTS, compiled with numba.
+# The random numbers come from a xorshift64* generator whose state is a
+# one-element uint64 array, so a seed gives the same games on every platform
+# and rollouts never touch numpy's global random state.
+
+MULTIPLIER = np.uint64(0x2545F4914F6CDD1D)
+
+
+@njit()
+def seed_state(seed: int) -> np.ndarray:
+    '''
+    Turns a seed into a (non-zero) generator state, with a splitmix64 step
+    '''
+    x = np.uint64(seed) + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    x = x ^ (x >> np.uint64(31))
+
+    state = np.empty(1, dtype=np.uint64)
+    state[0] = x if x != 0 else np.uint64(1)
+    return state
+
+
+@njit()
+def next_random(state: np.ndarray) -> np.uint64:
+    '''
+    Advances the generator (xorshift64*) and returns a random 64-bit number
+    '''
+    x = state[0]
+    x ^= x >> np.uint64(12)
+    x ^= x << np.uint64(25)
+    x ^= x >> np.uint64(27)
+    state[0] = x
+    return x * MULTIPLIER
+
+
+@njit()
+def column_heights_kernel(board: np.ndarray) -> np.ndarray:
+    rows, cols = board.shape
+    heights = np.zeros(cols, dtype=np.int64)
+    for j in range(cols):
+        while heights[j] < rows and board[heights[j], j] != noPlayer:
+            heights[j] += 1
+    return heights
+
+
+@njit()
+def play_out(board: np.ndarray, heights: np.ndarray, player: BoardPiece, state: np.ndarray) -> int:
+    '''
+    Plays random moves until the game ends, in place
+    :param board: the board, nobody may have won on it yet
+    :param heights: the number of pieces per column, updated with the board
+    :param player: the player to move
+    :param state: the generator state
+    :return: the winner, noPlayer for a draw
+    '''
+    rows, cols = board.shape
+    legal = np.empty(cols, dtype=np.int64)
+
+    while True:
+        n = 0
+        for j in range(cols):
+            if heights[j] < rows:
+                legal[n] = j
+                n += 1
+
+        if n == 0:
+            return noPlayer
+
+        action = legal[next_random(state) % np.uint64(n)]
+        board[heights[action], action] = player
+        heights[action] += 1
+
+        if connected_four_last(board, player, action):
+            return player
+
+        player = 3 - player
+
+
+@njit()
+def rollout_kernel(board: np.ndarray, player: BoardPiece, state: np.ndarray) -> int:
+    return play_out(board.copy(), column_heights_kernel(board), player, state)
+
+
+@njit()
+def rollout_batch_kernel(boards: np.ndarray, players: np.ndarray, k: int, state: np.ndarray) -> np.ndarray:
+    n = boards.shape[0]
+    results = np.zeros((n, 3), dtype=np.int64)
+
+    for i in range(n):
+        heights = column_heights_kernel(boards[i])
+        for _ in range(k):
+            winner = play_out(boards[i].copy(), heights.copy(), players[i], state)
+            results[i, winner] += 1
+
+    return results
+
+
+@njit(parallel=True)
+def rollout_leaves_kernel(boards: np.ndarray, players: np.ndarray, states: np.ndarray) -> np.ndarray:
+    n = boards.shape[0]
+    winners = np.empty(n, dtype=np.int64)
+
+    for i in prange(n):
+        winners[i] = play_out(boards[i].copy(), column_heights_kernel(boards[i]), players[i], states[i:i + 1])
+
+    return winners
+
+
+rngState: np.ndarray = seed_state(0) #shared by all rollouts without an explicit seed
+
+
+def seed(value: int):
+    '''
+    Reseeds the generator used by rollouts without an explicit seed
+    '''
+    rngState[:] = seed_state(value)
+
+
+def rollout(board: np.ndarray, player: BoardPiece, seed: Optional[int] = None) -> BoardPiece:
+    '''
+    Plays one random game from a position
+    :param board: the board (not modified), nobody may have won on it yet
+    :param player: the player to move
+    :param seed: seeds a generator for this game only (the shared generator if None)
+    :return: the winner, noPlayer for a draw
+    '''
+    state = rngState if seed is None else seed_state(seed)
+    return BoardPiece(rollout_kernel(board, player, state))
+
+
+def rollout_batch(boards: np.ndarray, players: np.ndarray, k: int, seed: Optional[int] = None) -> np.ndarray:
+    '''
+    Plays k random games from each of several positions (e.g. leaves of the tree)
+    :param boards: the boards, shape (n, rows, cols), not modified
+    :param players: the player to move on each board, shape (n,)
+    :param k: the number of games per board
+    :param seed: seeds a generator for this batch only (the shared generator if None)
+    :return: shape (n, 3): per board the number of draws, of wins of PLAYER1 and of wins of PLAYER2
+    '''
+    state = rngState if seed is None else seed_state(seed)
+    boards = np.ascontiguousarray(boards, dtype=BoardPiece).reshape(-1, *boards.shape[-2:])
+    players = np.ascontiguousarray(players, dtype=BoardPiece).reshape(-1)
+
+    return rollout_batch_kernel(boards, players, k, state)
+
+
+def rollout_leaves(boards: np.ndarray, players: np.ndarray, threads: int = 1) -> np.ndarray:
+    '''
+    Plays one random game from each of several positions concurrently
+    :param boards: the boards, shape (n, rows, cols), not modified
+    :param players: the player to move on each board, shape (n,)
+    :param threads: the number of threads (at most numba's NUMBA_NUM_THREADS)
+    :return: the winner of every game, noPlayer for a draw
+    '''
+    boards = np.ascontiguousarray(boards, dtype=BoardPiece).reshape(-1, *boards.shape[-2:])
+    players = np.ascontiguousarray(players, dtype=BoardPiece).reshape(-1)
+
+    #One generator per game, seeded from the shared generator:
+    states = np.array([next_random(rngState) for i in range(len(boards))], dtype=np.uint64)
+    states[states == 0] = 1
+
+    numba.set_num_threads(max(1, min(threads, numba.config.NUMBA_NUM_THREADS)))
+    return rollout_leaves_kernel(boards, players, states)
@@ -1,6 +1,6 @@
 import numpy as np
 import agents.common as cm
-from typing import Optional
+from typing import Optional, Union
 import copy as copy
 
 class State:
@@ -47,7 +47,7 @@ class State:
         return self
 
     def update_gamestate(self):
-        self.gamestate = cm.check_end_state(self.board, self.player)
+        self.gamestate = cm.check_end_state(self.board, self.player, self.lastMove)
         return self
 
     #Other methods:
@@ -61,6 +61,12 @@ class State:
         '''
         return State(cm.initialize_game_state(), player, cm.GameState.STILL_PLAYING, None)
 
+    def copy(self) -> 'State':
+        '''
+        Copies the state: only the board has to be copied, the other attributes are immutable
+        '''
+        return State(self.board.copy(), self.player, self.gamestate, self.lastMove)
+
     def perform_move(self, move: cm.PlayerAction):
 
         new_board = cm.apply_player_action(self.board, move, self.player)
@@ -71,14 +77,12 @@ class State:
         return self
 
 
+class MCTSState(cm.SavedState):
+    '''
+    Saved state of the MCTS agent: the search tree of its last move, so that the
+    next search can start from the statistics already collected
+    :param tree: the root Node (engine 'node') or the ArrayTree (engine 'array')
+    '''
 
-
-
-
-
-
-
-
-
-
-
+    def __init__(self, tree: Union['Node', 'ArrayTree']):
+        self.tree = tree
@@ -1,167 +1,414 @@
 import numpy as np
+import time
 from collections import OrderedDict
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Callable
 
 
 from agents.common import BoardPiece, GameState, PLAYER1, PLAYER2, noPlayer, SavedState, PlayerAction
-from agents.common import check_end_state, apply_player_action, initialize_game_state, pretty_print_board
-from agents.heuristic import evaluateGame
-from agents.hashing import zobr_myhash_init, hash_board
+from agents.common import check_end_state, apply_player_action, initialize_game_state, emit
+from agents.common import column_heights, make_move, unmake_move
+from agents.heuristic import evaluateGame, evaluateThreats, ThreatCounter
+from agents.hashing import zobr_myhash_init, hash_board, hash_move
+from agents.transposition import TranspositionTable, Bound, NO_MOVE
+from agents.agent_minimax.stats import SearchStats
+from agents.book import OpeningBook, load_book
+from errors.errors import TimeOutError
 
 
 MAX_DEPTH: int = 6
 TIME_THRESHOLD: int = 2000
-timeOut: bool
+timeOut: bool = False
+deadline: float = np.inf #time.perf_counter() value at which a search is aborted
+stopFlag: Optional[np.ndarray] = None #set by another process to abort a search (Lazy SMP)
+completedDepth: int = 0 #depth of the last completed iteration of iterativeDeepingSearch
+stats: Optional[SearchStats] = None #counters of the running search, None: no counting
 
 global htable, transpoTable, transpo_size
 htable = zobr_myhash_init(initialize_game_state())
-transpoTable = OrderedDict()
-transpo_size = 50
+transpo_size = 2**16
+transpoTable = TranspositionTable(transpo_size)
 
+#Leaf evaluation, selected per search (cf. generate_move_alphaBeta):
+HEURISTICS = {'kernel': evaluateGame, 'threat': evaluateThreats}
+heuristic: str = 'kernel'
+evaluate = evaluateGame
+threats: Optional[ThreatCounter] = None #incremental threat counts of the searched board
+
+#Precomputed moves for the opening (cf. agents.book), None if there is no book file:
+openingBook: Optional[OpeningBook] = load_book()
+
+
+
+#Move ordering (cf. orderMoves), reset at the start of every search:
+rootDepth: int = 0 #remaining depth at the root of the running alphaBeta, a node's ply is rootDepth - depth
+killers: dict = {} #ply -> the two last moves that caused a cut-off at that ply
+history: list = [{}, {}] #history[player - 1][move]: cut-offs of move, weighted by depth**2
+pvs: bool = True #principal variation search: null-window searches after the first move
+
+
+def clear_ordering():
+    """
+    Forgets the killer moves and the history of previous searches
+    """
+    global killers, history
+
+    killers = {}
+    history = [{}, {}]
+
+
+def center_order(cols: int) -> list:
+    """
+    Returns the columns from the center outwards
+    """
+    return sorted(range(cols), key=lambda col: abs(2 * col - (cols - 1)))
+
+
+def orderMoves(heights: list, rows: int, depth: int, player: BoardPiece, hashMove: int) -> list:
+    """
+    Orders the legal moves: the best move stored in the transposition table first,
+    then the killer moves of this ply, then by history, then center columns first
+    :param heights: the column heights of the board
+    :param rows: the number of rows of the board
+    :param depth: the remaining depth
+    :param player: the player to move
+    :param hashMove: the move from the transposition table (NO_MOVE if there is none)
+    :return: the legal moves, in the order in which to search them
+    """
+    moves = [move for move in center_order(len(heights)) if heights[move] < rows]
+    killer = killers.get(rootDepth - depth, ())
+    playerHistory = history[player - 1]
+
+    #sorted is stable: moves that tie keep the center-first order
+    return sorted(moves, key=lambda move: (move != hashMove, move not in killer, -playerHistory.get(move, 0)))
+
+
+def storeCutoff(move: PlayerAction, depth: int, player: BoardPiece):
+    """
+    Records a move that caused a cut-off as killer move and in the history
+    """
+    killer = killers.setdefault(rootDepth - depth, [NO_MOVE, NO_MOVE])
+    if killer[0] != move:
+        killer[1], killer[0] = killer[0], move
+
+    history[player - 1][move] = history[player - 1].get(move, 0) + depth * depth
 
 
 def minValue(
         board: np.ndarray,
+        heights: list,
         player: BoardPiece,
         alpha: float,
         beta: float,
         depth: int,
         lastMove: Optional[PlayerAction],
-        movesPlayed: OrderedDict()
+        key: Optional[int] = None
 ) -> float:
         """
-        :param board: The game board
-        :param state: The game state
+        :param board: The game board, moves are made and taken back in place
+        :param heights: The column heights of board (cf. column_heights)
         :param player: The player
         :param alpha: The parameter determining the cutoff for minValue
         :param beta: The parameter determining the cutoff for maxValue
-        :param depth: The depth to which to perform traverse the tree
-        this depth will be iteratively after the tree has been traversed
+        :param depth: The remaining depth to which to traverse the tree,
+        this depth will be incremented after the tree has been traversed
         completely at all shallower depths (iterative deepening search)
+        :param key: The Zobrist hash of board with player to move (computed if not given)
         :return: A Gamestate corresponding to the best outcome for the
         opponent player under optimal play
         """
 
-        state = check_end_state(board, player)
-        tempBoard = board.copy() #somehow this was necessary
+        if time.perf_counter() > deadline or (stopFlag is not None and stopFlag[0]):
+            raise TimeOutError("Search aborted")
 
+        if stats is not None:
+            stats.nodes[-1] += 1
+
+        state = check_end_state(board, player, lastMove)
 
         if state != GameState.STILL_PLAYING:
             return -state.value
 
-        elif depth == MAX_DEPTH:
-            return -evaluateGame(board, player, lastMove)
+        elif depth == 0:
+            return -(threats.score(player) if threats is not None else evaluate(board, player, lastMove))
+
+        #Transposition table: entries are stored from the point of view of the
+        #player to move (the minimizing player here), so scores are negated and
+        #lower/upper bounds are swapped
+        remaining = depth
+        if key is None:
+            key = hash_board(board, player=player)
+        entry = transpoTable.probe(key)
+        hashMove = NO_MOVE
+
+        if stats is not None:
+            stats.ttProbes += 1
+            stats.ttHits += entry is not None
+
+        if entry is not None:
+            ttScore, ttDepth, ttFlag, hashMove = entry
+
+            if ttDepth >= remaining:
+                if ttFlag == Bound.EXACT:
+                    return -ttScore
+                elif ttFlag == Bound.LOWER:
+                    beta = min(beta, -ttScore)
+                else:
+                    alpha = max(alpha, -ttScore)
 
-        else:
-            #Determine the order in which moves are explored
-            #Moves that are played often are explored first
-            sorted(movesPlayed.items(), key=lambda item: item[1])
-            possible_moves = np.array(list(movesPlayed.keys()))
-            possible_moves = possible_moves[board[5] == noPlayer] #top row still empty
-            minScore = np.inf
+                if alpha >= beta:
+                    return -ttScore
 
-            for moveI, move in np.ndenumerate(possible_moves):
+        alphaOrig, betaOrig = alpha, beta
 
-                movesPlayed[lastMove] += 1
+        new_player = player % 2 + 1
+        minScore = np.inf
+        bestMove = NO_MOVE
 
-                new_board = apply_player_action(tempBoard, move, player)
-                tempBoard = board.copy() #resetting tempBoard
-                new_player = player % 2 + 1
-                score = maxValue(new_board, new_player, alpha, beta, depth+1, \
-                                 lastMove=move, movesPlayed=movesPlayed)
+        for i, move in enumerate(orderMoves(heights, board.shape[0], depth, player, hashMove)):
 
-                if score < minScore:
-                    minScore = score
+            row = make_move(board, heights, move, player)
+            if threats is not None:
+                threats.place(row, move, player)
+            childKey = hash_move(key, row, move, player)
 
-                if minScore <= alpha:
-                    return minScore
+            if pvs and bestMove != NO_MOVE:
+                #Null window: only prove that the move is not better than the best one so far
+                score = maxValue(board, heights, new_player, np.nextafter(beta, np.NINF), beta, depth-1, \
+                                 lastMove=move, key=childKey)
+                if alpha < score < beta:
+                    score = maxValue(board, heights, new_player, alpha, beta, depth-1, lastMove=move, key=childKey)
+            else:
+                score = maxValue(board, heights, new_player, alpha, beta, depth-1, lastMove=move, key=childKey)
 
-                #TODO: Random pruning: with small probability, prune anyway
+            unmake_move(board, heights, move)
+            if threats is not None:
+                threats.remove(row, move, player)
 
-                else:
-                    beta = np.min((beta, minScore))
+            if score < minScore:
+                minScore = score
+                bestMove = move
+
+            if minScore <= alpha:
+                storeCutoff(move, depth, player)
+                if stats is not None:
+                    stats.cutoffs += 1
+                    stats.firstCutoffs += i == 0
+                break
+
+            #TODO: Random pruning: with small probability, prune anyway
+
+            else:
+                beta = min(beta, minScore)
+
+        if minScore <= alphaOrig:
+            flag = Bound.LOWER #cutoff: at most minScore for the maximizer
+        elif minScore >= betaOrig:
+            flag = Bound.UPPER
+        else:
+            flag = Bound.EXACT
+        transpoTable.store(key, remaining, -minScore, flag, bestMove)
+        if stats is not None:
+            stats.ttStores += 1
 
         return minScore
 
 
 def maxValue(
         board: np.ndarray,
+        heights: list,
         player: BoardPiece,
         alpha: float,
         beta: float,
         depth: int,
         lastMove: Optional[PlayerAction],
-        movesPlayed: OrderedDict
+        key: Optional[int] = None
 ) -> float:
     """
-    :param board: The game board
-    :param state: The game state
+    :param board: The game board, moves are made and taken back in place
+    :param heights: The column heights of board (cf. column_heights)
     :param player: The player
     :param alpha: The parameter determining the cutoff for minValue
     :param beta: The parameter determining the cutoff for maxValue
-    :param depth: The depth to which to perform traverse the tree
-    this depth will be iteratively after the tree has been traversed
+    :param depth: The remaining depth to which to traverse the tree,
+    this depth will be incremented after the tree has been traversed
     completely at all shallower depths (iterative deepening search)
+    :param key: The Zobrist hash of board with player to move (computed if not given)
     :return: A Gamestate corresponding to the best outcome for the
     opponent player under optimal play
     """
 
-    state = check_end_state(board, player)
-    tempBoard = board.copy()
+    if time.perf_counter() > deadline or (stopFlag is not None and stopFlag[0]):
+        raise TimeOutError("Search aborted")
+
+    if stats is not None:
+        stats.nodes[-1] += 1
+
+    state = check_end_state(board, player, lastMove)
 
     if state != GameState.STILL_PLAYING:
         return state.value
 
-    elif depth == MAX_DEPTH:
-        return evaluateGame(board, player, lastMove)
+    elif depth == 0:
+        return threats.score(player) if threats is not None else evaluate(board, player, lastMove)
 
-    else:
-        sorted(movesPlayed.items(), key=lambda item: item[1])
-        possible_moves = np.array(list(movesPlayed.keys()))
-        possible_moves = possible_moves[board[5] == noPlayer]  # top row still empty
-        maxScore = np.NINF
+    remaining = depth
+    if key is None:
+        key = hash_board(board, player=player)
+    entry = transpoTable.probe(key)
+    hashMove = NO_MOVE
 
-        for moveI, move in np.ndenumerate(possible_moves):
+    if stats is not None:
+        stats.ttProbes += 1
+        stats.ttHits += entry is not None
 
-            movesPlayed[lastMove] += 1
-            lastMove = move
+    if entry is not None:
+        ttScore, ttDepth, ttFlag, hashMove = entry
 
-            new_board = apply_player_action(tempBoard, move, player)
-            tempBoard = board.copy()
-            new_player = player % 2 + 1
-            score = minValue(new_board, new_player, alpha, beta, depth+1, \
-                             lastMove=move, movesPlayed=movesPlayed)
+        if ttDepth >= remaining:
+            if ttFlag == Bound.EXACT:
+                return ttScore
+            elif ttFlag == Bound.LOWER:
+                alpha = max(alpha, ttScore)
+            else:
+                beta = min(beta, ttScore)
 
-            if score > maxScore:
-                maxScore = score
+            if alpha >= beta:
+                return ttScore
 
-            if maxScore >= beta:
-                return maxScore
-            #TODO: Random pruning: with small probability, prune anyway
+    alphaOrig, betaOrig = alpha, beta
 
-            else:
-                alpha = np.max((alpha, maxScore))
+    new_player = player % 2 + 1
+    maxScore = np.NINF
+    bestMove = NO_MOVE
+
+    for i, move in enumerate(orderMoves(heights, board.shape[0], depth, player, hashMove)):
+
+        row = make_move(board, heights, move, player)
+        if threats is not None:
+            threats.place(row, move, player)
+        childKey = hash_move(key, row, move, player)
+
+        if pvs and bestMove != NO_MOVE:
+            #Null window: only prove that the move is not better than the best one so far
+            score = minValue(board, heights, new_player, alpha, np.nextafter(alpha, np.inf), depth-1, \
+                             lastMove=move, key=childKey)
+            if alpha < score < beta:
+                score = minValue(board, heights, new_player, alpha, beta, depth-1, lastMove=move, key=childKey)
+        else:
+            score = minValue(board, heights, new_player, alpha, beta, depth-1, lastMove=move, key=childKey)
+
+        unmake_move(board, heights, move)
+        if threats is not None:
+            threats.remove(row, move, player)
 
-        return maxScore
+        if score > maxScore:
+            maxScore = score
+            bestMove = move
 
+        if maxScore >= beta:
+            storeCutoff(move, depth, player)
+            if stats is not None:
+                stats.cutoffs += 1
+                stats.firstCutoffs += i == 0
+            break
+        #TODO: Random pruning: with small probability, prune anyway
+
+        else:
+            alpha = max(alpha, maxScore)
+
+    if maxScore >= betaOrig:
+        flag = Bound.LOWER #cutoff: at least maxScore
+    elif maxScore <= alphaOrig:
+        flag = Bound.UPPER
+    else:
+        flag = Bound.EXACT
+    transpoTable.store(key, remaining, maxScore, flag, bestMove)
+    if stats is not None:
+        stats.ttStores += 1
+
+    return maxScore
 
-def alphaBeta(board: np.ndarray, player: BoardPiece, depth: int, lastMove: Optional[PlayerAction]
+
+def alphaBeta(board: np.ndarray, player: BoardPiece, depth: int, lastMove: Optional[PlayerAction],
+              heights: Optional[list] = None, key: Optional[int] = None
 ) -> float:
     """
     Applies alphaBeta pruning to the minimax search from above
-    :param board: the board
+    :param board: the board, it is searched in place and restored afterwards
     :param player: the player
+    :param heights: the column heights of board (computed if not given)
+    :param key: the Zobrist hash of board with player to move (computed if not given)
     :return: the score
     """
-    #Passes OrderedDict with moves that have been played for ordering search tree
-    movesPlayed = OrderedDict([(i,0) for i in np.arange(7)])
+    global rootDepth
+
+    if heights is None:
+        heights = column_heights(board)
+
+    if key is None:
+        key = hash_board(board, player=player)
+
+    #Killers are stored per ply: the same ply in every iteration, with the same player to move
+    rootDepth = depth
+
     #Call minValue for the current player: minValue because alphaBeta
     #will be called in the iterativeDeepning search for the minimizing player
-    result = minValue(board, player, alpha=np.NINF, beta=np.inf, depth=depth,\
-                      lastMove=lastMove, movesPlayed=movesPlayed)
+    result = minValue(board, heights, player, alpha=np.NINF, beta=np.inf, depth=depth,\
+                      lastMove=lastMove, key=key)
     return result
 
-def iterativeDeepingSearch(board: np.ndarray, player: BoardPiece
+def set_heuristic(heuristic_name: str, board: Optional[np.ndarray] = None, clear: bool = True):
+    """
+    Selects the leaf evaluation for the following searches
+    :param heuristic_name: one of HEURISTICS
+    :param board: the board that is going to be searched (for the incremental threat counts)
+    :param clear: clear the transposition table if the heuristic changes
+    (shared tables are cleared by their owner instead)
+    """
+    global heuristic, evaluate, threats
+
+    if heuristic_name not in HEURISTICS:
+        raise ValueError("Unknown heuristic: {}".format(heuristic_name))
+
+    #Stored scores depend on the heuristic:
+    if heuristic_name != heuristic and clear:
+        transpoTable.clear()
+
+    heuristic, evaluate = heuristic_name, HEURISTICS[heuristic_name]
+    threats = ThreatCounter(board) if (heuristic_name == 'threat' and board is not None) else None
+
+
+def searchRootMove(board: np.ndarray, heights: list, key: int, player: BoardPiece, move: PlayerAction, depth: int
+) -> float:
+    """
+    Scores one move at the root: plays it, searches the opponent's replies with alphaBeta
+    and takes it back again
+    :param board: the board (searched in place)
+    :param heights: the column heights of board
+    :param key: the Zobrist hash of board with player to move
+    :param player: the player to move at the root
+    :param move: the root move
+    :param depth: the depth of the search, including the root move
+    :return: the score of the move
+    """
+    row = make_move(board, heights, move, player)
+    if threats is not None:
+        threats.place(row, move, player)
+
+    try:
+        #The transposition table is probed inside minValue/maxValue:
+        new_player = (player%2)+1
+        return alphaBeta(board, new_player, depth-1, move, heights, hash_move(key, row, move, player))
+
+    finally:
+        unmake_move(board, heights, move)
+        if threats is not None:
+            threats.remove(row, move, player)
+
+
+def iterativeDeepingSearch(board: np.ndarray, player: BoardPiece, time_limit: Optional[float] = None,
+                           maxDepth: int = MAX_DEPTH, heuristic_name: str = 'kernel', workers: int = 1,
+                           skip: Optional[Tuple[int, int]] = None, clear: bool = True
 )-> np.ndarray:
     """
     Performs iterative deepening DFS on the search tree, which is advisable when
@@ -170,15 +417,35 @@ def iterativeDeepingSearch(board: np.ndarray, player: BoardPiece
     should be considered.
     :param board: the board
     :param player: the player to move
-    :param maxDepth: the maximal depth to which to search (temporary measure)
+    :param time_limit: wall-clock budget in ms: deepens until it runs out, the iteration
+    in flight is then aborted (depth 1 is always completed)
+    :param maxDepth: the maximal depth to which to search
+    :param heuristic_name: the leaf evaluation, one of HEURISTICS
+    :param workers: if > 1, the root moves are searched in parallel by a pool of
+    worker processes (cf. agents.agent_minimax.parallel)
+    :param skip: (size, phase): skips the depths d > 1 for which (d + phase) // size is odd,
+    so that parallel searches work on different depths (cf. parallel.lazySMPSearch)
+    :param clear: passed on to set_heuristic
     :return: a list of moves with the best score
     """
+    global deadline, timeOut, threats, completedDepth
 
-    iter = MAX_DEPTH #sets cut-off depth for DFS: incrementally decreasing
+    searchDepth = 0 #sets cut-off depth for DFS: incrementally increasing
+    lastCompleted = 0
     bestScore = np.NINF
-    tempBoard = board.copy()
     tempBestScore = bestScore
+    start = time.perf_counter()
+    wallStart = time.time()
+
+    #Search a single copy of the board in place:
+    board = board.copy()
+    heights = column_heights(board)
+    key = hash_board(board, player=player)
+    rows, cols = board.shape
+    maxDepth = min(maxDepth, rows * cols - sum(heights)) #no deeper than the end of the game
 
+    set_heuristic(heuristic_name, board, clear)
+    clear_ordering()
 
     #Moves stored in OrderedDict: keys := score, vals := list(moves)
     #this will help (later on) with storing some of the suboptimal moves
@@ -189,65 +456,76 @@ def iterativeDeepingSearch(board: np.ndarray, player: BoardPiece
     #Generate list of best moves:
     #TODO: generate list of best and second (nth?) best moves
     #TODO: then draw move from a skewed (e.g. exponential) probability distribution
-    #TODO: add time-limit related while-loop wrap
 
-    #Early in the game: play moves in the center columns:
+    timeOut = False
 
-    while iter > 0:
+    while searchDepth < maxDepth:
 
-        possible_moves = np.where(board[5] == noPlayer)
+        searchDepth += 1
+        if skip is not None and searchDepth > 1 and ((searchDepth + skip[1]) // skip[0]) % 2:
+            continue
 
-        for moveI, move in np.ndenumerate(possible_moves):
+        possible_moves = [move for move in range(cols) if heights[move] < rows]
 
-            last_move = move
-            score = np.NINF
+        #The first iteration always runs to completion, so there is a move to return:
+        unlimited = time_limit is None or searchDepth == 1
+        deadline = np.inf if unlimited else start + time_limit / 1000
 
-            bestScore = tempBestScore
+        iterationStart = time.perf_counter()
+        if stats is not None:
+            stats.start_iteration(searchDepth)
 
-            new_board = apply_player_action(tempBoard, move, player)
-            #Check if new_board is in the transposition table:
-            hash_key = hash_board(new_board)
+        try:
+            if workers > 1:
+                from agents.agent_minimax.parallel import scoreRootMoves
 
-            if transpoTable.get(hash_key) is not None:
-                score = transpoTable[hash_key]
+                wallDeadline = None if unlimited else wallStart + time_limit / 1000
+                moveScores = scoreRootMoves(board, player, possible_moves, searchDepth, heuristic_name,
+                                            wallDeadline, workers)
 
             else:
-                tempBoard = board.copy()
-                new_player = (player%2)+1
-                score = alphaBeta(new_board, new_player, iter, last_move)
+                moveScores = [(move, searchRootMove(board, heights, key, player, move, searchDepth))
+                              for move in possible_moves]
+
+        except TimeOutError:
+            #Discard the unfinished iteration
+            if stats is not None:
+                stats.end_iteration(time.perf_counter() - iterationStart, completed=False)
+            timeOut = True
+            break
+
+        finally:
+            deadline = np.inf
+
+        if stats is not None:
+            stats.end_iteration(time.perf_counter() - iterationStart)
+        lastCompleted = searchDepth
+
+        for move, score in moveScores:
+
+            bestScore = tempBestScore
 
             if score > bestScore:
                 bestScore = score
                 tempBestScore = bestScore
                 new_bestMoves.clear()
                 new_bestMoves[bestScore] = [move]
-                transpoTable[hash_key] = bestScore
-
-                # FIFO queue, pop item upon exceeding space limit
-                if len(list(transpoTable.keys())) > transpo_size:
-                    transpoTable.popitem()
-
 
             #store all moves with the same score:
             elif score == bestScore:
                 new_bestMoves[bestScore].append(move)
-                transpoTable[hash_key] = bestScore
-                if len(list(transpoTable.keys())) > transpo_size:
-                    transpoTable.popitem()
 
         #Check old and new bestScores are the same:
         if bestMoves != OrderedDict() and list(bestMoves.keys())[0] == list(new_bestMoves.keys())[0]:
 
             #Merge moves with the same score: my guess is this will be important when the heuristic
             #is such that it creates the same value a lot of the time and no computational concern otherwise
-            new_bestMoves[list(bestMoves.keys())[0]] = bestMoves[list(bestMoves.keys())[0]] + \
-                                                       new_bestMoves[list(new_bestMoves.keys())[0]]
-
-        else:
-            bestMoves = new_bestMoves.copy()
+            score = list(bestMoves.keys())[0]
+            new_bestMoves[score] = new_bestMoves[score] + \
+                                   [move for move in bestMoves[score] if move not in new_bestMoves[score]]
 
+        bestMoves = new_bestMoves.copy()
         new_bestMoves.clear()
-        iter -= 1
 
         #Break if winning move has been found:
         if tempBestScore == GameState.IS_WIN.value:
@@ -255,25 +533,67 @@ def iterativeDeepingSearch(board: np.ndarray, player: BoardPiece
 
         tempBestScore = np.NINF
 
+    threats = None #only valid for the board copy searched here
+    completedDepth = lastCompleted
+
     #When under time constraint: check how deep you can go
-    print("Iteration: {}".format(iter))
+    emit('iteration', depth=completedDepth, timed_out=timeOut)
     keys, values = list(bestMoves.keys()), list(bestMoves.values())
     return keys, values
 
-def generate_move_alphaBeta(board: np.array, player: BoardPiece, saved_state: Optional[SavedState]
+def generate_move_alphaBeta(board: np.array, player: BoardPiece, saved_state: Optional[SavedState],
+                            time_limit: Optional[float] = None, heuristic: str = 'kernel', workers: int = 1,
+                            parallel: str = 'root', stats_callback: Optional[Callable[[SearchStats], None]] = None
 ) -> Tuple[PlayerAction, Optional[SavedState]]:
         """
         Generates next move
         :param board: the initial board
         :param player: the player
+        :param time_limit: per-move budget in ms (e.g. TIME_THRESHOLD): the search deepens
+        until it runs out and plays the best move of the last completed depth.
+        If None, the search stops at MAX_DEPTH
+        :param heuristic: the leaf evaluation: 'kernel' (evaluateGame) or 'threat'
+        (open two/three threats, evaluateThreats)
+        :param workers: number of worker processes for a parallel search
+        :param parallel: how the workers split the search, 'root': the root moves are
+        distributed over the workers, 'smp': Lazy SMP, all workers search the whole
+        tree at staggered depths and share one transposition table
+        :param stats_callback: called with the SearchStats of the move (nodes, cut-offs,
+        transposition table use, time per iteration) once the move is chosen
         :return: an action
         """
-        # Early in the game: play moves in the center columns:
-        if np.count_nonzero(board) < 2:
-            move = 3
-            return move, saved_state
+        global stats
+
+        if parallel not in ('root', 'smp'):
+            raise ValueError("Unknown parallel search: {}".format(parallel))
+        if heuristic not in HEURISTICS:
+            raise ValueError("Unknown heuristic: {}".format(heuristic))
+
+        # Early in the game: play the move from the opening book, if it was built with the same heuristic
+        useBook = openingBook is not None and (openingBook.exact or openingBook.heuristic == heuristic)
+        entry = openingBook.probe(board, player) if useBook else None
+        if entry is not None:
+            if stats_callback is not None:
+                stats_callback(SearchStats())
+            return entry[0], saved_state
+
+        maxDepth = MAX_DEPTH if time_limit is None else board.size
+        stats = SearchStats() if stats_callback is not None else None
+
+        try:
+            if workers > 1 and parallel == 'smp':
+                from agents.agent_minimax.parallel import lazySMPSearch
+                scores, actions = lazySMPSearch(board, player, time_limit, maxDepth, heuristic, workers)
+
+            else:
+                scores, actions = iterativeDeepingSearch(board, player, time_limit, maxDepth, heuristic, workers)
+
+        finally:
+            searchStats, stats = stats, None
+
+        if stats_callback is not None:
+            stats_callback(searchStats)
 
-        scores, actions = iterativeDeepingSearch(board, player)
         #Randomly select one of the moves:
         move = np.random.choice(actions[0]) #that's pretty ugly
         return move, saved_state
@@ -0,0 +1,295 @@
+import time
+import atexit
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Tuple
+
+import agents.agent_minimax.minimax as minimax
+from agents.common import BoardPiece, PlayerAction, column_heights
+from agents.hashing import hash_board
+from agents.transposition import TranspositionTable
+from agents.agent_minimax.stats import SearchStats
+from errors.errors import TimeOutError
+
+# Root-parallel alpha-beta: the moves at the root are distributed over a pool of
+# worker processes, every worker searches its moves with its own module state
+# (transposition table, heuristic), which persists between searches.
+#
+# Lazy SMP: every worker runs the full iterative deepening search on the same
+# position, the workers only cooperate through one transposition table in shared
+# memory. Helpers skip depths by a pattern of their own (SKIP_SIZE, SKIP_PHASE),
+# so that they work ahead of each other and fill the table with results the
+# main search can use, instead of repeating the same iterations. Writes to the shared table are not locked,
+# a probe instead validates every entry against its key (cf. transposition.py):
+# an entry that is read while another process writes it is a miss.
+#
+# The workers are spawned, not forked: the process may run numba threads (e.g.
+# leaf-parallel MCTS), and a fork after they have been started can deadlock.
+
+pool: Optional[ProcessPoolExecutor] = None
+poolWorkers: int = 0
+
+#Shared memory: a stop flag (8 bytes) followed by the transposition table
+STOP_BYTES: int = 8
+shared: Optional[SharedMemory] = None
+sharedHeuristic: Optional[str] = None #the heuristic of the scores in the shared table
+attached: dict = {} #shared memory attached to by a worker process, by name
+
+#Lazy SMP helper i skips the depths d for which (d + SKIP_PHASE[i]) // SKIP_SIZE[i] is odd:
+SKIP_SIZE: Tuple[int, ...] = (1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 3, 3, 4, 4, 4, 4, 4, 4, 4, 4)
+SKIP_PHASE: Tuple[int, ...] = (0, 1, 0, 1, 2, 3, 0, 1, 2, 3, 4, 5, 0, 1, 2, 3, 4, 5, 6, 7)
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    '''
+    Returns the worker pool, (re)creating it if the number of workers changed
+    :param workers: the number of worker processes
+    :return: the pool
+    '''
+    global pool, poolWorkers
+
+    if pool is None or poolWorkers != workers:
+        if pool is not None:
+            pool.shutdown(wait=True)
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        poolWorkers = workers
+
+    return pool
+
+
+def shutdown_pool():
+    global pool, poolWorkers, shared, sharedHeuristic
+
+    if pool is not None:
+        pool.shutdown(wait=True)
+    pool, poolWorkers = None, 0
+
+    detach()
+    if shared is not None:
+        shared.close()
+        shared.unlink()
+    shared, sharedHeuristic = None, None
+
+#Also runs in the worker processes, where it closes their attachments:
+atexit.register(shutdown_pool)
+
+
+def get_shared(size: int) -> SharedMemory:
+    '''
+    Returns the shared memory of Lazy SMP, creating it (with an empty table) if needed
+    :param size: the size of the transposition table (cf. TranspositionTable)
+    :return: the shared memory
+    '''
+    global shared, sharedHeuristic
+
+    nbytes = STOP_BYTES + TranspositionTable.nbytes(size)
+
+    if shared is None or shared.size < nbytes:
+        if shared is not None:
+            shared.close()
+            shared.unlink()
+        shared = SharedMemory(create=True, size=nbytes)
+        TranspositionTable(size, shared.buf[STOP_BYTES:nbytes]).clear()
+        sharedHeuristic = None
+
+    return shared
+
+
+def attach(name: str, size: int) -> Tuple[np.ndarray, TranspositionTable]:
+    '''
+    Maps the shared memory of Lazy SMP into the current process
+    :param name: the name of the shared memory
+    :param size: the size of the transposition table
+    :return: the stop flag and the shared transposition table
+    '''
+    if name not in attached:
+        #The table has been replaced (cf. get_shared): drop the old mapping
+        detach()
+        attached[name] = shared if shared is not None and shared.name == name else SharedMemory(name=name)
+
+    buf = attached[name].buf
+    stop = np.ndarray((1,), dtype=np.int64, buffer=buf[:STOP_BYTES])
+    table = TranspositionTable(size, buf[STOP_BYTES:STOP_BYTES + TranspositionTable.nbytes(size)])
+
+    return stop, table
+
+
+def detach():
+    '''
+    Closes the shared memory attached to by the current process (the memory
+    created by this process is closed by get_shared and shutdown_pool)
+    '''
+    for memory in attached.values():
+        if memory is not shared:
+            memory.close()
+    attached.clear()
+
+
+def searchMove(board: np.ndarray, player: BoardPiece, move: PlayerAction, depth: int,
+               heuristic_name: str, wallDeadline: Optional[float], count: bool = False
+) -> Tuple[Optional[float], Optional[SearchStats]]:
+    '''
+    Runs in a worker process: scores one root move (cf. minimax.searchRootMove)
+    :param board: the board at the root
+    :param player: the player to move at the root
+    :param move: the root move
+    :param depth: the depth of the search, including the root move
+    :param heuristic_name: the leaf evaluation, one of minimax.HEURISTICS
+    :param wallDeadline: time.time() value at which the search is aborted (None: no limit)
+    :param count: collect SearchStats of the search
+    :return: the score of the move (None if the search was aborted) and the statistics (None if not counted)
+    '''
+    minimax.set_heuristic(heuristic_name, board)
+    minimax.stats = SearchStats() if count else None
+    if count:
+        minimax.stats.start_iteration(depth)
+
+    #perf_counter is not shared between processes, the wall clock is:
+    if wallDeadline is not None:
+        minimax.deadline = time.perf_counter() + (wallDeadline - time.time())
+
+    try:
+        score = minimax.searchRootMove(board, column_heights(board), hash_board(board, player=player),
+                                       player, move, depth)
+        return score, minimax.stats
+
+    except TimeOutError:
+        return None, minimax.stats
+
+    finally:
+        minimax.deadline = np.inf
+        minimax.threats = None
+        minimax.stats = None
+
+
+def scoreRootMoves(board: np.ndarray, player: BoardPiece, moves: List[PlayerAction], depth: int,
+                   heuristic_name: str, wallDeadline: Optional[float], workers: int
+) -> List[Tuple[PlayerAction, float]]:
+    '''
+    Scores all root moves in parallel
+    :param board: the board at the root
+    :param player: the player to move
+    :param moves: the moves to score
+    :param depth: the depth of the search, including the root move
+    :param heuristic_name: the leaf evaluation, one of minimax.HEURISTICS
+    :param wallDeadline: time.time() value at which the search is aborted (None: no limit)
+    :param workers: the number of worker processes
+    :return: a list of (move, score), in the order of moves
+    '''
+    stats = minimax.stats
+    futures = [get_pool(workers).submit(searchMove, board, player, move, depth, heuristic_name, wallDeadline,
+                                        stats is not None)
+               for move in moves]
+    scores = []
+    for future in futures:
+        score, workerStats = future.result()
+        scores.append(score)
+        #Also the nodes of an aborted iteration, like in a sequential search:
+        if stats is not None:
+            stats.merge(workerStats)
+
+    if any(score is None for score in scores):
+        raise TimeOutError("Search aborted")
+
+    return list(zip(moves, scores))
+
+
+def smpSearch(board: np.ndarray, player: BoardPiece, skip: Optional[Tuple[int, int]], time_limit: Optional[float],
+              maxDepth: int, heuristic_name: str, name: str, size: int, helper: bool = True, count: bool = False
+) -> Tuple[int, list, list, Optional[SearchStats]]:
+    '''
+    Runs one thread of Lazy SMP: iterative deepening on the shared transposition table
+    :param board: the board at the root
+    :param player: the player to move
+    :param skip: the depths to skip (cf. minimax.iterativeDeepingSearch), None for the main search
+    :param time_limit: budget in ms (None: no limit)
+    :param maxDepth: the maximal depth to which to search
+    :param heuristic_name: the leaf evaluation, one of minimax.HEURISTICS
+    :param name: the name of the shared memory
+    :param size: the size of the shared transposition table
+    :param helper: helpers are aborted through the stop flag, the main search is not
+    :param count: collect SearchStats of the search (in a worker process, the main
+    search counts into minimax.stats of the caller)
+    :return: (completed depth, scores, moves) as returned by minimax.iterativeDeepingSearch
+    and the statistics (None if not counted)
+    '''
+    stop, table = attach(name, size)
+    ownTable, ownHeuristic, ownEvaluate = minimax.transpoTable, minimax.heuristic, minimax.evaluate
+
+    minimax.transpoTable = table
+    minimax.stopFlag = stop if helper else None
+    if count:
+        minimax.stats = SearchStats()
+
+    try:
+        keys, values = minimax.iterativeDeepingSearch(board, player, time_limit, maxDepth, heuristic_name,
+                                                      skip=skip, clear=False)
+        return minimax.completedDepth, keys, values, minimax.stats if count else None
+
+    finally:
+        minimax.transpoTable = ownTable
+        minimax.stopFlag = None
+        if count:
+            minimax.stats = None
+        #The heuristic of the scores in the private table:
+        minimax.heuristic, minimax.evaluate = ownHeuristic, ownEvaluate
+        minimax.threats = None
+
+
+def lazySMPSearch(board: np.ndarray, player: BoardPiece, time_limit: Optional[float], maxDepth: int,
+                  heuristic_name: str, workers: int
+) -> Tuple[list, list]:
+    '''
+    Lazy SMP: the main search runs in this process, workers - 1 helpers in the pool.
+    Once the main search is done, the helpers are stopped and the result of the
+    deepest completed search is returned.
+    :param board: the board at the root
+    :param player: the player to move
+    :param time_limit: budget in ms (None: no limit)
+    :param maxDepth: the maximal depth to which to search
+    :param heuristic_name: the leaf evaluation, one of minimax.HEURISTICS
+    :param workers: the number of searches, including the main search
+    :return: (scores, moves) as returned by minimax.iterativeDeepingSearch
+    '''
+    global sharedHeuristic
+
+    if heuristic_name not in minimax.HEURISTICS:
+        raise ValueError("Unknown heuristic: {}".format(heuristic_name))
+
+    size = minimax.transpo_size
+    memory = get_shared(size)
+    stop, table = attach(memory.name, size)
+
+    #Stored scores depend on the heuristic:
+    if heuristic_name != sharedHeuristic:
+        table.clear()
+        sharedHeuristic = heuristic_name
+
+    stop[0] = 0
+    stats = minimax.stats
+    skips = [(SKIP_SIZE[i % len(SKIP_SIZE)], SKIP_PHASE[i % len(SKIP_PHASE)]) for i in range(workers - 1)]
+    futures = [get_pool(workers - 1).submit(smpSearch, board, player, skip, time_limit, maxDepth,
+                                            heuristic_name, memory.name, size, count=stats is not None)
+               for skip in skips]
+
+    try:
+        results = [smpSearch(board, player, None, time_limit, maxDepth, heuristic_name, memory.name, size,
+                             helper=False)]
+    finally:
+        #Stop the helpers, also if the main search failed:
+        stop[0] = 1
+        helpers = [future.result() for future in futures]
+
+    results += helpers
+
+    #The helpers' nodes, per depth:
+    if stats is not None:
+        for *_, helperStats in helpers:
+            stats.merge(helperStats)
+
+    #The main search always completes depth 1, helpers can be stopped before:
+    depth, keys, values, _ = max((result for result in results if result[1]), key=lambda result: result[0])
+
+    return keys, values
@@ -0,0 +1,123 @@
+import numpy as np
+from typing import List
+
+# Statistics of one alpha-beta search (one call of iterativeDeepingSearch).
+# Counting is only done while a SearchStats object is installed as
+# minimax.stats, cf. generate_move_alphaBeta(..., stats_callback=...).
+# Root-parallel and Lazy SMP workers count in their own processes and send
+# their counters back, they are merged into the caller's (cf. merge).
+
+class SearchStats:
+    '''
+    Counters of an iterative deepening search, per iteration where it matters:
+    :param depths: the depth of every iteration
+    :param nodes: the nodes visited in every iteration
+    :param times: the time (in s) spent in every iteration
+    :param completed: whether the iteration was completed (the last one may be aborted)
+    '''
+
+    def __init__(self):
+
+        self.depths: List[int] = []
+        self.nodes: List[int] = []
+        self.times: List[float] = []
+        self.completed: List[bool] = []
+
+        self.cutoffs = 0 #beta cut-offs (alpha cut-offs in minValue)
+        self.firstCutoffs = 0 #cut-offs by the first move searched
+        self.ttProbes = 0
+        self.ttHits = 0
+        self.ttStores = 0
+
+    def start_iteration(self, depth: int):
+        self.depths.append(depth)
+        self.nodes.append(0)
+        self.times.append(0.)
+        self.completed.append(False)
+
+    def end_iteration(self, elapsed: float, completed: bool = True):
+        '''
+        :param elapsed: the time (in s) spent in the iteration
+        :param completed: False if the iteration was aborted
+        '''
+        self.times[-1] = elapsed
+        self.completed[-1] = completed
+
+    def merge(self, other: 'SearchStats'):
+        '''
+        Adds the counters of a search of another process (cf. agent_minimax.parallel).
+        Nodes are added to the iteration of the same depth, iterations only other has
+        are inserted. The times of self are kept: they are the wall-clock times.
+        :param other: the statistics of the other search
+        '''
+        for depth, nodes, elapsed, completed in zip(other.depths, other.nodes, other.times, other.completed):
+            if depth in self.depths:
+                i = len(self.depths) - 1 - self.depths[::-1].index(depth)
+                self.nodes[i] += nodes
+                self.completed[i] = self.completed[i] or completed
+            else:
+                i = sum(d < depth for d in self.depths)
+                self.depths.insert(i, depth)
+                self.nodes.insert(i, nodes)
+                self.times.insert(i, elapsed)
+                self.completed.insert(i, completed)
+
+        self.cutoffs += other.cutoffs
+        self.firstCutoffs += other.firstCutoffs
+        self.ttProbes += other.ttProbes
+        self.ttHits += other.ttHits
+        self.ttStores += other.ttStores
+
+        return self
+
+    #Derived values:
+
+    def total_nodes(self) -> int:
+        return sum(self.nodes)
+
+    def total_time(self) -> float:
+        return sum(self.times)
+
+    def nodes_per_second(self) -> float:
+        return self.total_nodes() / self.total_time() if self.total_time() > 0 else 0.
+
+    def first_cutoff_rate(self) -> float:
+        '''
+        Returns the fraction of cut-offs caused by the first move: a measure of the move ordering
+        '''
+        return self.firstCutoffs / self.cutoffs if self.cutoffs else 0.
+
+    def tt_hit_rate(self) -> float:
+        return self.ttHits / self.ttProbes if self.ttProbes else 0.
+
+    def branching_factors(self) -> List[float]:
+        '''
+        Returns the effective branching factor of every completed iteration after
+        the first: the ratio of its nodes to the nodes of the previous iteration
+        '''
+        return [self.nodes[i] / self.nodes[i - 1] for i in range(1, len(self.nodes))
+                if self.completed[i] and self.nodes[i - 1]]
+
+    def ebf(self) -> float:
+        '''
+        Returns the effective branching factor of the search: the geometric mean of branching_factors
+        '''
+        factors = self.branching_factors()
+        return float(np.prod(factors) ** (1 / len(factors))) if factors else 0.
+
+    def as_dict(self) -> dict:
+        '''
+        Returns the statistics as plain python values (e.g. for logging as JSON)
+        '''
+        return {'depths': list(self.depths), 'nodes': list(self.nodes), 'times': list(self.times),
+                'completed': list(self.completed), 'cutoffs': self.cutoffs,
+                'firstCutoffs': self.firstCutoffs, 'firstCutoffRate': self.first_cutoff_rate(),
+                'ttProbes': self.ttProbes, 'ttHits': self.ttHits, 'ttStores': self.ttStores,
+                'ttHitRate': self.tt_hit_rate(), 'ebf': self.ebf(),
+                'nodesPerSecond': self.nodes_per_second()}
+
+    def __str__(self):
+        return "depth {}, {} nodes in {:.3f}s ({:.0f} nodes/s), ebf {:.2f}, first-move cut-offs {:.1%}, " \
+               "TT hits {:.1%}".format(self.depths[-1] if self.depths else 0, self.total_nodes(),
+                                      self.total_time(), self.nodes_per_second(), self.ebf(),
+                                      self.first_cutoff_rate(), self.tt_hit_rate())
@@ -0,0 +1,264 @@
+import time
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from agents.common import BoardPiece, PlayerAction, SavedState
+from agents.bitboard import BitBoard, BOTTOM_MASK, BOARD_MASK, ROWS, COLS, column_mask, winning_cells
+from agents.transposition import TranspositionTable, Bound
+from errors.errors import BoardError, TimeOutError
+
+# Perfect-play solver: negamax over bitboards with alpha-beta pruning, searched
+# to the end of the game. Positions are (current, occupied, nMoves): the pieces
+# of the player to move, all pieces and the number of pieces on the board.
+#
+# Scores: a win with the k-th own piece scores (CELLS + 1) / 2 - k + 1 (the
+# earlier the win, the higher the score), a loss the negative of the
+# opponent's win, a draw 0. The score of a position is found by a sequence of
+# null-window searches (solve), each of which only tells whether the score is
+# above or below a bound.
+#
+# Early positions take far too long to solve in python: the agent
+# (generate_move_solver) plays from the exact opening book if there is one
+# (agents/solver_book.bin, cf. agents.book), otherwise it gives the solver part
+# of its time budget and plays the move of the minimax agent if the position
+# is not solved by then.
+
+CELLS: int = ROWS * COLS
+TIME_LIMIT: float = 2000 #the time budget of the agent in ms
+CHECK_NODES: int = 1023 #the clock is checked every CHECK_NODES + 1 nodes
+MIN_SCORE: int = -CELLS // 2 + 3
+MAX_SCORE: int = (CELLS + 1) // 2 - 3
+
+#Columns from the center outwards: center moves are more likely to be good
+CENTER_ORDER: list = sorted(range(COLS), key=lambda col: abs(2 * col - (COLS - 1)))
+
+
+def position_key(position: BitBoard, player: BoardPiece) -> int:
+    '''
+    Returns the key the solver stores a position under: like BitBoard.key, but
+    with the pieces of the player to move instead of those of PLAYER1
+    '''
+    return position.get_mask(player) + position.get_occupied() + BOTTOM_MASK
+
+
+class Solver:
+    '''
+    Solves positions exactly
+    :param tableSize: the size of the transposition table
+    :param book: opening book, anything with get(key) -> score or None (e.g. a dict),
+    keyed by position_key
+    :param bookDepth: the book is only looked up for positions with at most bookDepth pieces
+    '''
+
+    def __init__(self, tableSize: int = 2**20, book=None, bookDepth: int = CELLS):
+
+        self.table = TranspositionTable(tableSize)
+        self.book = book
+        self.bookDepth = bookDepth
+        self.nodes = 0
+        self.deadline = np.inf #time.perf_counter() value at which a search is aborted
+
+    def reset(self):
+        self.table.clear()
+        self.nodes = 0
+
+    def negamax(self, current: int, occupied: int, nMoves: int, alpha: int, beta: int) -> int:
+        '''
+        Scores a position within the window (alpha, beta): the result is exact if it lies
+        inside the window, otherwise it is a bound (at most alpha or at least beta).
+        The player to move must not be able to win with the next move.
+        :param current: the pieces of the player to move
+        :param occupied: all pieces on the board
+        :param nMoves: the number of pieces on the board
+        :param alpha: lower end of the window
+        :param beta: upper end of the window
+        :return: the score
+        '''
+        self.nodes += 1
+        if not self.nodes & CHECK_NODES and time.perf_counter() > self.deadline:
+            raise TimeOutError("Solver aborted")
+
+        #Moves that do not let the opponent win directly:
+        possible = (occupied + BOTTOM_MASK) & BOARD_MASK
+        opponentWins = winning_cells(current ^ occupied, occupied)
+        forced = possible & opponentWins
+
+        if forced:
+            if forced & (forced - 1): #two threats: the opponent wins
+                return -((CELLS - nMoves) // 2)
+            possible = forced
+
+        possible &= ~(opponentWins >> 1) #do not play below a winning cell of the opponent
+
+        if not possible:
+            return -((CELLS - nMoves) // 2)
+
+        if nMoves >= CELLS - 2: #neither player can win anymore
+            return 0
+
+        #The opponent cannot win with their next move, nor can the player to move
+        #(they would have won already):
+        lower = -((CELLS - 2 - nMoves) // 2)
+        upper = (CELLS - 1 - nMoves) // 2
+
+        key = current + occupied + BOTTOM_MASK
+
+        if self.book is not None and nMoves <= self.bookDepth:
+            score = self.book.get(key)
+            if score is not None:
+                return score
+
+        entry = self.table.probe(key)
+        if entry is not None:
+            score, _, flag, _ = entry
+            if flag == Bound.UPPER:
+                upper = min(upper, int(score))
+            else:
+                lower = max(lower, int(score))
+
+        if upper <= alpha:
+            return upper
+        if lower >= beta:
+            return lower
+        alpha, beta = max(alpha, lower), min(beta, upper)
+
+        #Moves that create more winning cells first, center columns break ties:
+        moves = []
+        for action in CENTER_ORDER:
+            move = possible & column_mask(action)
+            if move:
+                moves.append((-winning_cells(current | move, occupied).bit_count(), len(moves), move))
+        moves.sort()
+
+        for _, _, move in moves:
+            score = -self.negamax(current ^ occupied, occupied | move, nMoves + 1, -beta, -alpha)
+
+            if score >= beta:
+                self.table.store(key, 0, score, Bound.LOWER)
+                return score
+
+            if score > alpha:
+                alpha = score
+
+        self.table.store(key, 0, alpha, Bound.UPPER)
+        return alpha
+
+    def solve(self, position: BitBoard, player: BoardPiece, weak: bool = False) -> int:
+        '''
+        Computes the score of a position (cf. the scores above)
+        :param position: the position
+        :param player: the player to move
+        :param weak: only compute the sign of the score (win, draw or loss), which is faster,
+        the result is then only exact in its sign
+        :return: the score
+        '''
+        current, occupied, nMoves = position.get_mask(player), position.get_occupied(), position.nMoves
+
+        if winning_cells(current, occupied) & (occupied + BOTTOM_MASK) & BOARD_MASK:
+            return (CELLS + 1 - nMoves) // 2
+
+        lower, upper = (-1, 1) if weak else (-((CELLS - nMoves) // 2), (CELLS + 1 - nMoves) // 2)
+
+        #Narrow the window with null-window searches, starting close to 0:
+        while lower < upper:
+            bound = lower + (upper - lower) // 2
+            if bound <= 0 and -(-lower // 2) < bound:
+                bound = -(-lower // 2)
+            elif bound >= 0 and upper // 2 > bound:
+                bound = upper // 2
+
+            score = self.negamax(current, occupied, nMoves, bound, bound + 1)
+            if score <= bound:
+                upper = score
+            else:
+                lower = score
+
+        return lower
+
+    def analyze(self, position: BitBoard, player: BoardPiece, weak: bool = False) -> Dict[PlayerAction, int]:
+        '''
+        Computes the score of every legal move
+        :param position: the position
+        :param player: the player to move
+        :param weak: only compute the sign of the scores (cf. solve)
+        :return: dict mapping each legal move to its score for player
+        '''
+        scores = {}
+        opponent = player % 2 + 1
+
+        for action in position.legal_moves():
+            position.play(action, player)
+            if position.connected_four(player):
+                scores[action] = (CELLS + 2 - position.nMoves) // 2
+            else:
+                scores[action] = -self.solve(position, opponent, weak)
+            position.undo(action)
+
+        return scores
+
+
+solver: Optional[Solver] = None #the solver of the agent, cf. get_solver
+
+
+def get_solver() -> Solver:
+    '''
+    Returns the solver of the agent, built on first use with the exact opening book if there is one
+    '''
+    global solver
+
+    if solver is None:
+        from agents.book import load_book, SOLVER_PATH
+
+        book = load_book(SOLVER_PATH)
+        solver = Solver(book=book, bookDepth=book.ply) if book is not None and book.exact else Solver()
+
+    return solver
+
+
+def generate_move_solver(board: np.ndarray, player: BoardPiece, saved_state: Optional[SavedState],
+                         time_limit: Optional[float] = TIME_LIMIT
+) -> Tuple[PlayerAction, Optional[SavedState]]:
+    '''
+    Plays a move with the best score, preferring center columns among equal moves
+    :param board: the board
+    :param player: the player to move
+    :param saved_state: not used
+    :param time_limit: budget in ms (None: solve the position however long it takes). The solver
+    gets half of it, if the position is not solved by then the minimax agent plays with the rest
+    :return: an action
+    '''
+    position = BitBoard.from_board(board)
+
+    if position.nMoves == CELLS:
+        raise BoardError("The board is full")
+
+    # The first move: the center column wins
+    if position.nMoves == 0:
+        return PlayerAction(COLS // 2), saved_state
+
+    solver = get_solver()
+
+    # Early in the game: play the move from the exact book
+    entry = solver.book.probe(board, player) if solver.book is not None else None
+    if entry is not None:
+        return entry[0], saved_state
+
+    start = time.perf_counter()
+    solver.deadline = np.inf if time_limit is None else start + time_limit / 2000
+
+    try:
+        scores = solver.analyze(position, player)
+
+    except TimeOutError:
+        from agents.agent_minimax import generate_move as minimax_move
+
+        remaining = time_limit - 1000 * (time.perf_counter() - start)
+        return minimax_move(board, player, saved_state, max(remaining, 0.))
+
+    finally:
+        solver.deadline = np.inf
+
+    best = max(scores.values())
+    move = next(action for action in CENTER_ORDER if scores.get(action) == best)
+
+    return PlayerAction(move), saved_state
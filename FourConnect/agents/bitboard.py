@@ -0,0 +1,282 @@
+import numpy as np
+from numba import njit
+from functools import lru_cache
+from typing import List, Tuple
+
+from agents.common import BoardPiece, PlayerAction, PLAYER1, PLAYER2, noPlayer
+from errors.errors import ColumnError, BoardError
+
+# Bitboard layout: every column occupies STRIDE = ROWS + 1 consecutive bits,
+# the extra bit on top of each column is a sentinel that is never set (it keeps
+# pieces of neighbouring columns from touching when masks are shifted).
+# Bit col * STRIDE + row corresponds to board[row, col] of the ndarray layout:
+#
+#  6 13 20 27 34 41 48
+#  5 12 19 26 33 40 47
+#  4 11 18 25 32 39 46
+#  3 10 17 24 31 38 45
+#  2  9 16 23 30 37 44
+#  1  8 15 22 29 36 43
+#  0  7 14 21 28 35 42
+
+ROWS: int = 6
+COLS: int = 7
+STRIDE: int = ROWS + 1
+
+BOTTOM_MASK: int = sum(1 << (col * STRIDE) for col in range(COLS))
+BOARD_MASK: int = BOTTOM_MASK * ((1 << ROWS) - 1)
+
+
+@lru_cache(maxsize=None)
+def bit_weights(shape: Tuple[int, int]) -> np.ndarray:
+    '''
+    Returns the value of the bit that represents each cell of a board
+    :param shape: the (rows, cols) shape of the board
+    :return: np.ndarray of dtype uint64 with weights[row, col] = 2**(col*(rows+1) + row)
+    '''
+    rows, cols = shape
+    if cols * (rows + 1) > 64:
+        raise BoardError("Board too large for a 64-bit bitboard")
+
+    shifts = np.arange(cols)[None, :] * (rows + 1) + np.arange(rows)[:, None]
+    weights = np.left_shift(np.uint64(1), shifts.astype(np.uint64))
+    weights.setflags(write=False)
+    return weights
+
+
+@njit()
+def board_to_mask(board: np.ndarray, player: BoardPiece) -> np.uint64:
+    '''
+    Converts the pieces of one player into a bitmask
+    :param board: the board (any shape that fits into 64 bits)
+    :param player: the player whose pieces are encoded
+    :return: the bitmask of the player's pieces
+    '''
+    rows, cols = board.shape
+    mask = np.uint64(0)
+
+    for j in range(cols):
+        for i in range(rows):
+            if board[i, j] == player:
+                mask |= np.uint64(1) << np.uint64(j * (rows + 1) + i)
+
+    return mask
+
+
+def mask_to_cells(mask: int, shape: Tuple[int, int] = (ROWS, COLS)) -> np.ndarray:
+    '''
+    Converts a bitmask back into a boolean array of the given shape
+    :param mask: the bitmask
+    :param shape: the (rows, cols) shape of the board
+    :return: boolean np.ndarray, True where the bit of a cell is set
+    '''
+    return (np.uint64(mask) & bit_weights(shape)) != 0
+
+
+def connected_four_mask(mask: int, stride: int = STRIDE) -> bool:
+    '''
+    Checks a bitmask for connectN (= 4) pieces in a row: shifting the mask by
+    the distance between two neighbouring cells and AND-ing it with itself
+    leaves the start of every pair, doing the same with the pairs at twice
+    the distance leaves the start of every run of four
+    :param mask: the bitmask of one player's pieces
+    :param stride: number of bits per column (rows + 1)
+    :return bool: does the mask contain connectN pieces in a row?
+    '''
+    # vertical, horizontal, diagonal (/) and anti-diagonal (\):
+    for shift in (1, stride, stride + 1, stride - 1):
+        pairs = mask & (mask >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+
+    return False
+
+
+@njit()
+def connected_four_bitboard(board: np.ndarray, player: BoardPiece) -> bool:
+    '''
+    Bitboard backend of agents.common.connected_four, see connected_four_mask
+    :param board: the board (any shape that fits into 64 bits)
+    :param player: the player for whom to check
+    :return bool: does player have connectN pieces in a row?
+    '''
+    rows = board.shape[0]
+    mask = board_to_mask(board, player)
+
+    for step in (1, rows + 1, rows + 2, rows):
+        shift = np.uint64(step)
+        pairs = mask & (mask >> shift)
+        if pairs & (pairs >> (shift + shift)):
+            return True
+
+    return False
+
+
+def column_mask(action: PlayerAction) -> int:
+    '''
+    Returns a mask of all cells of a column
+    '''
+    return ((1 << ROWS) - 1) << (action * STRIDE)
+
+
+def mirror_mask(mask: int) -> int:
+    '''
+    Mirrors a mask (or a key, cf. BitBoard.key) left to right
+    '''
+    column = (1 << STRIDE) - 1
+    mirrored = 0
+    for col in range(COLS):
+        mirrored |= ((mask >> (col * STRIDE)) & column) << ((COLS - 1 - col) * STRIDE)
+
+    return mirrored
+
+
+def winning_cells(mask: int, occupied: int) -> int:
+    '''
+    Returns the empty cells that would complete connectN (= 4) pieces in a row
+    for the player with the pieces in mask (whether they can be played yet or not)
+    :param mask: the bitmask of one player's pieces
+    :param occupied: the bitmask of all pieces on the board
+    :return: a bitmask of the winning cells
+    '''
+    #vertical: only three pieces below the cell
+    cells = (mask << 1) & (mask << 2) & (mask << 3)
+
+    #horizontal, diagonal (/) and anti-diagonal (\): the cell can be in any of the four places
+    for shift in (STRIDE, STRIDE + 1, STRIDE - 1):
+        pairs = (mask << shift) & (mask << 2 * shift)
+        cells |= pairs & (mask << 3 * shift)
+        cells |= pairs & (mask >> shift)
+        pairs = (mask >> shift) & (mask >> 2 * shift)
+        cells |= pairs & (mask << shift)
+        cells |= pairs & (mask >> 3 * shift)
+
+    return cells & (BOARD_MASK ^ occupied)
+
+
+class BitBoard:
+    '''
+    Bitboard representation of a Four Connect position:
+    :param masks: one 64-bit mask per player (masks[player - 1])
+    :param heights: per column, the index of the bit of the lowest free cell
+    :param nMoves: number of pieces on the board
+    '''
+
+    def __init__(self,
+                 masks: List[int] = None,
+                 heights: List[int] = None,
+                 nMoves: int = 0):
+
+        self.masks = [0, 0] if masks is None else list(masks)
+        self.heights = [col * STRIDE for col in range(COLS)] if heights is None else list(heights)
+        self.nMoves = nMoves
+
+    #Getter methods:
+
+    def get_mask(self, player: BoardPiece) -> int:
+        return self.masks[player - 1]
+
+    def get_occupied(self) -> int:
+        return self.masks[0] | self.masks[1]
+
+    def get_height(self, action: PlayerAction) -> int:
+        '''
+        Returns the number of pieces in a column
+        '''
+        return self.heights[action] - action * STRIDE
+
+    #Moves:
+
+    def can_play(self, action: PlayerAction) -> bool:
+        return self.heights[action] < action * STRIDE + ROWS
+
+    def play(self, action: PlayerAction, player: BoardPiece) -> 'BitBoard':
+        '''
+        Drops a piece of player into the column action, in O(1)
+        :param action: the column
+        :param player: the player who's turn it is
+        :return: the modified bitboard
+        '''
+        if not 0 <= action < COLS:
+            raise BoardError("Not a board column")
+
+        if not self.can_play(action):
+            raise ColumnError("Column already full")
+
+        self.masks[player - 1] |= 1 << self.heights[action]
+        self.heights[action] += 1
+        self.nMoves += 1
+
+        return self
+
+    def undo(self, action: PlayerAction) -> 'BitBoard':
+        '''
+        Removes the topmost piece of the column action, in O(1)
+        :param action: the column that was played last
+        :return: the modified bitboard
+        '''
+        if not 0 <= action < COLS:
+            raise BoardError("Not a board column")
+
+        if self.heights[action] == action * STRIDE:
+            raise ColumnError("Column is empty")
+
+        self.heights[action] -= 1
+        bit = ~(1 << self.heights[action])
+        self.masks[0] &= bit
+        self.masks[1] &= bit
+        self.nMoves -= 1
+
+        return self
+
+    def connected_four(self, player: BoardPiece) -> bool:
+        return connected_four_mask(self.masks[player - 1])
+
+    def legal_mask(self) -> int:
+        '''
+        Returns a mask with the lowest free cell of every non-full column set
+        '''
+        return (self.get_occupied() + BOTTOM_MASK) & BOARD_MASK
+
+    def legal_moves(self) -> List[PlayerAction]:
+        return [action for action in range(COLS) if self.can_play(action)]
+
+    def key(self) -> int:
+        '''
+        Returns a key that uniquely identifies the position:
+        the occupied cells plus the bottom row mark the height of each column,
+        adding the pieces of PLAYER1 on top of that distinguishes the two players
+        '''
+        return self.masks[0] + self.get_occupied() + BOTTOM_MASK
+
+    def copy(self) -> 'BitBoard':
+        return BitBoard(self.masks, self.heights, self.nMoves)
+
+    #Conversion from and to the ndarray layout:
+
+    @staticmethod
+    def from_board(board: np.ndarray) -> 'BitBoard':
+        '''
+        Builds a bitboard from a board as returned by initialize_game_state
+        :param board: np.ndarray with dimension : 6 x 7
+        :return: the bitboard
+        '''
+        if board.shape != (ROWS, COLS):
+            raise BoardError("Board must have shape {}".format((ROWS, COLS)))
+
+        masks = [int(board_to_mask(board, PLAYER1)), int(board_to_mask(board, PLAYER2))]
+        pieces = np.count_nonzero(board != noPlayer, axis=0)
+        heights = [col * STRIDE + int(pieces[col]) for col in range(COLS)]
+
+        return BitBoard(masks, heights, int(pieces.sum()))
+
+    def to_board(self) -> np.ndarray:
+        '''
+        Converts the bitboard back into the ndarray layout
+        :return: np.ndarray with dimension : 6 x 7
+        '''
+        board = np.zeros((ROWS, COLS), dtype=BoardPiece)
+        board[mask_to_cells(self.masks[0])] = PLAYER1
+        board[mask_to_cells(self.masks[1])] = PLAYER2
+
+        return board
@@ -0,0 +1,244 @@
+import io
+import os
+import argparse
+import numpy as np
+from contextlib import redirect_stdout
+from typing import Dict, Optional, Tuple
+
+from agents.common import BoardPiece, PlayerAction, PLAYER1, PLAYER2
+from agents.bitboard import BitBoard, COLS, mirror_mask
+from agents.agent_solver.solver import Solver, position_key, CENTER_ORDER
+from errors.errors import BookError
+
+# Opening book: the best move and its score for every position up to a given
+# ply, precomputed by a search and stored in a binary file:
+#
+#   header (24 bytes): magic, version, ply, exact, heuristic, number of entries n
+#   keys   (8n bytes): sorted position keys (cf. solver.position_key)
+#   scores (4n bytes): the score of the position for the player to move
+#   moves  (n bytes):  the best move
+#
+# A position and its mirror image share one entry (under the smaller key), the
+# move is mirrored back on lookup. The file is memory-mapped and the keys are
+# binary-searched, so only a few pages are read per lookup.
+#
+# There are two books: opening_book.bin is built by minimax, its header
+# records the heuristic (the minimax agent only plays from it when searching
+# with the same one), solver_book.bin is built by the solver and holds exact
+# scores (the solver agent plays from it and the solver cuts its search at its
+# positions). Build them with:
+#
+#   python -m agents.book --ply 4 --depth 8
+#   python -m agents.book --ply 4 --scorer solver
+#
+# Solving early positions exactly takes hours per position in python, so only
+# the minimax book is shipped.
+
+MAGIC: bytes = b'C4BK'
+VERSION: int = 2
+DEFAULT_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'opening_book.bin')
+SOLVER_PATH: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'solver_book.bin')
+
+header_dtype = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('ply', 'u1'),
+    ('exact', 'u1'), #1 if the scores are exact (solver), 0 if they are heuristic (minimax)
+    ('heuristic', 'S8'), #the leaf evaluation of the minimax search, empty for exact books
+    ('count', '<u8'),
+])
+
+
+def canonical_key(key: int) -> Tuple[int, bool]:
+    '''
+    Returns the key a position is stored under and whether it is mirrored
+    '''
+    mirrored = mirror_mask(key)
+    return (mirrored, True) if mirrored < key else (key, False)
+
+
+class OpeningBook:
+    '''
+    Read-only, memory-mapped opening book
+    :param path: the book file (cf. write_book)
+    '''
+
+    def __init__(self, path: str = DEFAULT_PATH):
+
+        header = np.fromfile(path, dtype=header_dtype, count=1)
+        if len(header) == 0 or header['magic'][0] != MAGIC:
+            raise BookError("Not an opening book: {}".format(path))
+        if header['version'][0] != VERSION:
+            raise BookError("Unsupported book version: {}".format(header['version'][0]))
+
+        self.path = path
+        self.ply = int(header['ply'][0])
+        self.exact = bool(header['exact'][0])
+        self.heuristic: Optional[str] = header['heuristic'][0].decode() or None
+        n = int(header['count'][0])
+
+        if n == 0:
+            self.keys, self.scores, self.moves = np.empty(0, '<u8'), np.empty(0, '<f4'), np.empty(0, 'i1')
+        else:
+            offset = header_dtype.itemsize
+            self.keys = np.memmap(path, dtype='<u8', mode='r', offset=offset, shape=(n,))
+            self.scores = np.memmap(path, dtype='<f4', mode='r', offset=offset + 8 * n, shape=(n,))
+            self.moves = np.memmap(path, dtype='i1', mode='r', offset=offset + 12 * n, shape=(n,))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def find(self, key: int) -> Tuple[int, bool]:
+        '''
+        Looks up a position
+        :param key: the position key (cf. solver.position_key)
+        :return: (index, mirrored) where index is -1 if the position is not in the book
+        '''
+        key, mirrored = canonical_key(key)
+        index = int(np.searchsorted(self.keys, np.uint64(key)))
+
+        if index < len(self.keys) and self.keys[index] == key:
+            return index, mirrored
+        return -1, mirrored
+
+    def get(self, key: int) -> Optional[int]:
+        '''
+        Returns the exact score of a position, for Solver(book=...): None if the
+        position is not in the book or the book is not exact
+        '''
+        index, _ = self.find(key)
+        return int(self.scores[index]) if (self.exact and index >= 0) else None
+
+    def probe(self, board: np.ndarray, player: BoardPiece) -> Optional[Tuple[PlayerAction, float]]:
+        '''
+        Looks up the best move of a position
+        :param board: the board
+        :param player: the player to move
+        :return: (move, score) if the position is in the book, None otherwise
+        '''
+        if np.count_nonzero(board) > self.ply:
+            return None
+
+        index, mirrored = self.find(position_key(BitBoard.from_board(board), player))
+        if index < 0:
+            return None
+
+        move = int(self.moves[index])
+        return PlayerAction(COLS - 1 - move if mirrored else move), float(self.scores[index])
+
+
+def load_book(path: str = DEFAULT_PATH) -> Optional[OpeningBook]:
+    '''
+    Opens a book if the file exists
+    '''
+    return OpeningBook(path) if os.path.exists(path) else None
+
+
+def write_book(path: str, entries: Dict[int, Tuple[PlayerAction, float]], ply: int, exact: bool = False,
+               heuristic: Optional[str] = None):
+    '''
+    Writes a book file
+    :param path: the file
+    :param entries: canonical key -> (move, score), with the move for the canonical position
+    :param ply: the maximal number of pieces of the positions
+    :param exact: whether the scores are exact (solver scores)
+    :param heuristic: the leaf evaluation the scores were searched with (None for exact books)
+    '''
+    keys = np.array(sorted(entries), dtype='<u8')
+    header = np.array([(MAGIC, VERSION, ply, exact, (heuristic or '').encode(), len(keys))], dtype=header_dtype)
+
+    with open(path, 'wb') as file:
+        header.tofile(file)
+        keys.tofile(file)
+        np.array([entries[key][1] for key in keys.tolist()], dtype='<f4').tofile(file)
+        np.array([entries[key][0] for key in keys.tolist()], dtype='i1').tofile(file)
+
+
+def best_move(position: BitBoard, player: BoardPiece, scorer: str, depth: int, heuristic: str
+) -> Tuple[PlayerAction, float]:
+    '''
+    Searches a position: center moves are preferred among moves with the same score
+    :param scorer: 'minimax' (heuristic scores, cf. iterativeDeepingSearch) or 'solver' (exact scores)
+    :param depth: the depth of the minimax search
+    :param heuristic: the leaf evaluation of the minimax search
+    :return: (move, score)
+    '''
+    if scorer == 'solver':
+        scores = Solver().analyze(position, player)
+        best = max(scores.values())
+        moves = [move for move, score in scores.items() if score == best]
+
+    elif scorer == 'minimax':
+        from agents.agent_minimax.minimax import iterativeDeepingSearch
+
+        with redirect_stdout(io.StringIO()):
+            scores, actions = iterativeDeepingSearch(position.to_board(), player, maxDepth=depth,
+                                                     heuristic_name=heuristic)
+        best, moves = scores[0], actions[0]
+
+    else:
+        raise ValueError("Unknown scorer: {}".format(scorer))
+
+    return next(move for move in CENTER_ORDER if move in moves), float(best)
+
+
+def generate_book(ply: int, scorer: str = 'minimax', depth: int = 8, heuristic: str = 'kernel', verbose: bool = False
+) -> Dict[int, Tuple[PlayerAction, float]]:
+    '''
+    Searches every position with at most ply pieces that can occur in a game
+    :param ply: the maximal number of pieces
+    :param scorer: cf. best_move
+    :param depth: cf. best_move
+    :param heuristic: cf. best_move
+    :param verbose: print the progress per ply
+    :return: the entries of the book (cf. write_book)
+    '''
+    entries = {}
+    positions = {canonical_key(BitBoard().key())[0]: BitBoard()}
+
+    for pieces in range(ply + 1):
+        player = PLAYER1 if pieces % 2 == 0 else PLAYER2
+        children = {}
+
+        for key, position in positions.items():
+            move, score = best_move(position, player, scorer, depth, heuristic)
+            #The stored position is the canonical one:
+            mirrored = position_key(position, player) != key
+            entries[key] = (COLS - 1 - move if mirrored else move, score)
+
+            if pieces == ply:
+                continue
+
+            for action in position.legal_moves():
+                child = position.copy().play(action, player)
+                if not child.connected_four(player):
+                    children.setdefault(canonical_key(position_key(child, player % 2 + 1))[0], child)
+
+        if verbose:
+            print("Ply {}: {} positions".format(pieces, len(positions)))
+        positions = children
+
+    return entries
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Builds an opening book")
+    parser.add_argument('--ply', type=int, default=4, help="the maximal number of pieces of the positions")
+    parser.add_argument('--scorer', choices=['minimax', 'solver'], default='minimax')
+    parser.add_argument('--depth', type=int, default=8, help="the depth of the minimax search")
+    parser.add_argument('--heuristic', default='kernel', help="the leaf evaluation of the minimax search")
+    parser.add_argument('--out', help="the book file (default: {} or, for the solver, {})".format(
+        os.path.basename(DEFAULT_PATH), os.path.basename(SOLVER_PATH)))
+    args = parser.parse_args(argv)
+
+    exact = args.scorer == 'solver'
+    out = args.out or (SOLVER_PATH if exact else DEFAULT_PATH)
+
+    entries = generate_book(args.ply, args.scorer, args.depth, args.heuristic, verbose=True)
+    write_book(out, entries, args.ply, exact=exact, heuristic=None if exact else args.heuristic)
+    print("{} positions written to {}".format(len(entries), out))
+
+
+if __name__ == '__main__':
+    main()
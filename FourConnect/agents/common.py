@@ -1,5 +1,4 @@
 import numpy as np
-import re
 
 import warnings
 
@@ -35,6 +34,32 @@ class GameState(Enum):
 class SavedState:
     pass
 
+# Events: the game loop and the agents report what they do (a move, the depth
+# of a search, ...) through emit, as an event name and keyword fields. The
+# fields go to the sink set with set_event_sink (cf. the sinks in main.py);
+# without a sink, emit does nothing, so the agents stay silent.
+EventSink = Callable[[str, dict], None]
+eventSink: Optional[EventSink] = None
+
+def set_event_sink(sink: Optional[EventSink]) -> Optional[EventSink]:
+    """
+    Sets the receiver of all events
+    :param sink: called with the event name and its fields, None to drop all events
+    :return: the previous sink
+    """
+    global eventSink
+    previous, eventSink = eventSink, sink
+    return previous
+
+def emit(event: str, **fields):
+    """
+    Reports an event to the sink, if there is one
+    :param event: the event name
+    :param fields: the data of the event (boards are passed as they are, sinks copy what they keep)
+    """
+    if eventSink is not None:
+        eventSink(event, fields)
+
 #TODO: Convert every to bitmap representation!!
 
 def initialize_game_state() -> np.ndarray:
@@ -44,57 +69,99 @@ def initialize_game_state() -> np.ndarray:
     """
     return np.zeros((6, 7), dtype=BoardPiece)
 
+# Board <-> string codec: lookup tables between cell values and the bytes of
+# their symbols, applied to whole arrays (np.frombuffer on the encoded string).
+SYMBOLS: bytes = b' XO' #SYMBOLS[piece] is the symbol of piece (noPlayer, PLAYER1, PLAYER2)
+ENCODE: np.ndarray = np.frombuffer(SYMBOLS, dtype=np.uint8)
+DECODE: np.ndarray = np.full(256, -1, dtype=BoardPiece) #byte -> piece, -1 for every other symbol
+DECODE[ENCODE] = [noPlayer, PLAYER1, PLAYER2]
+
+#The rendered board: every row is '|' + ('\t' + cell) * 7 + '\t|\n'
+ROW_TEMPLATE: np.ndarray = np.frombuffer(b'|' + b'\t ' * 7 + b'\t|\n', dtype=np.uint8)
+CELL_OFFSETS: np.ndarray = np.arange(2, 16, 2)
+BOTTOMTOP: str = '|' + '='*31 + '|' + '\n'
+LAST_ROW: str = '\t'.join(['|'] + [str(i) for i in range(7)]) + '\t|\n'
+
+def render_board(board: np.ndarray) -> str:
+    """
+    Renders the Four Connect board as a string, with the bottom row last
+    :param board: the board (6 x 7)
+    :return: a string representation of the board
+    """
+    rows = np.tile(ROW_TEMPLATE, (board.shape[0], 1))
+    rows[:, CELL_OFFSETS] = ENCODE[np.flipud(board).astype(np.intp)] #correct orientation
+
+    return BOTTOMTOP + rows.tobytes().decode('ascii') + BOTTOMTOP + LAST_ROW
+
 def pretty_print_board(board: np.ndarray):
 
     """
     Pretty-prints the Four Connect board
     :param board: the board to be printed
-    :return: a string representation of the board
+    :return: a string representation of the board (cf. render_board)
     """
+    ppBoard = render_board(board)
+    print(ppBoard)
 
-    flipBoard = np.flipud(board) #correct orientation
+    return ppBoard
 
-    # Separator for printed rows:
-    sepa = ('\t' + '|' + '\n')
 
-    # The bottom and the top of the playing board
-    bottomtop = '|' + '='*31 + '|' + '\n'
+def string_to_board(np_board: str) -> np.ndarray:
+    """
+    Takes a string representation of a board as input and return the respective array
+    :param np_board: the string representation of the board (cf. render_board)
+    :return: the board
+    """
 
-    # The last row:
-    lrow = sepa.join(['\t'.join(['|'] + [str(i) for i in range(7)])]) + sepa
+    #Decode all symbols at once, the frame, separators and column numbers decode to -1:
+    cells = DECODE[np.frombuffer(np_board.encode('ascii'), dtype=np.uint8)]
+    cells = cells[cells >= 0]
 
-    #Make a dictionary that converts keys into their board represenations:
-    board_rep = {str(PLAYER1): 'X', str(PLAYER2): 'O', str(noPlayer): ' '}
+    if len(cells) != 6 * 7:
+        raise BoardError("Expected 42 cells, found {}".format(len(cells)))
 
-    #Draw the board:
-    ppBoard = (sepa.join(['\t'.join (['|'] + [board_rep[str(int(cell))] for cell in row]) for row in flipBoard]))
-    ppBoard = bottomtop + ppBoard + sepa + bottomtop + lrow
+    return np.flipud(cells.reshape(6, 7)).copy()
 
-    print(ppBoard)
 
-    return ppBoard
+def moves_to_string(moves) -> str:
+    """
+    One-line notation of a position: the columns played, one digit per move, PLAYER1 first
+    :param moves: the columns played
+    :return: e.g. '3323'
+    """
+    return (np.asarray(moves, dtype=np.uint8) + ord('0')).tobytes().decode('ascii')
 
 
-def string_to_board(np_board: str) -> np.ndarray:
+def string_to_moves(notation: str) -> np.ndarray:
     """
-    Takes a string representation of a board as input and return the respective array
-    :param np_board: the string representation of the board
-    :return: the board
+    Reads the one-line notation of moves_to_string
+    :param notation: one digit per move
+    :return: the columns played
     """
+    moves = np.frombuffer(notation.encode('ascii'), dtype=np.uint8).astype(PlayerAction) - ord('0')
 
-    # Weed out all spurious symbols with pattern matching:
-    board = re.sub("[0-9]|=|\t|\n|\|",'', np_board)
+    if np.any((moves < 0) | (moves > 6)):
+        raise ColumnError("Invalid move notation: {}".format(notation))
 
-    # Make a dictionary that converts keys into their board representations
-    board_rep = {PLAYER1: 'X', PLAYER2: 'O', noPlayer: ' '}
+    return moves
 
-    #Get keys & values:
-    board_vals, board_keys = list(board_rep.keys()), list(board_rep.values())
 
-    #Decode string:
-    result = np.array(list(map(lambda key: board_vals[board_keys.index(key)], board))).reshape(6, 7)
+def moves_to_board(moves) -> np.ndarray:
+    """
+    Replays moves on an empty board
+    :param moves: the columns played, PLAYER1 first, or their one-line notation
+    :return: the board
+    """
+    if isinstance(moves, str):
+        moves = string_to_moves(moves)
 
-    return np.flipud(result)
+    board = initialize_game_state()
+    player = PLAYER1
+    for move in moves:
+        apply_player_action(board, PlayerAction(move), player)
+        player = PLAYER2 if player == PLAYER1 else PLAYER1
+
+    return board
 
 
 def apply_player_action(
@@ -123,27 +190,73 @@ def apply_player_action(
         raise ColumnError("Column already full")
         return board
 
-    bottom = np.min(np.where(board[:, action] == noPlayer))
+    bottom = (board[:, action] == noPlayer).argmax() #lowest open row
     board[bottom, action] = player
 
     return board
 
 
+def column_heights(board: np.ndarray) -> list:
+    """
+    Returns the number of pieces in every column of the board
+    :param board: the board
+    :return: a list with one height per column, to be used with make_move/unmake_move
+    """
+    return [int(height) for height in np.count_nonzero(board != noPlayer, axis=0)]
+
+
+def make_move(board: np.ndarray, heights: list, action: PlayerAction, player: BoardPiece) -> int:
+    """
+    In-place version of apply_player_action for search: no checks, no allocations.
+    The caller has to make sure that the column is not full
+    :param board: the board, modified in place
+    :param heights: the column heights of board (cf. column_heights), modified in place
+    :param action: the column
+    :param player: the player who's turn it is
+    :return: the row the piece was placed in
+    """
+    row = heights[action]
+    board[row, action] = player
+    heights[action] = row + 1
+
+    return row
+
+
+def unmake_move(board: np.ndarray, heights: list, action: PlayerAction) -> int:
+    """
+    Takes back the last piece played in a column (undo of make_move)
+    :param board: the board, modified in place
+    :param heights: the column heights of board, modified in place
+    :param action: the column
+    :return: the row the piece was removed from
+    """
+    row = heights[action] - 1
+    board[row, action] = noPlayer
+    heights[action] = row
+
+    return row
+
+
 def connected_four(
         board: np.ndarray, player: BoardPiece, last_action: Optional[PlayerAction] = None,
 ) -> GameState:
 
+    import agents.bitboard as bitboard
     import agents.connect_four as connect_four
 
     """
     Returns whether the game is a win for the current player
-    :param board: the board before last_action
+    :param board: the board after last_action
     :param player: the player
-    :param last_action: the last_action
+    :param last_action: the last_action, if given only the lines through
+    the piece it placed are checked
     :return:
     """
 
-    return connect_four.connected_four_iter(board, player, last_action)
+    if last_action is not None:
+        return connect_four.connected_four_last(board, player, last_action)
+
+    return bitboard.connected_four_bitboard(board, player)
 
 def check_end_state(
         board: np.ndarray, player: BoardPiece, last_action: Optional[PlayerAction] = None,
@@ -154,10 +267,28 @@ def check_end_state(
     or is play still on-going (GameState.STILL_PLAYING)?
     :param board:
     :param player:
-    :param last_action:
+    :param last_action: if given, only the piece it placed can have won the game
+    (assumes the game was still on before last_action)
     :return: The game state
     """
 
+    if last_action is not None:
+        import agents.connect_four as connect_four
+
+        winner = connect_four.last_action_winner(board, last_action)
+
+        if winner == noPlayer:
+            return GameState.STILL_PLAYING
+
+        elif winner == player:
+            return GameState.IS_WIN
+
+        elif winner > 0:
+            return GameState.IS_LOSS
+
+        else: #top row is full
+            return GameState.IS_DRAW
+
     if connected_four(board, player):
         return GameState.IS_WIN
 
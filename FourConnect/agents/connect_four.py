@@ -19,10 +19,81 @@ from agents.common import initialize_game_state, BoardPiece
 from agents.common import PlayerAction, connectN, players, PLAYER1, PLAYER2, noPlayer
 
 
+@njit()
+def top_row(board: np.ndarray, action: PlayerAction) -> int:
+    '''
+    Returns the row of the topmost piece in a column (-1 if the column is empty)
+    '''
+    row = board.shape[0] - 1
+    while row >= 0 and board[row, action] == noPlayer:
+        row -= 1
+    return row
+
+
+@njit()
+def connected_four_last(board: np.ndarray, player: BoardPiece, last_action: PlayerAction) -> bool:
+    '''
+    Only inspects the four lines through the piece placed by last_action, i.e. the
+    topmost piece of that column: O(connectN) instead of O(rows*cols*connectN).
+    Assumes that nobody had connectN pieces in a row before last_action
+    :param board: the board after last_action
+    :param player: the player for whom to check
+    :param last_action: the column of the last piece played
+    :return bool: has player completed connectN pieces in a row?
+    '''
+    rows, cols = board.shape
+    row = top_row(board, last_action)
+
+    if row < 0 or board[row, last_action] != player:
+        return False
+
+    for dr, dc in ((1, 0), (0, 1), (1, 1), (1, -1)):
+        count = 1
+
+        r, c = row + dr, last_action + dc
+        while 0 <= r < rows and 0 <= c < cols and board[r, c] == player:
+            count += 1
+            r, c = r + dr, c + dc
+
+        r, c = row - dr, last_action - dc
+        while 0 <= r < rows and 0 <= c < cols and board[r, c] == player:
+            count += 1
+            r, c = r - dr, c - dc
+
+        if count >= connectN:
+            return True
+
+    return False
+
+
+@njit()
+def last_action_winner(board: np.ndarray, last_action: PlayerAction) -> int:
+    '''
+    Fast path of check_end_state: decides the game from the piece placed by last_action
+    :param board: the board after last_action
+    :param last_action: the column of the last piece played
+    :return: the winning player, noPlayer if play is still on-going, -1 for a draw
+    '''
+    rows, cols = board.shape
+    last_player = board[top_row(board, last_action), last_action]
+
+    if connected_four_last(board, last_player, last_action):
+        return last_player
+
+    for j in range(cols):
+        if board[rows - 1, j] == noPlayer:
+            return noPlayer
+
+    return -1
+
+
 @njit()
 def connected_four_iter(
-    board: np.ndarray, player: BoardPiece, _last_action: Optional[PlayerAction] = None
+    board: np.ndarray, player: BoardPiece, last_action: Optional[PlayerAction] = None
 ) -> bool:
+    if last_action is not None:
+        return connected_four_last(board, player, last_action)
+
     rows, cols = board.shape
     rows_edge = rows - connectN + 1
     cols_edge = cols - connectN + 1
@@ -96,8 +167,10 @@ def estimate_running_times(numIters: int=10, numBoardIters: int=int(10e4)) -> Tu
     :return:
     '''
 
+    from agents.bitboard import connected_four_bitboard
+
     counter = 0
-    res1, res2 = np.zeros((2, numIters))
+    res1, res2, res3 = np.zeros((3, numIters))
 
     while counter < numIters:
         
@@ -122,9 +195,16 @@ def estimate_running_times(numIters: int=10, numBoardIters: int=int(10e4)) -> Tu
                                  player=player))
         res2[counter] / numBoardIters * 1e6
 
+        res3[counter] = timeit.timeit("connected_four_bitboard(board, player)",
+                    setup="connected_four_bitboard(board, player)",
+                    number=numBoardIters,
+                    globals=dict(connected_four_bitboard=connected_four_bitboard,
+                                 board=board,
+                                 player=player))
+
         counter += 1
 
-    return res1.mean(), res2.mean()
+    return res1.mean(), res2.mean(), res3.mean()
 
 
 #Iterative procedure far superior to flipping procedure:
@@ -133,6 +213,7 @@ runTimeEst = estimate_running_times()
 
 print(f"Python iteration-based: {runTimeEst[0]: .1f} us per call")
 print(f"Python flip-based: {runTimeEst[1]: .1f} us per call")
+print(f"Bitboard shift-based: {runTimeEst[2]: .1f} us per call")
 '''
 
 
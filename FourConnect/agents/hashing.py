@@ -8,42 +8,64 @@ from agents.heuristic import evaluateGame
 # Hash function that hashes board positions to bitstrings
 # to be used for transposition table in alphaBeta
 
-def zobr_myhash_init(board: np.ndarray) -> np.ndarray:
+ZOBRIST_SEED: int = 20200704
+
+def zobr_myhash_init(board: np.ndarray, seed: int = ZOBRIST_SEED) -> np.ndarray:
     '''
     Initialises the hash table with hash values
     :param board: the game board
-    :return: a hash table
+    :param seed: seed of the random generator, the same seed gives the same table
+    :return: a hash table of dtype uint64 with one value per cell and player
     '''
     i,j = board.shape
-    #Initialize the Hash table:
-    htable = np.zeros((i,j,2))
+    rng = np.random.default_rng(seed)
+
+    return rng.integers(0, 2**64, size=(i, j, 2), dtype=np.uint64)
 
-    for row in range(i):
-        for col in range(j):
-            for player in range(2):
-                htable[row, col, player] = np.random.randint(2**31-1, dtype=np.int64)
+def zobr_side_init(seed: int = ZOBRIST_SEED) -> np.uint64:
+    '''
+    Initialises the side-to-move key: it is part of the hash whenever PLAYER2 is to move
+    :param seed: seed of the random generator
+    :return: the key
+    '''
+    rng = np.random.default_rng([seed, 1])
 
-    return htable
+    return rng.integers(1, 2**64, dtype=np.uint64)
 
 board = cm.initialize_game_state()
 zobr_myhash = zobr_myhash_init(board)
+zobr_side = zobr_side_init()
 
-def hash_board(board: np.ndarray, htable: np.ndarray = zobr_myhash):
-
-    i,j,k = htable.shape
-    hashRes = 0
-
-    for row in range(i):
-        for col in range(j):
-
-            if board[row,col] == cm.PLAYER1:
-                hashRes ^= np.int64(htable[row,col,0])
-
-            elif board[row,col] == cm.PLAYER2:
-                hashRes ^= np.int64(htable[row,col,1])
-
-    return hashRes
+#Key of a move: the piece and the change of the side to move in a single value,
+#stored as python ints for the hot path: zobr_moves[row][col][player - 1]
+zobr_moves = (zobr_myhash ^ zobr_side).tolist()
 
+def hash_board(board: np.ndarray, htable: np.ndarray = zobr_myhash, player: Optional[cm.BoardPiece] = None,
+               side: np.uint64 = zobr_side) -> int:
+    '''
+    Computes the hash of a board from scratch
+    :param board: the board
+    :param htable: the hash table
+    :param player: the player to move, if given the side-to-move key is included
+    :param side: the side-to-move key
+    :return: the hash key
+    '''
+    hashRes = np.bitwise_xor.reduce(htable[..., 0][board == cm.PLAYER1]) \
+              ^ np.bitwise_xor.reduce(htable[..., 1][board == cm.PLAYER2])
 
+    if player == cm.PLAYER2:
+        hashRes ^= side
 
+    return int(hashRes)
 
+def hash_move(hashRes: int, row: int, action: cm.PlayerAction, player: cm.BoardPiece) -> int:
+    '''
+    Updates a hash for a move of player into board[row, action], including the
+    change of the side to move. The same XOR takes the move back again.
+    :param hashRes: the hash before the move
+    :param row: the row of the piece
+    :param action: the column of the piece
+    :param player: the player who made the move
+    :return: the hash after the move
+    '''
+    return hashRes ^ zobr_moves[row][action][player - 1]
@@ -1,10 +1,33 @@
 import numpy as np
 from typing import Optional
 from agents.common import GameState, BoardPiece, PLAYER1, PLAYER2, PlayerAction, check_end_state, noPlayer
-from agents.common import initialize_game_state
+from agents.common import initialize_game_state, connectN
 
 #TODO: add a small hashtable that stores positions that have already been explored
 
+# Kernel that assigns weights to pieces in the respective rows/columns
+colKernel = np.array([1, 2, 6, 12, 6, 2, 1])
+rowKernel = np.array([1,2,4,4,2,1])
+
+
+def evaluateGames(boards: np.ndarray, players: np.ndarray) -> np.ndarray:
+    '''
+    Evaluates a stack of boards in one pass (batched version of evaluateGame)
+    :param boards: np.ndarray with dimension : N x 6 x 7
+    :param players: the player to evaluate each board for, shape N (or a single player)
+    :return: np.ndarray with the N scores
+    '''
+    players = np.asarray(players).reshape(-1, 1, 1)
+    opponents = players % 2 + 1
+
+    #Heuristic that biases agent toward playing up the middle columns:
+    #+1 for own pieces, -1 for the opponent's, weighted by colKernel
+    pieces = (boards == players).view(np.int8) - (boards == opponents).view(np.int8)
+    colValue = np.einsum('nij,j->n', pieces, colKernel)
+
+    return .7*colValue + .3*colValue
+
+
 def  evaluateGame(board: np.ndarray, player: BoardPiece, lastMove: Optional[PlayerAction]) -> float:
     '''
     Evaluates boards that are not of any of the Game.State.STILL_PLAYING type
@@ -12,49 +35,133 @@ def  evaluateGame(board: np.ndarray, player: BoardPiece, lastMove: Optional[Play
     :return: a value that ideally representing the quality of the board
     '''
 
-    # Kernel that assigns weights to pieces in the respective rows/columns
-    colKernel = np.array([1, 2, 6, 12, 6, 2, 1])
-    rowKernel = np.array([1,2,4,4,2,1])
-    opponent = player % 2 + 1
+    return evaluateGames(board[np.newaxis], player)[0]
 
-    #Heuristic that biases agent toward playing up the middle columns:
-    def kernel_heuristic(board: np.ndarray, player: BoardPiece) -> float:
-        colValue = (np.where(board==player, 1, 0)*colKernel).sum() - (np.where(board==opponent, 1, 0)*colKernel).sum()
-        rowValue = (np.where(board.T==player, 1, 0)*rowKernel).sum() - (np.where(board.T==opponent, 1, 0)*rowKernel).sum()
 
-        return .7*colValue + .3*colValue
+#Threat-based heuristic: counts the lines of connectN cells that only one player
+#has pieces in (open two/three threats), from a precomputed table of all lines
 
-    #Heuristic that biases playing into columns with lots of free positions:
-    def sky_heuristic(board: np.ndarray, player: BoardPiece, lastMove: Optional[PlayerAction]) -> float:
-        if lastMove==None:
-            return 0
-        else:
-            clouds = np.where(board==noPlayer, 1, 0)
-            clouds = clouds.sum(axis=0)
-        return 70*clouds[lastMove] / clouds.sum()
+def make_lines(rows: int = 6, cols: int = 7, n: int = connectN) -> np.ndarray:
+    '''
+    Lists all lines of n cells in a row on the board
+    :return: np.ndarray of shape (numLines, n) with flat cell indices (row * cols + col)
+    '''
+    lines = []
+    for dr, dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+        for row in range(rows):
+            for col in range(cols):
+                cells = [(row + k*dr, col + k*dc) for k in range(n)]
+                if all(0 <= r < rows and 0 <= c < cols for r, c in cells):
+                    lines.append([r * cols + c for r, c in cells])
 
+    return np.array(lines)
 
-    #Heuristic that biases topping columns:
-    def top_heuristic(board: np.ndarray, player: BoardPiece) -> float:
+LINES = make_lines() #69 lines on the 6 x 7 board
+#The lines through every cell, for incremental updates:
+CELL_LINES = [[i for i, line in enumerate(LINES) if cell in line] for cell in range(42)]
 
-        mask = (board != noPlayer).argmax(axis=0) #get topmost non-zero elements
-        score = 0
+#Value of a line by the number of pieces of a player in it (if the opponent has none):
+threatWeights = np.array([0, 0, 1, 4, 0])
 
-        for (i,j) in zip(np.arange(7), mask):
-            score += colKernel[i] if mask[j]==player else -colKernel[i]
-        return score
 
-    #Heuristic that penalizes topping columns too early:
-    def tooQuickheuristic(board: np.ndarray, player: BoardPiece) -> float:
-        if np.count_nonzero(board)==41:
-            return 0
+def evaluateThreatsBatch(boards: np.ndarray, players: np.ndarray) -> np.ndarray:
+    '''
+    Threat heuristic for a stack of boards: open twos and threes of the player
+    minus those of the opponent
+    :param boards: np.ndarray with dimension : N x 6 x 7
+    :param players: the player to evaluate each board for, shape N (or a single player)
+    :return: np.ndarray with the N scores
+    '''
+    players = np.asarray(players).reshape(-1, 1)
+    cells = np.asarray(boards).reshape(-1, 42)[:, LINES] #N x 69 x 4
+
+    own = (cells == players[:, :, None]).sum(axis=2)
+    other = (cells == (players % 2 + 1)[:, :, None]).sum(axis=2)
+
+    return (np.where(other == 0, threatWeights[own], 0)
+            - np.where(own == 0, threatWeights[other], 0)).sum(axis=1).astype(float)
+
+
+def evaluateThreats(board: np.ndarray, player: BoardPiece, lastMove: Optional[PlayerAction]) -> float:
+    '''
+    Evaluates a board by the open threats of both players, cf. evaluateThreatsBatch
+    :param board: the board to be evaluated
+    :return: a value that ideally representing the quality of the board
+    '''
+    return evaluateThreatsBatch(board[np.newaxis], player)[0]
+
+
+class ThreatCounter:
+    '''
+    Keeps the piece counts of all lines up to date while pieces are placed and
+    removed, so that the threat heuristic is available in O(1)
+    :param board: the initial board
+    '''
+
+    def __init__(self, board: Optional[np.ndarray] = None):
+
+        board = initialize_game_state() if board is None else board
+        cells = board.reshape(42)[LINES]
+        self.counts = [[int(count) for count in (cells == player).sum(axis=1)] for player in (PLAYER1, PLAYER2)]
+        self.weights = [int(weight) for weight in threatWeights]
+        self.total = sum(self.line_value(line) for line in range(len(LINES))) #for PLAYER1
+
+    def line_value(self, line: int) -> int:
+        own, other = self.counts[0][line], self.counts[1][line]
+        if other == 0:
+            return self.weights[own]
+        elif own == 0:
+            return -self.weights[other]
         else:
-            return np.count_nonzero(board) * board[board==player].argmax(axis=0)
+            return 0
+
+    def place(self, row: int, col: int, player: BoardPiece) -> 'ThreatCounter':
+        counts = self.counts[player - 1]
+        for line in CELL_LINES[row * 7 + col]:
+            self.total -= self.line_value(line)
+            counts[line] += 1
+            self.total += self.line_value(line)
+        return self
+
+    def remove(self, row: int, col: int, player: BoardPiece) -> 'ThreatCounter':
+        counts = self.counts[player - 1]
+        for line in CELL_LINES[row * 7 + col]:
+            self.total -= self.line_value(line)
+            counts[line] -= 1
+            self.total += self.line_value(line)
+        return self
+
+    def score(self, player: BoardPiece) -> float:
+        return float(self.total if player == PLAYER1 else -self.total)
+
+
+#Heuristics that aren't part of evaluateGame:
+
+#Heuristic that biases playing into columns with lots of free positions:
+def sky_heuristic(board: np.ndarray, player: BoardPiece, lastMove: Optional[PlayerAction]) -> float:
+    if lastMove==None:
+        return 0
+    else:
+        clouds = np.where(board==noPlayer, 1, 0)
+        clouds = clouds.sum(axis=0)
+    return 70*clouds[lastMove] / clouds.sum()
 
-    #These aren't working spectacularly to be honest
 
-    return kernel_heuristic(board, player)
+#Heuristic that biases topping columns:
+def top_heuristic(board: np.ndarray, player: BoardPiece) -> float:
 
+    mask = (board != noPlayer).argmax(axis=0) #get topmost non-zero elements
+    score = 0
 
+    for (i,j) in zip(np.arange(7), mask):
+        score += colKernel[i] if mask[j]==player else -colKernel[i]
+    return score
 
+#Heuristic that penalizes topping columns too early:
+def tooQuickheuristic(board: np.ndarray, player: BoardPiece) -> float:
+    if np.count_nonzero(board)==41:
+        return 0
+    else:
+        return np.count_nonzero(board) * board[board==player].argmax(axis=0)
 
+#These aren't working spectacularly to be honest
@@ -0,0 +1,189 @@
+import numpy as np
+from typing import BinaryIO, Iterator, Sequence, Union
+
+from agents.common import PlayerAction, PLAYER1, PLAYER2, noPlayer
+from agents.common import initialize_game_state, apply_player_action
+from errors.errors import RecordError
+
+# Game records: a file of finished games in a few bytes each.
+#
+#   header (8 bytes): magic, version, reserved
+#   record:           number of moves n (1 byte), result (1 byte),
+#                     the moves, two per byte ((n + 1) // 2 bytes)
+#
+# A column fits into 4 bits: move 2i is stored in the low and move 2i + 1 in
+# the high nibble of byte i. The result is the winner (noPlayer for a draw)
+# or UNFINISHED. PLAYER1 makes the first move. A game of 42 moves takes 23
+# bytes, a typical game about a dozen.
+#
+# RecordWriter appends records to a file; read_records streams them back and
+# GameRecord.boards replays a game one move at a time.
+
+MAGIC: bytes = b'C4GR'
+VERSION: int = 1
+UNFINISHED: int = 3 #result of a game that was stopped before its end
+
+header_dtype = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('reserved', '<u2'),
+])
+
+
+def pack_moves(moves: Sequence[PlayerAction]) -> bytes:
+    '''
+    Packs a move sequence, two moves per byte
+    '''
+    moves = np.asarray(moves, dtype=np.uint8)
+    if np.any(moves > 15):
+        raise RecordError("Moves must fit into 4 bits")
+
+    padded = np.zeros(2 * ((len(moves) + 1) // 2), dtype=np.uint8)
+    padded[:len(moves)] = moves
+    return (padded[0::2] | (padded[1::2] << 4)).tobytes()
+
+
+def unpack_moves(data: bytes, n: int) -> np.ndarray:
+    '''
+    Unpacks n moves packed by pack_moves
+    '''
+    packed = np.frombuffer(data, dtype=np.uint8)
+    moves = np.empty(2 * len(packed), dtype=np.int8)
+    moves[0::2] = packed & 0x0F
+    moves[1::2] = packed >> 4
+    return moves[:n]
+
+
+class GameRecord:
+    '''
+    A recorded game
+    :param moves: the columns played, PLAYER1 first
+    :param result: the winner, noPlayer for a draw, UNFINISHED if the game was stopped
+    '''
+
+    def __init__(self, moves: Sequence[PlayerAction], result: int):
+        self.moves = np.asarray(moves, dtype=np.int8)
+        self.result = result
+
+    def __len__(self) -> int:
+        return len(self.moves)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, GameRecord) and self.result == other.result \
+               and np.array_equal(self.moves, other.moves)
+
+    def boards(self) -> Iterator[np.ndarray]:
+        '''
+        Replays the game: yields the board after every move. The same array is
+        updated in place between moves, copy it to keep a position.
+        '''
+        board = initialize_game_state()
+        player = PLAYER1
+        for move in self.moves:
+            apply_player_action(board, PlayerAction(move), player)
+            player = player % 2 + 1
+            yield board
+
+    def final_board(self) -> np.ndarray:
+        board = initialize_game_state()
+        for board in self.boards():
+            pass
+        return board.copy()
+
+
+def read_header(file: BinaryIO):
+    '''
+    Reads and checks the header of a record file
+    '''
+    raw = file.read(header_dtype.itemsize)
+    if len(raw) < header_dtype.itemsize:
+        raise RecordError("Not a game record file")
+
+    header = np.frombuffer(raw, dtype=header_dtype)
+    if header['magic'][0] != MAGIC:
+        raise RecordError("Not a game record file")
+    if header['version'][0] != VERSION:
+        raise RecordError("Unsupported record version: {}".format(header['version'][0]))
+
+
+class RecordWriter:
+    '''
+    Appends game records to a file, use as a context manager. The header is only
+    written to an empty file, the header of an existing file is checked.
+    :param file: a path (the file is created if it does not exist) or a binary file
+    opened for writing, positioned at its start or at the end of its records
+    '''
+
+    def __init__(self, file: Union[str, BinaryIO]):
+
+        self.ownFile = isinstance(file, str)
+        self.file = open(file, 'a+b') if self.ownFile else file
+        self.count = 0 #the records written by this writer
+
+        if self.file.tell() == 0:
+            header = np.zeros(1, dtype=header_dtype)
+            header['magic'], header['version'] = MAGIC, VERSION
+            self.file.write(header.tobytes())
+
+        elif self.ownFile:
+            #Writes still go to the end of the file:
+            self.file.seek(0)
+            try:
+                read_header(self.file)
+            except RecordError:
+                self.file.close()
+                raise
+
+    def write(self, moves: Sequence[PlayerAction], result: int):
+        '''
+        Appends one game
+        :param moves: the columns played, PLAYER1 first
+        :param result: the winner, noPlayer for a draw, UNFINISHED if the game was stopped
+        '''
+        if len(moves) > 255:
+            raise RecordError("Too many moves: {}".format(len(moves)))
+        if result not in (noPlayer, PLAYER1, PLAYER2, UNFINISHED):
+            raise RecordError("Unknown result: {}".format(result))
+
+        self.file.write(bytes((len(moves), int(result))) + pack_moves(moves))
+        self.count += 1
+
+    def close(self):
+        if self.ownFile:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self) -> 'RecordWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(file: Union[str, BinaryIO]) -> Iterator[GameRecord]:
+    '''
+    Reads game records one at a time
+    :param file: a path or a binary file opened for reading, positioned at the header
+    :return: a generator of GameRecord
+    '''
+    f = open(file, 'rb') if isinstance(file, str) else file
+
+    try:
+        read_header(f)
+
+        while True:
+            prefix = f.read(2)
+            if len(prefix) == 0:
+                return
+
+            n = prefix[0]
+            data = f.read((n + 1) // 2)
+            if len(prefix) < 2 or len(data) < (n + 1) // 2:
+                raise RecordError("Truncated record")
+
+            yield GameRecord(unpack_moves(data, n), prefix[1])
+
+    finally:
+        if isinstance(file, str):
+            f.close()
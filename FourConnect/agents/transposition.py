@@ -0,0 +1,139 @@
+import numpy as np
+from enum import IntEnum
+from typing import Optional, Tuple
+
+# Transposition table for the alpha-beta search: a fixed-size array of entries,
+# indexed by the low bits of the position's hash key. Every index holds two
+# buckets, bucket 0 is depth-preferred (only replaced by searches that are at
+# least as deep), bucket 1 is always replaced.
+#
+# The table may be shared between processes without a lock (Lazy SMP, cf.
+# agent_minimax/parallel.py), so an entry can be read while another process
+# writes it. Entries are therefore validated like in lockless hashing: the key
+# is not stored as such but XORed with the data of the entry (the bits of the
+# score and the packed depth, flag and move). A probe only returns an entry if
+# the lock it reads matches the data it reads, a torn entry is a miss.
+
+class Bound(IntEnum):
+    EXACT = 0 #the score is the exact value of the position
+    LOWER = 1 #the search failed high: the value is at least the score
+    UPPER = 2 #the search failed low: the value is at most the score
+
+entry_dtype = np.dtype([
+    ('lock', np.uint64), #key ^ bits ^ data
+    ('score', np.float64),
+    ('depth', np.int16),
+    ('flag', np.int8),
+    ('move', np.int8),
+])
+
+#The same entries as raw words: the bits of the score, depth/flag/move packed into data
+raw_dtype = np.dtype({'names': ['lock', 'bits', 'data'],
+                      'formats': [np.uint64, np.uint64, np.uint32],
+                      'offsets': [0, 8, 16],
+                      'itemsize': entry_dtype.itemsize})
+
+NO_MOVE: int = -1
+
+
+class TranspositionTable:
+    '''
+    Fixed-size, array-backed transposition table.
+    Scores are stored from the point of view of the player to move.
+    :param size: number of indices (rounded up to a power of two), each holding two buckets
+    :param buffer: optional memory to place the table in, must hold size * 2 entries
+    '''
+
+    def __init__(self, size: int = 2**16, buffer=None):
+
+        self.size = 1 << max(0, int(size) - 1).bit_length()
+        self.mask = self.size - 1
+
+        if buffer is None:
+            self.table = np.zeros((self.size, 2), dtype=entry_dtype)
+            self.clear()
+        else:
+            self.table = np.ndarray((self.size, 2), dtype=entry_dtype, buffer=buffer)
+
+        #Views on the fields of the table, for faster element access:
+        raw = self.table.view(raw_dtype)
+        self.locks = raw['lock']
+        self.bits = raw['bits']
+        self.data = raw['data']
+        self.depths = self.table['depth']
+
+    @staticmethod
+    def nbytes(size: int) -> int:
+        '''
+        Returns the number of bytes needed for a table with size indices
+        '''
+        return (1 << max(0, int(size) - 1).bit_length()) * 2 * entry_dtype.itemsize
+
+    @staticmethod
+    def pack(depth: int, flag: Bound, move: int) -> int:
+        '''
+        Packs depth, flag and move like they are laid out in an entry (little-endian)
+        '''
+        return (depth & 0xFFFF) | (int(flag) << 16) | ((move & 0xFF) << 24)
+
+    @staticmethod
+    def unpack(data: int) -> Tuple[int, Bound, int]:
+        '''
+        Returns (depth, flag, move) of a packed entry
+        '''
+        depth, move = data & 0xFFFF, data >> 24
+        return depth - 0x10000 * (depth >= 0x8000), Bound((data >> 16) & 0xFF), move - 0x100 * (move >= 0x80)
+
+    def stored_key(self, index: int, bucket: int) -> int:
+        return int(self.locks[index, bucket]) ^ int(self.bits[index, bucket]) ^ int(self.data[index, bucket])
+
+    def clear(self):
+        self.table['lock'] = 0
+        self.table['score'] = 0
+        self.table['depth'] = -1 #marks empty buckets
+        self.table['flag'] = Bound.EXACT
+        self.table['move'] = NO_MOVE
+        return self
+
+    def probe(self, key: int) -> Optional[Tuple[float, int, Bound, int]]:
+        '''
+        Looks up a position
+        :param key: the hash key of the position
+        :return: (score, depth, flag, move) if the position is stored, None otherwise
+        '''
+        index = key & self.mask
+
+        for bucket in (0, 1):
+            #Read every word once: the entry may be overwritten meanwhile
+            lock, bits, data = self.locks[index, bucket], self.bits[index, bucket], self.data[index, bucket]
+
+            if int(lock) ^ int(bits) ^ int(data) == key:
+                depth, flag, move = self.unpack(int(data))
+                if depth >= 0:
+                    return float(bits.view(np.float64)), depth, flag, move
+
+        return None
+
+    def store(self, key: int, depth: int, score: float, flag: Bound, move: int = NO_MOVE):
+        '''
+        Stores the result of a search
+        :param key: the hash key of the position
+        :param depth: the remaining depth the position was searched to
+        :param score: the score, from the point of view of the player to move
+        :param flag: whether score is exact, a lower or an upper bound
+        :param move: the best move found (NO_MOVE if there is none)
+        '''
+        index = key & self.mask
+
+        #depth-preferred bucket: keep deeper results of other positions
+        bucket = 0 if (depth >= self.depths[index, 0] or self.stored_key(index, 0) == key) else 1
+
+        bits = int(np.float64(score).view(np.uint64))
+        data = self.pack(depth, flag, move)
+
+        #The order of the writes does not matter, a mix of two entries fails the check in probe:
+        self.bits[index, bucket] = bits
+        self.data[index, bucket] = data
+        self.locks[index, bucket] = key ^ bits ^ data
+
+        return self
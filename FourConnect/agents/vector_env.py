@@ -0,0 +1,154 @@
+import numpy as np
+from typing import Optional, Tuple
+
+from agents.common import BoardPiece, PLAYER1, PLAYER2, noPlayer
+from agents.bitboard import ROWS, COLS, STRIDE, bit_weights
+from errors.errors import ColumnError, BoardError
+
+# Vectorised environment: N games at once, every game as two uint64 bitboards
+# in the layout of bitboard.py (bit col * STRIDE + row). A step plays one move
+# in every game with a few array operations over all games, the win test is
+# connected_four_mask with the shifts applied to the whole array of masks.
+# PLAYER1 moves first in every game, so the player to move follows from the
+# number of pieces. Finished games are reset after the step that ended them.
+
+SHIFTS = tuple(np.uint64(shift) for shift in (1, STRIDE, STRIDE - 1, STRIDE + 1))
+COLUMN_BASE: np.ndarray = np.arange(COLS) * STRIDE #bit index of the bottom cell of each column
+
+
+def connected_four_masks(masks: np.ndarray) -> np.ndarray:
+    '''
+    Vectorised connected_four_mask (cf. bitboard.py)
+    :param masks: uint64 bitmasks of one player's pieces, any shape
+    :return: boolean array, True where a mask contains connectN pieces in a row
+    '''
+    found = np.zeros(masks.shape, dtype=bool)
+    for shift in SHIFTS:
+        pairs = masks & (masks >> shift)
+        found |= (pairs & (pairs >> (shift + shift))) != 0
+    return found
+
+
+class VectorEnv:
+    '''
+    A batch of games that advance in lockstep
+    :param numEnvs: the number of games
+    :param seed: the seed of the generator for random_actions
+    :param autoReset: if True, a game is reset after the step that ended it
+    '''
+
+    def __init__(self, numEnvs: int, seed: Optional[int] = None, autoReset: bool = True):
+
+        self.numEnvs = numEnvs
+        self.autoReset = autoReset
+        self.rng = np.random.default_rng(seed)
+        self.envs = np.arange(numEnvs)
+
+        self.masks = np.zeros((numEnvs, 2), dtype=np.uint64) #masks[:, player - 1]
+        self.heights = np.zeros((numEnvs, COLS), dtype=np.int64) #bit index of the lowest free cell
+        self.nMoves = np.zeros(numEnvs, dtype=np.int64)
+        self.reset()
+
+    def reset(self, envs: Optional[np.ndarray] = None) -> 'VectorEnv':
+        '''
+        Empties the boards
+        :param envs: the games to reset (indices or a boolean mask), all if None
+        '''
+        envs = slice(None) if envs is None else envs
+        self.masks[envs] = 0
+        self.heights[envs] = COLUMN_BASE
+        self.nMoves[envs] = 0
+        return self
+
+    def players(self) -> np.ndarray:
+        '''
+        Returns the player to move in every game
+        '''
+        return (PLAYER1 + self.nMoves % 2).astype(BoardPiece)
+
+    def legal_moves(self) -> np.ndarray:
+        '''
+        Returns a boolean array of shape (numEnvs, COLS), True for the columns that are not full
+        '''
+        return self.heights < COLUMN_BASE + ROWS
+
+    def random_actions(self) -> np.ndarray:
+        '''
+        Draws a legal move in every game, uniformly
+        '''
+        keys = self.rng.random((self.numEnvs, COLS))
+        keys[~self.legal_moves()] = -1
+        return keys.argmax(axis=1)
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        '''
+        Plays one move in every game
+        :param actions: the column to play in every game, shape (numEnvs,)
+        :return: done: True for the games that ended with this move,
+        winners: the player who won them (noPlayer for a draw or a running game)
+        '''
+        actions = np.asarray(actions, dtype=np.int64)
+        bits = self.heights[self.envs, actions]
+        if np.any(bits >= COLUMN_BASE[actions] + ROWS):
+            raise ColumnError("Column already full")
+
+        movers = self.nMoves % 2
+        self.masks[self.envs, movers] |= np.left_shift(np.uint64(1), bits.astype(np.uint64))
+        self.heights[self.envs, actions] += 1
+        self.nMoves += 1
+
+        won = connected_four_masks(self.masks[self.envs, movers])
+        done = won | (self.nMoves == ROWS * COLS)
+        winners = np.where(won, movers + PLAYER1, noPlayer).astype(BoardPiece)
+
+        if self.autoReset and done.any():
+            self.reset(done)
+
+        return done, winners
+
+    def play_random(self, numSteps: int) -> np.ndarray:
+        '''
+        Plays random moves in all games
+        :param numSteps: the number of steps
+        :return: the outcomes of the games that ended: the number of draws, wins of PLAYER1 and wins of PLAYER2
+        '''
+        counts = np.zeros(3, dtype=np.int64)
+        for i in range(numSteps):
+            done, winners = self.step(self.random_actions())
+            counts += np.bincount(winners[done], minlength=3)
+        return counts
+
+    #Conversion from and to the ndarray layout:
+
+    @staticmethod
+    def from_boards(boards: np.ndarray, autoReset: bool = True, seed: Optional[int] = None) -> 'VectorEnv':
+        '''
+        Builds the environment from boards as returned by initialize_game_state
+        :param boards: np.ndarray of shape (numEnvs, 6, 7), the games must still be running
+        :return: the environment
+        '''
+        if boards.ndim != 3 or boards.shape[1:] != (ROWS, COLS):
+            raise BoardError("Boards must have shape (n, {}, {})".format(ROWS, COLS))
+
+        env = VectorEnv(len(boards), seed, autoReset)
+        weights = bit_weights((ROWS, COLS))
+        for player in (PLAYER1, PLAYER2):
+            env.masks[:, player - 1] = np.bitwise_or.reduce(np.where(boards == player, weights, np.uint64(0)),
+                                                            axis=(1, 2))
+
+        pieces = np.count_nonzero(boards != noPlayer, axis=1)
+        env.heights[:] = COLUMN_BASE + pieces
+        env.nMoves[:] = pieces.sum(axis=1)
+
+        return env
+
+    def to_boards(self) -> np.ndarray:
+        '''
+        Converts the games into the ndarray layout
+        :return: np.ndarray of shape (numEnvs, 6, 7)
+        '''
+        weights = bit_weights((ROWS, COLS))
+        boards = np.zeros((self.numEnvs, ROWS, COLS), dtype=BoardPiece)
+        for player in (PLAYER1, PLAYER2):
+            boards[(self.masks[:, player - 1, None, None] & weights) != 0] = player
+        return boards
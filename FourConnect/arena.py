@@ -0,0 +1,232 @@
+import io
+import sys
+import time
+import inspect
+import importlib
+import argparse
+import multiprocessing
+import numpy as np
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+from agents.common import GenMove, PLAYER1, PLAYER2, noPlayer, GameState
+from agents.common import initialize_game_state, apply_player_action, check_end_state
+
+# Headless arena: plays games between two agents (GenMove functions) without
+# printing, optionally in a pool of worker processes, and collects the results,
+# the time per move and, for agents that accept a stats_callback (minimax), the
+# number of searched nodes.
+#
+# Game i is played with the seed seed + i (numpy's generator and the generator
+# of the MCTS rollouts), and agent 1 moves first in the even games. Agents and
+# their arguments are sent to the workers, so they must be picklable (e.g.
+# module-level functions).
+#
+# Run e.g.: python arena.py minimax random --games 20 --workers 4
+
+AGENTS: Dict[str, str] = {
+    'random': 'agents.agent_random',
+    'minimax': 'agents.agent_minimax',
+    'mcts': 'agents.agent_mcts.mcts',
+    'solver': 'agents.agent_solver',
+}
+
+
+def get_agent(name: str) -> GenMove:
+    '''
+    Returns the generate_move function of an agent, cf. AGENTS
+    '''
+    if name not in AGENTS:
+        raise ValueError("Unknown agent: {}".format(name))
+    return importlib.import_module(AGENTS[name]).generate_move
+
+
+def accepts_stats(agent: GenMove) -> bool:
+    try:
+        return 'stats_callback' in inspect.signature(agent).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def seed_game(seed: int):
+    '''
+    Seeds numpy's generator and, if it is loaded, the generator of the MCTS rollouts
+    '''
+    np.random.seed(seed)
+    if 'agents.agent_mcts.rollout' in sys.modules:
+        sys.modules['agents.agent_mcts.rollout'].seed(seed)
+
+
+def play_game(agent_1: GenMove, agent_2: GenMove, args_1: tuple, args_2: tuple, agent_1_first: bool,
+              seed: int) -> dict:
+    '''
+    Plays one game, without output
+    :param agent_1: the first agent
+    :param agent_2: the second agent
+    :param args_1: further arguments of agent_1
+    :param args_2: further arguments of agent_2
+    :param agent_1_first: True if agent_1 plays PLAYER1
+    :param seed: the seed of the game
+    :return: the result: 'winner' (1, 2: the agent, 0: draw), 'moves' (the columns played),
+    'illegal' (whether the loser made an illegal move) and per agent 'times' (seconds per move),
+    'nodes' (searched nodes per move, None if not reported)
+    '''
+    seed_game(seed)
+
+    agents = (agent_1, agent_2) if agent_1_first else (agent_2, agent_1)
+    args = (args_1, args_2) if agent_1_first else (args_2, args_1)
+    index = {PLAYER1: 1 if agent_1_first else 2, PLAYER2: 2 if agent_1_first else 1}
+
+    result = {'winner': 0, 'moves': [], 'illegal': False,
+              'times': {1: [], 2: []}, 'nodes': {1: [], 2: []}}
+    saved_state = {PLAYER1: None, PLAYER2: None}
+    board = initialize_game_state()
+
+    with redirect_stdout(io.StringIO()):
+        while True:
+            for player, agent, agentArgs in zip((PLAYER1, PLAYER2), agents, args):
+                searched = []
+                kwargs = {'stats_callback': searched.append} if accepts_stats(agent) else {}
+
+                t0 = time.perf_counter()
+                action, saved_state[player] = agent(board.copy(), player, saved_state[player], *agentArgs, **kwargs)
+                result['times'][index[player]].append(time.perf_counter() - t0)
+                result['nodes'][index[player]].append(searched[0].total_nodes() if searched else None)
+
+                action = int(action)
+                if not (0 <= action < board.shape[1] and board[-1, action] == noPlayer):
+                    result['winner'], result['illegal'] = index[player % 2 + 1], True
+                    return result
+
+                apply_player_action(board, action, player)
+                result['moves'].append(action)
+
+                end_state = check_end_state(board, player)
+                if end_state == GameState.IS_WIN:
+                    result['winner'] = index[player]
+                    return result
+                elif end_state == GameState.IS_DRAW:
+                    return result
+
+
+class ArenaStats:
+    '''
+    Results of an arena run, from the point of view of agent 1
+    :param games: the results of the games (cf. play_game)
+    :param elapsed: the wall-clock time of the run in seconds
+    '''
+
+    def __init__(self, games: List[dict], elapsed: float):
+        self.games = games
+        self.elapsed = elapsed
+
+        winners = np.array([game['winner'] for game in games], dtype=int)
+        self.wins = int(np.sum(winners == 1))
+        self.draws = int(np.sum(winners == 0))
+        self.losses = int(np.sum(winners == 2))
+        self.illegal = sum(game['illegal'] for game in games)
+
+    def times(self, agent: int) -> np.ndarray:
+        '''
+        Returns the times per move of an agent (1 or 2), in seconds
+        '''
+        return np.array([t for game in self.games for t in game['times'][agent]])
+
+    def latency_percentiles(self, agent: int, q: Sequence[float] = (50, 90, 99)) -> Dict[float, float]:
+        '''
+        Returns percentiles of the time per move of an agent, in ms
+        '''
+        times = self.times(agent)
+        if len(times) == 0:
+            return {p: float('nan') for p in q}
+        return {p: float(v) * 1000 for p, v in zip(q, np.percentile(times, q))}
+
+    def nodes_per_second(self, agent: int) -> Optional[float]:
+        '''
+        Returns the searched nodes per second of an agent, over the moves for which it reported them
+        '''
+        nodes = [(n, t) for game in self.games for n, t in zip(game['nodes'][agent], game['times'][agent])
+                 if n is not None]
+        if not nodes:
+            return None
+        totalTime = sum(t for _, t in nodes)
+        return sum(n for n, _ in nodes) / totalTime if totalTime > 0 else 0.
+
+    def games_per_second(self) -> float:
+        return len(self.games) / self.elapsed if self.elapsed > 0 else 0.
+
+    def score(self) -> float:
+        '''
+        Returns the score of agent 1: wins plus half the draws, per game
+        '''
+        return (self.wins + .5 * self.draws) / len(self.games) if self.games else 0.
+
+    def as_dict(self) -> dict:
+        return {
+            'games': len(self.games),
+            'wins': self.wins,
+            'draws': self.draws,
+            'losses': self.losses,
+            'illegal': self.illegal,
+            'score': self.score(),
+            'latency_ms': {agent: self.latency_percentiles(agent) for agent in (1, 2)},
+            'nodes_per_second': {agent: self.nodes_per_second(agent) for agent in (1, 2)},
+            'games_per_second': self.games_per_second(),
+        }
+
+    def __str__(self) -> str:
+        lines = ["Games: {} (W/D/L for agent 1: {}/{}/{}, {} illegal), {:.2f} games/s".format(
+            len(self.games), self.wins, self.draws, self.losses, self.illegal, self.games_per_second())]
+
+        for agent in (1, 2):
+            latency = ", ".join("p{:g} {:.1f}".format(p, v) for p, v in self.latency_percentiles(agent).items())
+            nps = self.nodes_per_second(agent)
+            lines.append("Agent {}: latency (ms) {}{}".format(
+                agent, latency, "" if nps is None else ", {:.0f} nodes/s".format(nps)))
+
+        return "\n".join(lines)
+
+
+def run_arena(agent_1: GenMove, agent_2: GenMove, numGames: int = 10, workers: int = 1,
+              args_1: tuple = (), args_2: tuple = (), seed: int = 0) -> ArenaStats:
+    '''
+    Plays games between two agents
+    :param agent_1: the first agent
+    :param agent_2: the second agent
+    :param numGames: the number of games, agent_1 moves first in the even ones
+    :param workers: the number of worker processes (the games are played in this process if 1)
+    :param args_1: further arguments of agent_1
+    :param args_2: further arguments of agent_2
+    :param seed: game i is played with seed + i
+    :return: the statistics of the run
+    '''
+    tasks = [(agent_1, agent_2, args_1, args_2, i % 2 == 0, seed + i) for i in range(numGames)]
+    start = time.perf_counter()
+
+    if workers > 1:
+        #Spawned like the search pools, cf. agents/agent_minimax/parallel.py
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            games = list(pool.map(play_game, *zip(*tasks)))
+    else:
+        games = [play_game(*task) for task in tasks]
+
+    return ArenaStats(games, time.perf_counter() - start)
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(description="Plays games between two agents")
+    parser.add_argument('agent_1', choices=list(AGENTS))
+    parser.add_argument('agent_2', choices=list(AGENTS))
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    stats = run_arena(get_agent(args.agent_1), get_agent(args.agent_2), args.games, args.workers, seed=args.seed)
+    print(stats)
+
+
+if __name__ == '__main__':
+    main()
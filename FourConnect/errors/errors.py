@@ -25,3 +25,41 @@ class BoardError(Error):
         else:
             return 'BoardError'
 
+
+class TimeOutError(Error):
+
+    def __init__ (self, *args):
+
+        self.message = args[0] if args else None
+
+    def __str__(self):
+        if self.message:
+            return 'TimeOutError, {}'.format(self.message)
+        else:
+            return 'TimeOutError'
+
+
+class BookError(Error):
+
+    def __init__ (self, *args):
+
+        self.message = args[0] if args else None
+
+    def __str__(self):
+        if self.message:
+            return 'BookError, {}'.format(self.message)
+        else:
+            return 'BookError'
+
+
+class RecordError(Error):
+
+    def __init__ (self, *args):
+
+        self.message = args[0] if args else None
+
+    def __str__(self):
+        if self.message:
+            return 'RecordError, {}'.format(self.message)
+        else:
+            return 'RecordError'
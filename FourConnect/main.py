@@ -1,8 +1,109 @@
+import sys
+import json
+import time
+import logging
 import numpy as np
-from typing import Optional, Callable
-from agents.common import PlayerAction, BoardPiece, SavedState, GenMove
+from typing import Optional, Callable, TextIO, Union
+from agents.common import PlayerAction, BoardPiece, SavedState, GenMove, EventSink, PLAYER1, noPlayer
+from agents.common import render_board, set_event_sink
 from agents.agent_minimax.minimax import generate_move_alphaBeta as generate_move
 
+# Event sinks: human_vs_agent and the agents report through agents.common.emit,
+# the sink passed to human_vs_agent decides what happens with the events:
+#
+#   'turn'         board, player, name         before a player moves
+#   'move'         board (before the move), player, name, action, time (s)
+#   'game_end'     board, winner (noPlayer for a draw), name (of the winner)
+#   'iteration'    depth, timed_out            minimax: the completed search depth
+#   'mcts_root'    engine, board, player, reused, visits
+#   'mcts_search'  engine, iterations, visits, ...
+#
+# ConsoleSink shows the game to a human player, null_sink drops everything,
+# LoggingSink and JsonLinesSink record all events.
+
+
+def json_default(value):
+    '''
+    Converts numpy values for json.dumps
+    '''
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Not serializable: {}".format(type(value)))
+
+
+def null_sink(event: str, fields: dict):
+    pass
+
+
+class ConsoleSink:
+    '''
+    Prints the game for a human player: the board before every move, the move times and the result
+    :param file: the output stream (sys.stdout if None)
+    '''
+
+    def __init__(self, file: Optional[TextIO] = None):
+        self.file = file
+
+    def __call__(self, event: str, fields: dict):
+        file = self.file if self.file is not None else sys.stdout
+
+        if event == 'turn':
+            print(render_board(fields['board']), file=file)
+            print(f'{fields["name"]} you are playing with {"X" if fields["player"] == PLAYER1 else "O"}', file=file)
+        elif event == 'move':
+            print(f"Move time: {fields['time']:.3f}s", file=file)
+        elif event == 'game_end':
+            print(render_board(fields['board']), file=file)
+            if fields['winner'] == noPlayer:
+                print("Game ended in draw", file=file)
+            else:
+                print(f'{fields["name"]} won playing {"X" if fields["winner"] == PLAYER1 else "O"}', file=file)
+
+
+class LoggingSink:
+    '''
+    Logs every event on one line: the event name and its fields as JSON
+    :param logger: the logger (the 'fourconnect' logger if None)
+    :param level: the level of the records
+    '''
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.logger = logger if logger is not None else logging.getLogger('fourconnect')
+        self.level = level
+
+    def __call__(self, event: str, fields: dict):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s %s", event, json.dumps(fields, default=json_default))
+
+
+class JsonLinesSink:
+    '''
+    Writes every event as a JSON object on its own line, with its name and a timestamp.
+    The writes are buffered, call close (or flush) to get them out.
+    :param file: a path (appended to) or a text stream
+    '''
+
+    def __init__(self, file: Union[str, TextIO]):
+        self.ownFile = isinstance(file, str)
+        self.file = open(file, 'a') if self.ownFile else file
+
+    def __call__(self, event: str, fields: dict):
+        record = {'event': event, 'time': time.time()}
+        record.update(fields)
+        self.file.write(json.dumps(record, default=json_default) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        if self.ownFile:
+            self.file.close()
+        else:
+            self.file.flush()
+
+
 def user_move(board: np.ndarray, _player: BoardPiece, saved_state: Optional[SavedState]):
     action = PlayerAction(-1)
     while not 0 <= action < board.shape[1]:
@@ -22,48 +123,50 @@ def human_vs_agent(
     args_2: tuple = (),
     init_1: Callable = lambda board, player: None,
     init_2: Callable = lambda board, player: None,
+    sink: Optional[EventSink] = None,
 ):
-    import time
+    '''
+    Plays two games between two agents (a human player is an agent too, cf. user_move), each agent moves first once
+    :param sink: receives the events of the games and of the agents, a ConsoleSink if None (null_sink: silent)
+    '''
     from agents.common import PLAYER1, PLAYER2, GameState
-    from agents.common import initialize_game_state, pretty_print_board, apply_player_action, check_end_state
-
-    players = (PLAYER1, PLAYER2)
-    for play_first in (1, -1):
-        for init, player in zip((init_1, init_2)[::play_first], players):
-            init(initialize_game_state(), player)
-
-        saved_state = {PLAYER1: None, PLAYER2: None}
-        board = initialize_game_state()
-        gen_moves = (generate_move_1, generate_move_2)[::play_first]
-        player_names = (player_1, player_2)[::play_first]
-        gen_args = (args_1, args_2)[::play_first]
-
-        playing = True
-        while playing:
-            for player, player_name, gen_move, args in zip(
-                players, player_names, gen_moves, gen_args,
-            ):
-                t0 = time.time()
-                print(pretty_print_board(board))
-                print(
-                    f'{player_name} you are playing with {"X" if player == PLAYER1 else "O"}'
-                )
-                action, saved_state[player] = gen_move(
-                    board.copy(), player, saved_state[player], *args
-                )
-                print(f"Move time: {time.time() - t0:.3f}s")
-                apply_player_action(board, action, player)
-                end_state = check_end_state(board, player)
-                if end_state != GameState.STILL_PLAYING:
-                    print(pretty_print_board(board))
-                    if end_state == GameState.IS_DRAW:
-                        print("Game ended in draw")
-                    else:
-                        print(
-                            f'{player_name} won playing {"X" if player == PLAYER1 else "O"}'
-                        )
-                    playing = False
-                    break
+    from agents.common import initialize_game_state, apply_player_action, check_end_state, emit
+
+    previous = set_event_sink(sink if sink is not None else ConsoleSink())
+    try:
+        players = (PLAYER1, PLAYER2)
+        for play_first in (1, -1):
+            for init, player in zip((init_1, init_2)[::play_first], players):
+                init(initialize_game_state(), player)
+
+            saved_state = {PLAYER1: None, PLAYER2: None}
+            board = initialize_game_state()
+            gen_moves = (generate_move_1, generate_move_2)[::play_first]
+            player_names = (player_1, player_2)[::play_first]
+            gen_args = (args_1, args_2)[::play_first]
+
+            playing = True
+            while playing:
+                for player, player_name, gen_move, args in zip(
+                    players, player_names, gen_moves, gen_args,
+                ):
+                    t0 = time.time()
+                    emit('turn', board=board, player=player, name=player_name)
+                    action, saved_state[player] = gen_move(
+                        board.copy(), player, saved_state[player], *args
+                    )
+                    emit('move', board=board, player=player, name=player_name, action=action,
+                         time=time.time() - t0)
+                    apply_player_action(board, action, player)
+                    end_state = check_end_state(board, player)
+                    if end_state != GameState.STILL_PLAYING:
+                        winner = noPlayer if end_state == GameState.IS_DRAW else player
+                        emit('game_end', board=board, winner=winner, name=player_name)
+                        playing = False
+                        break
+
+    finally:
+        set_event_sink(previous)
 
 if __name__ == "__main__":
 
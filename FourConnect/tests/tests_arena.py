@@ -0,0 +1,65 @@
+import numpy as np
+import unittest
+from typing import Optional
+import agents.common as cm
+from agents.agent_random import generate_move as random_move
+from agents.agent_minimax import generate_move as minimax_move
+from arena import run_arena, play_game, get_agent
+
+'''
+Tests the headless arena
+'''
+
+def first_column(board: np.ndarray, player: cm.BoardPiece, saved_state: Optional[cm.SavedState]):
+    '''
+    Plays column 0 until it is full, then an illegal move
+    '''
+    return cm.PlayerAction(0), saved_state
+
+
+class testArena(unittest.TestCase):
+
+    def test_results(self, numGames: int = 6):
+
+        stats = run_arena(random_move, random_move, numGames, seed=3)
+        self.assertEqual(stats.wins + stats.draws + stats.losses, numGames)
+        self.assertEqual(len(stats.games), numGames)
+        self.assertEqual(stats.illegal, 0)
+        self.assertGreater(stats.games_per_second(), 0)
+
+        #One time per move, nodes are not reported by the random agent:
+        for game in stats.games:
+            self.assertEqual(len(game['times'][1]) + len(game['times'][2]), len(game['moves']))
+        self.assertIsNone(stats.nodes_per_second(1))
+        latency = stats.latency_percentiles(1)
+        self.assertTrue(latency[50] <= latency[90] <= latency[99])
+
+        #The games are reproducible, also in worker processes:
+        again = run_arena(random_move, random_move, numGames, seed=3)
+        self.assertEqual([game['moves'] for game in stats.games], [game['moves'] for game in again.games])
+        pooled = run_arena(random_move, random_move, numGames, workers=2, seed=3)
+        self.assertEqual([game['moves'] for game in stats.games], [game['moves'] for game in pooled.games])
+
+        other = run_arena(random_move, random_move, numGames, seed=4)
+        self.assertNotEqual([game['moves'] for game in stats.games], [game['moves'] for game in other.games])
+
+    def test_agents(self):
+
+        #An illegal move loses (agent 1 makes the seventh move):
+        result = play_game(first_column, first_column, (), (), True, 0)
+        self.assertEqual(result['moves'], [0] * 6)
+        self.assertTrue(result['illegal'])
+        self.assertEqual(result['winner'], 2)
+
+        #Minimax reports its nodes and beats the random agent:
+        stats = run_arena(minimax_move, random_move, 2, args_1=(200,))
+        self.assertEqual(stats.wins, 2)
+        self.assertGreater(stats.nodes_per_second(1), 0)
+        self.assertIn('latency_ms', stats.as_dict())
+
+        self.assertIs(get_agent('random'), random_move)
+        self.assertRaises(ValueError, get_agent, 'alphazero')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+import numpy as np
+import unittest
+import agents.common as cm
+import time
+from agents.agent_mcts.array_tree import ArrayTree, TERMINAL_WIN, generate_move_array
+from agents.agent_mcts.state import MCTSState
+
+'''
+Tests the array-backed MCTS tree
+'''
+
+class testArrayTree(unittest.TestCase):
+
+    def test_statistics(self, numIters: int = 300):
+
+        tree = ArrayTree(capacity=2**12)
+        tree.set_root(cm.initialize_game_state(), cm.PLAYER1).search(numIters)
+
+        #Every simulation passes the root and exactly one of its children:
+        moves, visits, wins = tree.root_stats()
+        self.assertEqual(tree.visits[0], numIters)
+        self.assertEqual(visits.sum(), numIters)
+        self.assertEqual(list(moves), list(range(7)))
+        self.assertTrue(np.all(wins <= visits))
+
+        #Parent and child indices are consistent, and a node was simulated once
+        #itself before the simulations went on to its children:
+        for node in range(1, tree.size):
+            self.assertIn(node, tree.children(tree.parent[node]))
+            if tree.numChildren[node] > 0:
+                self.assertEqual(tree.visits[node], tree.visits[tree.children(node)].sum() + 1)
+
+        self.assertLessEqual(ArrayTree.node_bytes(), 32)
+
+    def test_capacity(self):
+
+        tree = ArrayTree(capacity=20)
+        tree.set_root(cm.initialize_game_state(), cm.PLAYER2).search(200)
+
+        self.assertLessEqual(tree.size, 20)
+        self.assertEqual(tree.visits[0], 200)
+
+    def test_moves(self):
+
+        #Win directly:
+        board = cm.initialize_game_state()
+        board[0, 0:3] = cm.PLAYER1
+        board[1, 0:3] = cm.PLAYER2
+        move, _ = generate_move_array(board, cm.PLAYER1, None, 500)
+        self.assertEqual(move, 3)
+
+        tree = ArrayTree().set_root(board, cm.PLAYER1)
+        tree.search(10)
+        self.assertEqual(tree.terminal[tree.children(0)][3], TERMINAL_WIN)
+
+        #Block the only threat:
+        board[0, 0:3] = cm.PLAYER2
+        board[1, 0:3] = cm.PLAYER1
+        board[2, 0] = cm.PLAYER2
+        move, _ = generate_move_array(board, cm.PLAYER1, None, 2000)
+        self.assertEqual(move, 3)
+
+    def test_reuse(self, numIters: int = 500):
+
+        board = cm.initialize_game_state()
+        move, saved_state = generate_move_array(board, cm.PLAYER1, None, numIters)
+        self.assertIsInstance(saved_state, MCTSState)
+        tree = saved_state.tree
+
+        #The opponent replies with its most visited move in the tree:
+        child = tree.firstChild[0] + list(tree.move[tree.children(0)]).index(move)
+        grandchild = tree.children(child)[tree.visits[tree.children(child)].argmax()]
+        reply = tree.move[grandchild]
+        visits, wins = tree.visits[grandchild], tree.wins[grandchild]
+        replies = tree.move[tree.children(grandchild)].copy()
+        self.assertGreater(visits, 1)
+
+        cm.apply_player_action(board, move, cm.PLAYER1)
+        cm.apply_player_action(board, reply, cm.PLAYER2)
+        _, saved_state = generate_move_array(board, cm.PLAYER1, saved_state, numIters)
+
+        #The statistics carry over to the new root:
+        tree = saved_state.tree
+        self.assertTrue(np.array_equal(tree.board, board))
+        self.assertEqual(tree.player, cm.PLAYER1)
+        self.assertEqual(tree.parent[0], -1)
+        self.assertEqual(tree.visits[0], visits + numIters)
+        self.assertTrue(np.array_equal(tree.move[tree.children(0)], replies))
+        for node in range(1, tree.size):
+            self.assertIn(node, tree.children(tree.parent[node]))
+            if tree.numChildren[node] > 0:
+                self.assertEqual(tree.visits[node], tree.visits[tree.children(node)].sum() + 1)
+
+        #An unknown position starts a new tree:
+        _, saved_state = generate_move_array(cm.initialize_game_state(), cm.PLAYER2, saved_state, 50)
+        self.assertEqual(saved_state.tree.visits[0], 50)
+
+    def test_time_limit(self):
+
+        start = time.perf_counter()
+        move, saved_state = generate_move_array(cm.initialize_game_state(), cm.PLAYER1, None,
+                                                numIters=None, time_limit=100)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertGreater(saved_state.tree.visits[0], 0)
+        self.assertIn(move, range(7))
+
+        #The first budget to run out stops the search:
+        tree = ArrayTree(capacity=2**12).set_root(cm.initialize_game_state(), cm.PLAYER1)
+        self.assertEqual(tree.search(20, time_limit=10000).visits[0], 20)
+        self.assertRaises(ValueError, tree.search)
+
+    def test_leaf_parallel(self, numIters: int = 300):
+
+        tree = ArrayTree(capacity=2**12).set_root(cm.initialize_game_state(), cm.PLAYER1)
+        tree.search(numIters, batchSize=16, threads=2)
+
+        #The virtual losses are gone again:
+        self.assertEqual(tree.visits[0], numIters)
+        self.assertEqual(tree.visits[tree.children(0)].sum(), numIters)
+        for node in range(1, tree.size):
+            if tree.numChildren[node] > 0:
+                self.assertEqual(tree.visits[node], tree.visits[tree.children(node)].sum() + 1)
+            self.assertLessEqual(tree.wins[node], tree.visits[node])
+
+        #The virtual loss spreads the first batch over the children of the root:
+        tree.set_root(cm.initialize_game_state(), cm.PLAYER1).iterate_batch(7)
+        self.assertTrue(np.all(tree.visits[tree.children(0)] == 1))
+
+        board = cm.initialize_game_state()
+        board[0, 0:3] = cm.PLAYER1
+        board[1, 0:3] = cm.PLAYER2
+        move, saved_state = generate_move_array(board, cm.PLAYER1, None, 500, workers=2, parallel='leaf')
+        self.assertEqual(move, 3)
+        self.assertIsInstance(saved_state, MCTSState)
+
+    def test_root_parallel(self, numIters: int = 200):
+
+        from agents.agent_mcts.parallel import rootParallelSearch, shutdown_pool
+
+        board = cm.initialize_game_state()
+        board[0, 0:3] = cm.PLAYER1
+        board[1, 0:3] = cm.PLAYER2
+        board[:, 6] = [cm.PLAYER2, cm.PLAYER1] * 3 #column 6 is full
+
+        try:
+            moves, visits, wins = rootParallelSearch(board, cm.PLAYER1, numIters, None, 2)
+            self.assertEqual(list(moves), list(range(6)))
+            self.assertEqual(visits.sum(), 2 * numIters)
+            self.assertTrue(np.all(wins <= visits))
+
+            move, _ = generate_move_array(board, cm.PLAYER1, None, 500, workers=2, parallel='root')
+            self.assertEqual(move, 3)
+        finally:
+            shutdown_pool()
+
+        self.assertRaises(ValueError, generate_move_array, board, cm.PLAYER1, None, 10, None, 2, 'tree')
+
+
+if __name__ == '__main__':
+    unittest.main()
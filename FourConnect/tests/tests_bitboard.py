@@ -0,0 +1,118 @@
+import numpy as np
+import unittest
+import agents.common as cm
+from agents.bitboard import BitBoard, COLS, ROWS, connected_four_bitboard
+from agents.connect_four import connected_four_iter
+from errors.errors import ColumnError, BoardError
+
+'''
+Tests the BitBoard class
+'''
+
+def random_board(numMoves: int) -> np.ndarray:
+    '''
+    Plays numMoves random (legal) moves, alternating players
+    '''
+    board = cm.initialize_game_state()
+    player = cm.PLAYER1
+    for i in range(numMoves):
+        possible_moves, *_ = np.where(board[-1] == cm.noPlayer)
+        cm.apply_player_action(board, np.random.choice(possible_moves), player)
+        player = player % 2 + 1
+    return board
+
+
+class testBitBoard(unittest.TestCase):
+
+    def test_empty(self):
+
+        bitboard = BitBoard()
+        self.assertEqual(bitboard.nMoves, 0)
+        self.assertEqual(bitboard.legal_moves(), list(range(COLS)))
+        self.assertTrue(np.array_equal(bitboard.to_board(), cm.initialize_game_state()))
+
+    def test_conversion(self, numTests: int = 20):
+
+        #Use fuzzing: to_board ° from_board = id
+        for i in range(numTests):
+            board = random_board(np.random.randint(42))
+            bitboard = BitBoard.from_board(board)
+
+            self.assertEqual(bitboard.nMoves, np.count_nonzero(board))
+            self.assertEqual(bitboard.to_board().dtype, cm.BoardPiece)
+            self.assertTrue(np.array_equal(bitboard.to_board(), board))
+
+    def test_play_and_undo(self, numTests: int = 20):
+
+        for i in range(numTests):
+            board = random_board(np.random.randint(30))
+            bitboard = BitBoard.from_board(board)
+            key = bitboard.key()
+
+            for move in bitboard.legal_moves():
+                expected = cm.apply_player_action(board.copy(), move, cm.PLAYER2)
+
+                bitboard.play(move, cm.PLAYER2)
+                self.assertTrue(np.array_equal(bitboard.to_board(), expected))
+                self.assertNotEqual(bitboard.key(), key)
+
+                bitboard.undo(move)
+                self.assertTrue(np.array_equal(bitboard.to_board(), board))
+                self.assertEqual(bitboard.key(), key)
+
+    def test_legal_moves(self):
+
+        bitboard = BitBoard()
+        for row in range(ROWS):
+            bitboard.play(2, row % 2 + 1)
+
+        self.assertFalse(bitboard.can_play(2))
+        self.assertEqual(bitboard.legal_moves(), [0, 1, 3, 4, 5, 6])
+        self.assertEqual(bitboard.get_height(2), ROWS)
+
+        with self.assertRaises(ColumnError):
+            bitboard.play(2, cm.PLAYER1)
+
+        with self.assertRaises(BoardError):
+            bitboard.play(8, cm.PLAYER1)
+
+        with self.assertRaises(ColumnError):
+            bitboard.undo(0)
+
+    def test_key(self):
+
+        #Same cells, different owners -> different keys:
+        board1, board2 = cm.initialize_game_state(), cm.initialize_game_state()
+        board1[0, 0], board1[0, 1] = cm.PLAYER1, cm.PLAYER2
+        board2[0, 0], board2[0, 1] = cm.PLAYER2, cm.PLAYER1
+
+        self.assertNotEqual(BitBoard.from_board(board1).key(), BitBoard.from_board(board2).key())
+
+    def test_connected_four_equivalence(self, numTests: int = 2000):
+
+        players = [cm.PLAYER1, cm.PLAYER2, cm.noPlayer]
+
+        #Use fuzzing: compare against the window scan on many random boards,
+        #transposed boards check that other shapes are handled as well
+        for i in range(numTests):
+            board = np.random.choice(players, (6, 7), p=[.35, .35, .3])
+            board = board.T.copy() if i % 4 == 0 else board
+
+            for player in players[:2]:
+                self.assertEqual(connected_four_bitboard(board, player),
+                                 connected_four_iter(board, player), msg=str(board))
+                self.assertEqual(cm.connected_four(board, player),
+                                 connected_four_iter(board, player))
+
+    def test_connected_four_played(self, numTests: int = 200):
+
+        for i in range(numTests):
+            board = random_board(np.random.randint(43))
+            bitboard = BitBoard.from_board(board)
+
+            for player in [cm.PLAYER1, cm.PLAYER2]:
+                self.assertEqual(bitboard.connected_four(player), connected_four_iter(board, player))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import os
+import tempfile
+import numpy as np
+import unittest
+import agents.common as cm
+from agents.bitboard import BitBoard, mirror_mask
+from agents.book import OpeningBook, generate_book, write_book, canonical_key, load_book
+from agents.agent_solver.solver import Solver, position_key
+from errors.errors import BookError
+
+'''
+Tests building and reading opening books
+'''
+
+class testBook(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'book.bin')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_mirror(self):
+
+        board = cm.initialize_game_state()
+        board[0, 0:2] = cm.PLAYER1
+        board[0, 6] = cm.PLAYER2
+        mirrored = board[:, ::-1].copy()
+
+        key = position_key(BitBoard.from_board(board), cm.PLAYER2)
+        self.assertEqual(mirror_mask(key), position_key(BitBoard.from_board(mirrored), cm.PLAYER2))
+        self.assertEqual(mirror_mask(mirror_mask(key)), key)
+        self.assertEqual(canonical_key(key)[0], canonical_key(mirror_mask(key))[0])
+
+    def test_roundtrip(self):
+
+        entries = generate_book(2, depth=2)
+        self.assertEqual(len(entries), 1 + 4 + 25) #positions up to symmetry
+        write_book(self.path, entries, 2, heuristic='kernel')
+
+        book = OpeningBook(self.path)
+        self.assertEqual(len(book), len(entries))
+        self.assertFalse(book.exact)
+        self.assertEqual(book.heuristic, 'kernel')
+        self.assertTrue(np.all(np.diff(book.keys.astype(np.float64)) > 0))
+
+        #Every position up to ply 2, in both orientations:
+        board = cm.initialize_game_state()
+        move, _ = book.probe(board, cm.PLAYER1)
+        self.assertEqual(move, 3)
+
+        for first in range(7):
+            for second in range(7):
+                board = cm.initialize_game_state()
+                cm.apply_player_action(board, first, cm.PLAYER1)
+                cm.apply_player_action(board, second, cm.PLAYER2)
+                move, score = book.probe(board, cm.PLAYER1)
+                mirrored, mirroredScore = book.probe(board[:, ::-1].copy(), cm.PLAYER1)
+
+                self.assertEqual(move, 6 - mirrored)
+                self.assertEqual(score, mirroredScore)
+
+        cm.apply_player_action(board, 0, cm.PLAYER1)
+        self.assertIsNone(book.probe(board, cm.PLAYER2)) #deeper than the book
+        self.assertIsNone(book.get(position_key(BitBoard(), cm.PLAYER1))) #not exact
+
+    def test_solver_book(self):
+
+        #An exact book is used by the solver:
+        key = position_key(BitBoard(), cm.PLAYER1)
+        write_book(self.path, {key: (3, 1.)}, 0, exact=True)
+        book = OpeningBook(self.path)
+
+        self.assertEqual(book.get(key), 1)
+        self.assertIsNone(book.heuristic)
+        self.assertEqual(Solver(book=book).negamax(0, 0, 0, -1, 1), 1)
+
+        #The solver agent plays from the book (the position is its own mirror image):
+        import agents.agent_solver.solver as solver
+        board = cm.initialize_game_state()
+        cm.apply_player_action(board, 3, cm.PLAYER1)
+        key = position_key(BitBoard.from_board(board), cm.PLAYER2)
+        write_book(self.path, {key: (2, 0.)}, 1, exact=True)
+
+        book = OpeningBook(self.path)
+        agentSolver, solver.solver = solver.solver, Solver(book=book, bookDepth=book.ply)
+        try:
+            self.assertEqual(solver.generate_move_solver(board, cm.PLAYER2, None)[0], 2)
+        finally:
+            solver.solver = agentSolver
+
+    def test_invalid(self):
+
+        with open(self.path, 'wb') as file:
+            file.write(b'not a book')
+
+        with self.assertRaises(BookError):
+            OpeningBook(self.path)
+
+        self.assertIsNone(load_book(self.path + '.missing'))
+
+
+if __name__ == '__main__':
+    unittest.main()
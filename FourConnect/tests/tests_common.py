@@ -81,6 +81,48 @@ class testCommon(unittest.TestCase):
 
         self.assertEqual(check_end_state(board2, PLAYER2), GameState.IS_WIN)
 
+    def testCheckEndStateLastAction(self, numTests: int = 50):
+
+        from agents.common import check_end_state, apply_player_action
+
+        #Use fuzzing: the last_action fast path has to agree with the full scan
+        #after every move of random games
+        for i in range(numTests):
+            board = initialize_game_state()
+            current, end_state = player, GameState.STILL_PLAYING
+
+            while end_state == GameState.STILL_PLAYING:
+                move = np.random.choice(np.where(board[-1] == noPlayer)[0])
+                apply_player_action(board, move, current)
+
+                for checked in [player, PLAYER2]:
+                    end_state = check_end_state(board, checked, move)
+                    self.assertEqual(end_state, check_end_state(board, checked))
+
+                current = current % 2 + 1
+
+    def testConnectedFourLastAction(self):
+
+        from agents.common import connected_four
+
+        board = initialize_game_state()
+        board[0, 0:4] = player
+        board[1, 2] = PLAYER2
+
+        self.assertTrue(connected_four(board, player, 1))
+        self.assertTrue(connected_four(board, player, 3))
+        self.assertFalse(connected_four(board, player, 2)) #topmost piece of column 2 is PLAYER2
+        self.assertFalse(connected_four(board, PLAYER2, 2))
+        self.assertFalse(connected_four(board, player, 5)) #empty column
+
+        #Diagonal through a piece in the middle of the line:
+        board2 = initialize_game_state()
+        board2[:4, :4] = np.eye(4)*PLAYER2
+        board2[0, 1:4], board2[1, 2:4], board2[2, 3] = player, player, player
+
+        self.assertTrue(connected_four(board2, PLAYER2, 2))
+        self.assertFalse(connected_four(board2, player, 2))
+
     def testConnectedFour(self):
 
         from agents.common import connected_four
@@ -170,12 +212,52 @@ class testCommon(unittest.TestCase):
 
     def testStringtoBoard(self):
 
-        from agents.common import string_to_board, pretty_print_board
+        from agents.common import string_to_board, pretty_print_board, render_board
 
         #It's enough to check that string_to_board ° pretty_print = id:
         board = np.random.choice([player, PLAYER2], ((6,7)))
         self.assertTrue(np.array_equal(board, string_to_board(pretty_print_board(board))))
 
+        #Malformed strings:
+        rendered = render_board(board)
+        self.assertRaises(BoardError, string_to_board, rendered.replace('X', '', 1).replace('O', '', 1))
+
+    def testRenderBoard(self):
+
+        from agents.common import render_board, pretty_print_board
+        import io, contextlib
+
+        #Rendering does not print, pretty_print_board prints the rendered board:
+        board = np.random.choice([noPlayer, player, PLAYER2], (6, 7))
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            rendered = render_board(board)
+        self.assertEqual(output.getvalue(), '')
+
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(pretty_print_board(board), rendered)
+        self.assertEqual(output.getvalue(), rendered + '\n')
+
+    def testMoveNotation(self):
+
+        from agents.common import moves_to_string, string_to_moves, moves_to_board
+
+        moves = [3, 3, 2, 4, 6, 0]
+        self.assertEqual(moves_to_string(moves), '332460')
+        self.assertEqual(moves_to_string([]), '')
+        self.assertTrue(np.array_equal(string_to_moves('332460'), moves))
+        self.assertRaises(ColumnError, string_to_moves, '3378')
+        self.assertRaises(ColumnError, string_to_moves, '33a')
+
+        board = moves_to_board('332460')
+        self.assertTrue(np.array_equal(board, moves_to_board(moves)))
+        self.assertEqual(board[0, 3], player)
+        self.assertEqual(board[1, 3], PLAYER2)
+        self.assertEqual(board[0, 0], PLAYER2)
+        self.assertEqual(np.count_nonzero(board), 6)
+
+        self.assertRaises(ColumnError, moves_to_board, '0' * 7)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,62 @@
+import numpy as np
+import unittest
+import agents.common as cm
+from agents.hashing import zobr_myhash_init, zobr_myhash, hash_board, hash_move
+
+'''
+Tests the Zobrist hashing functions
+'''
+
+class testHashing(unittest.TestCase):
+
+    def test_init(self):
+
+        board = cm.initialize_game_state()
+        htable = zobr_myhash_init(board)
+
+        self.assertEqual(htable.dtype, np.uint64)
+        self.assertEqual(htable.shape, (6, 7, 2))
+        self.assertTrue(np.array_equal(htable, zobr_myhash_init(board))) #deterministic
+        self.assertFalse(np.array_equal(htable, zobr_myhash_init(board, seed=1)))
+        self.assertEqual(len(np.unique(htable)), htable.size)
+
+    def test_side_to_move(self):
+
+        board = cm.initialize_game_state()
+        self.assertEqual(hash_board(board), 0)
+        self.assertEqual(hash_board(board, player=cm.PLAYER1), 0)
+        self.assertNotEqual(hash_board(board, player=cm.PLAYER2), 0)
+
+    def test_incremental(self, numTests: int = 20):
+
+        #Use fuzzing: the incremental hash has to match the hash computed from scratch
+        for i in range(numTests):
+            board = cm.initialize_game_state()
+            heights = cm.column_heights(board)
+            player = cm.PLAYER1
+            key, keys, moves = hash_board(board, player=player), [], []
+
+            for ply in range(np.random.randint(1, 42)):
+                move = np.random.choice([m for m in range(7) if heights[m] < 6])
+                row = cm.make_move(board, heights, move, player)
+                keys.append(key)
+                moves.append(move)
+                key = hash_move(key, row, move, player)
+                player = player % 2 + 1
+
+                self.assertEqual(key, hash_board(board, player=player))
+                self.assertEqual(key, hash_board(board, zobr_myhash, player))
+
+            #undo path: the same XOR restores the previous keys
+            while moves:
+                move = moves.pop()
+                player = player % 2 + 1
+                row = cm.unmake_move(board, heights, move)
+                key = hash_move(key, row, move, player)
+                self.assertEqual(key, keys.pop())
+
+            self.assertEqual(key, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
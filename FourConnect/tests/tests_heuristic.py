@@ -0,0 +1,112 @@
+import numpy as np
+import unittest
+import agents.common as cm
+from agents.heuristic import evaluateGame, evaluateGames
+from agents.heuristic import LINES, evaluateThreats, evaluateThreatsBatch, ThreatCounter
+
+'''
+Tests the heuristics used to evaluate boards
+'''
+
+players = [cm.PLAYER1, cm.PLAYER2, cm.noPlayer]
+
+
+def kernel_heuristic(board: np.ndarray, player: cm.BoardPiece) -> float:
+    '''
+    The original single-board kernel evaluation, as a reference for evaluateGames
+    '''
+    colKernel = np.array([1, 2, 6, 12, 6, 2, 1])
+    opponent = player % 2 + 1
+    colValue = (np.where(board==player, 1, 0)*colKernel).sum() - (np.where(board==opponent, 1, 0)*colKernel).sum()
+
+    return .7*colValue + .3*colValue
+
+
+class testHeuristic(unittest.TestCase):
+
+    def test_evaluateGame(self):
+
+        board = cm.initialize_game_state()
+        self.assertEqual(evaluateGame(board, cm.PLAYER1, None), 0)
+
+        board[0, 3] = cm.PLAYER1 #center column is worth most
+        self.assertAlmostEqual(evaluateGame(board, cm.PLAYER1, 3), 12)
+        self.assertAlmostEqual(evaluateGame(board, cm.PLAYER2, 3), -12)
+
+        board[0, 0] = cm.PLAYER2
+        self.assertAlmostEqual(evaluateGame(board, cm.PLAYER1, 0), 11)
+
+    def test_evaluateGames(self, numBoards: int = 100):
+
+        #Use fuzzing: the batch has to agree with the original kernel evaluation
+        boards = np.random.choice(players, (numBoards, 6, 7))
+        boardPlayers = np.random.choice(players[:2], numBoards)
+        scores = evaluateGames(boards, boardPlayers)
+
+        self.assertEqual(scores.shape, (numBoards,))
+        for board, player, score in zip(boards, boardPlayers, scores):
+            self.assertAlmostEqual(score, kernel_heuristic(board, player))
+            self.assertEqual(score, evaluateGame(board, player, None))
+
+        #A single player for the whole batch:
+        self.assertTrue(np.array_equal(evaluateGames(boards, cm.PLAYER2),
+                                       evaluateGames(boards, np.full(numBoards, cm.PLAYER2))))
+
+    def test_lines(self):
+
+        self.assertEqual(LINES.shape, (69, 4))
+        self.assertEqual(len(np.unique(np.sort(LINES, axis=1), axis=0)), 69)
+
+    def test_evaluateThreats(self):
+
+        board = cm.initialize_game_state()
+        self.assertEqual(evaluateThreats(board, cm.PLAYER1, None), 0)
+
+        board[0, 0:2] = cm.PLAYER1 #one open two: the horizontal line from (0,0)
+        self.assertEqual(evaluateThreats(board, cm.PLAYER1, 1), 1)
+        self.assertEqual(evaluateThreats(board, cm.PLAYER2, 1), -1)
+
+        board[0, 2] = cm.PLAYER1 #an open three (0,0)-(0,3) and an open two (0,1)-(0,4)
+        self.assertEqual(evaluateThreats(board, cm.PLAYER1, 2), 4 + 1)
+
+        board[0, 3] = cm.PLAYER2 #blocks the three
+        self.assertEqual(evaluateThreats(board, cm.PLAYER1, 3), 0)
+
+    def test_threatCounter(self, numTests: int = 20):
+
+        #Use fuzzing: the incremental counts have to match the full evaluation
+        for i in range(numTests):
+            board = cm.initialize_game_state()
+            heights = cm.column_heights(board)
+            counter = ThreatCounter(board)
+            player, moves = cm.PLAYER1, []
+
+            for ply in range(np.random.randint(1, 42)):
+                move = np.random.choice([m for m in range(7) if heights[m] < 6])
+                counter.place(cm.make_move(board, heights, move, player), move, player)
+                moves.append((move, player))
+                player = player % 2 + 1
+
+                for checked in players[:2]:
+                    self.assertEqual(counter.score(checked), evaluateThreats(board, checked, move))
+
+            self.assertEqual(ThreatCounter(board).total, counter.total)
+
+            while moves:
+                move, player = moves.pop()
+                counter.remove(cm.unmake_move(board, heights, move), move, player)
+
+            self.assertEqual(counter.total, 0)
+
+    def test_evaluateThreatsBatch(self, numBoards: int = 50):
+
+        boards = np.random.choice(players, (numBoards, 6, 7))
+        boardPlayers = np.random.choice(players[:2], numBoards)
+        scores = evaluateThreatsBatch(boards, boardPlayers)
+
+        for board, player, score in zip(boards, boardPlayers, scores):
+            self.assertEqual(score, evaluateThreats(board, player, None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import io
+import json
+import logging
+import contextlib
+import numpy as np
+import unittest
+import agents.common as cm
+from agents.agent_random import generate_move as random_move
+from main import human_vs_agent, null_sink, ConsoleSink, LoggingSink, JsonLinesSink
+
+'''
+Tests the game loop and the event sinks
+'''
+
+class testMain(unittest.TestCase):
+
+    def test_silent_games(self):
+
+        buffer = io.StringIO()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            human_vs_agent(random_move, random_move, sink=JsonLinesSink(buffer))
+            human_vs_agent(random_move, random_move, sink=null_sink)
+        self.assertEqual(output.getvalue(), '')
+
+        #Two games, one event before and one after every move:
+        events = [json.loads(line) for line in buffer.getvalue().splitlines()]
+        names = [event['event'] for event in events]
+        self.assertEqual(names.count('game_end'), 2)
+        self.assertEqual(names.count('turn'), names.count('move'))
+        self.assertEqual(names[0], 'turn')
+
+        for event in events:
+            if event['event'] == 'game_end':
+                board = np.array(event['board'])
+                self.assertEqual(board.shape, (6, 7))
+                if event['winner'] != cm.noPlayer:
+                    self.assertTrue(cm.connected_four(board.astype(cm.BoardPiece), event['winner']))
+
+        #The sink is only installed during the games:
+        self.assertIsNone(cm.eventSink)
+
+    def test_sinks(self):
+
+        output = io.StringIO()
+        human_vs_agent(random_move, random_move, sink=ConsoleSink(output))
+        self.assertIn('Player 1 you are playing with X', output.getvalue())
+        self.assertIn('Move time:', output.getvalue())
+
+        logger = logging.getLogger('tests_main')
+        with self.assertLogs(logger, level='INFO') as logs:
+            sink = LoggingSink(logger)
+            sink('iteration', {'depth': 4, 'timed_out': False})
+            sink('turn', {'board': cm.initialize_game_state(), 'player': cm.PLAYER1})
+        self.assertIn('iteration {"depth": 4, "timed_out": false}', logs.output[0])
+
+    def test_agent_events(self):
+
+        from agents.agent_mcts.mcts import generate_move as mcts_move
+        from agents.agent_minimax import minimax
+
+        events = []
+        previous = cm.set_event_sink(lambda event, fields: events.append((event, fields)))
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                mcts_move(cm.initialize_game_state(), cm.PLAYER1, None, 5)
+                minimax.iterativeDeepingSearch(cm.initialize_game_state(), cm.PLAYER1, maxDepth=2)
+        finally:
+            cm.set_event_sink(previous)
+
+        self.assertEqual(output.getvalue(), '')
+        self.assertEqual([event for event, _ in events], ['mcts_root', 'mcts_search', 'iteration'])
+        self.assertEqual(events[1][1]['iterations'], 5)
+        self.assertEqual(events[2][1]['depth'], 2)
+
+        #Without a sink nothing happens:
+        cm.emit('iteration', depth=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
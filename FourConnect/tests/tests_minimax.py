@@ -73,6 +73,259 @@ class testMiniMax(unittest.TestCase):
         self.assertListEqual(iterativeDeepingSearch(board2, player)[1][0], [2,6]) #check moves
 
 
+    def test_transposition_table(self):
+
+        import agents.agent_minimax.minimax as minimax
+
+        #A search with a filled transposition table must give the same score:
+        boardTemp = board.copy()
+        boardTemp[0, 2:5] = [player, PLAYER2, player]
+        boardTemp[1, 3] = PLAYER2
+
+        minimax.transpoTable.clear()
+        cold = minimax.alphaBeta(boardTemp, player, MAX_DEPTH-4, 3)
+        self.assertTrue(np.array_equal(boardTemp[:2, 2:5], [[player, PLAYER2, player], [0, PLAYER2, 0]]))
+        warm = minimax.alphaBeta(boardTemp, player, MAX_DEPTH-4, 3)
+        self.assertEqual(cold, warm)
+        self.assertIsNotNone(minimax.transpoTable.probe(minimax.hash_board(boardTemp, player=player)))
+
+    def test_move_ordering(self):
+
+        import agents.agent_minimax.minimax as minimax
+
+        minimax.clear_ordering()
+        heights = [0, 0, 0, 6, 0, 0, 0]
+        self.assertEqual(minimax.orderMoves(heights, 6, 2, player, minimax.NO_MOVE), [2, 4, 1, 5, 0, 6])
+
+        #hash move, then killers, then history:
+        minimax.rootDepth = 4
+        minimax.storeCutoff(0, 2, player)
+        minimax.storeCutoff(6, 3, player)
+        self.assertEqual(minimax.orderMoves(heights, 6, 2, player, 5), [5, 0, 6, 2, 4, 1])
+        #the history is per player:
+        self.assertEqual(minimax.orderMoves(heights, 6, 1, PLAYER2, minimax.NO_MOVE), [2, 4, 1, 5, 0, 6])
+
+        #killers are per ply: in the next iteration, ply 2 is one depth higher
+        minimax.rootDepth = 5
+        self.assertEqual(minimax.orderMoves(heights, 6, 3, player, minimax.NO_MOVE), [0, 6, 2, 4, 1, 5])
+        self.assertEqual(minimax.orderMoves(heights, 6, 2, player, minimax.NO_MOVE), [6, 0, 2, 4, 1, 5])
+
+        #PVS must not change the score:
+        boardTemp = board.copy()
+        boardTemp[0, 2:5] = [player, PLAYER2, player]
+        boardTemp[1, 3] = PLAYER2
+        scores = []
+        try:
+            for pvs in (False, True):
+                minimax.pvs = pvs
+                minimax.transpoTable.clear()
+                scores.append(minimax.alphaBeta(boardTemp, player, MAX_DEPTH-1, 3))
+        finally:
+            minimax.pvs = True
+        self.assertEqual(scores[0], scores[1])
+
+    def test_stats(self):
+
+        import agents.agent_minimax.minimax as minimax
+
+        boardTemp = board.copy()
+        boardTemp[0, 2:5] = [player, PLAYER2, player]
+        boardTemp[1, 3] = PLAYER2
+
+        collected = []
+        minimax.transpoTable.clear()
+        openingBook, minimax.openingBook = minimax.openingBook, None #search the position
+        try:
+            minimax.generate_move_alphaBeta(boardTemp, player, None, stats_callback=collected.append)
+        finally:
+            minimax.openingBook = openingBook
+        stats, = collected
+
+        self.assertIsNone(minimax.stats)
+        self.assertEqual(stats.depths, list(range(1, MAX_DEPTH + 1)))
+        self.assertTrue(all(stats.completed))
+        self.assertTrue(all(nodes > 0 for nodes in stats.nodes))
+        self.assertEqual(len(stats.branching_factors()), MAX_DEPTH - 1)
+        self.assertGreater(stats.ebf(), 1)
+        self.assertLessEqual(stats.firstCutoffs, stats.cutoffs)
+        self.assertLessEqual(stats.ttHits, stats.ttProbes)
+        self.assertGreater(stats.ttStores, 0)
+        self.assertEqual(stats.as_dict()['nodes'], stats.nodes)
+
+        #Counters of another process: nodes per depth, deeper iterations are inserted
+        from agents.agent_minimax.stats import SearchStats
+        other = SearchStats()
+        for depth in (2, MAX_DEPTH + 1):
+            other.start_iteration(depth)
+            other.nodes[-1] = 10
+            other.end_iteration(1.)
+        other.cutoffs = 3
+        merged = SearchStats().merge(stats).merge(other)
+        self.assertEqual(merged.depths, list(range(1, MAX_DEPTH + 2)))
+        self.assertEqual(merged.nodes[1], stats.nodes[1] + 10)
+        self.assertEqual(merged.times[:MAX_DEPTH], stats.times)
+        self.assertEqual(merged.total_nodes(), stats.total_nodes() + 20)
+        self.assertEqual(merged.cutoffs, stats.cutoffs + 3)
+
+    def test_time_limit(self):
+
+        import time
+        import agents.agent_minimax.minimax as minimax
+
+        boardTemp = board.copy()
+        boardTemp[0, 2:5] = [player, PLAYER2, player]
+        boardTemp[1, 3] = PLAYER2
+        minimax.generate_move_alphaBeta(boardTemp, player, None) #warm-up (numba compilation)
+        minimax.transpoTable.clear()
+
+        openingBook, minimax.openingBook = minimax.openingBook, None #search the position
+        try:
+            t0 = time.perf_counter()
+            move, _ = minimax.generate_move_alphaBeta(boardTemp, player, None, 300)
+            elapsed = time.perf_counter() - t0
+        finally:
+            minimax.openingBook = openingBook
+
+        self.assertIn(move, range(7))
+        self.assertTrue(minimax.timeOut) #cannot reach the end of the game within 300ms
+        self.assertLess(elapsed, 1.)
+        self.assertTrue(np.array_equal(boardTemp[:2, 2:5], [[player, PLAYER2, player], [0, PLAYER2, 0]]))
+
+        #Immediate wins are found at depth 1, even without any time left:
+        boardTemp[0:3, 0] = PLAYER2
+        move, _ = minimax.generate_move_alphaBeta(boardTemp, PLAYER2, None, 0)
+        self.assertEqual(move, 0)
+
+    def test_opening_book(self):
+
+        import agents.agent_minimax.minimax as minimax
+
+        self.assertIsNotNone(minimax.openingBook) #agents/opening_book.bin
+
+        collected = []
+        move, _ = minimax.generate_move_alphaBeta(board, player, None, stats_callback=collected.append)
+        self.assertEqual(move, minimax.openingBook.probe(board, player)[0])
+        self.assertEqual(collected[0].total_nodes(), 0) #no search
+
+        #The book holds kernel scores: other heuristics search, invalid arguments are caught
+        self.assertEqual(minimax.openingBook.heuristic, 'kernel')
+        minimax.generate_move_alphaBeta(board, player, None, heuristic='threat', stats_callback=collected.append)
+        self.assertGreater(collected[1].total_nodes(), 0)
+        with self.assertRaises(ValueError):
+            minimax.generate_move_alphaBeta(board, player, None, parallel='bogus')
+
+    def test_heuristic(self):
+
+        import agents.agent_minimax.minimax as minimax
+
+        boardTemp = board.copy()
+        boardTemp[0, 1:4] = player
+        boardTemp[1, 1:4] = PLAYER2
+
+        for heuristic in minimax.HEURISTICS:
+            move, _ = minimax.generate_move_alphaBeta(boardTemp, player, None, heuristic=heuristic)
+            self.assertIn(move, [0, 4]) #completes the row
+            self.assertIsNone(minimax.threats)
+
+        with self.assertRaises(ValueError):
+            minimax.generate_move_alphaBeta(boardTemp, player, None, heuristic='unknown')
+
+    def test_parallel(self):
+
+        import agents.agent_minimax.minimax as minimax
+        from agents.agent_minimax.parallel import shutdown_pool
+
+        boardTemp = board.copy()
+        boardTemp[0, 2:5] = [player, PLAYER2, player]
+        boardTemp[1, 3] = PLAYER2
+
+        try:
+            for heuristic in minimax.HEURISTICS:
+                sequential = minimax.iterativeDeepingSearch(boardTemp, player, heuristic_name=heuristic)
+                parallel = minimax.iterativeDeepingSearch(boardTemp, player, heuristic_name=heuristic, workers=2)
+                self.assertEqual(sequential, parallel)
+
+            #with a time limit:
+            move, _ = minimax.generate_move_alphaBeta(boardTemp, player, None, 300, workers=2)
+            self.assertIn(move, range(7))
+
+            #The nodes of the workers are counted:
+            collected = []
+            openingBook, minimax.openingBook = minimax.openingBook, None
+            try:
+                for parallel in ('root', 'smp'):
+                    minimax.generate_move_alphaBeta(boardTemp, player, None, workers=2, parallel=parallel,
+                                                    stats_callback=collected.append)
+            finally:
+                minimax.openingBook = openingBook
+
+            rootStats, smpStats = collected
+            self.assertEqual(rootStats.depths, list(range(1, MAX_DEPTH + 1)))
+            self.assertTrue(all(nodes > 0 for nodes in rootStats.nodes))
+            self.assertGreater(rootStats.ttProbes, 0)
+            self.assertGreater(rootStats.ebf(), 1)
+            self.assertGreater(smpStats.total_nodes(), 0)
+            self.assertIsNone(minimax.stats)
+
+        finally:
+            shutdown_pool()
+
+    def test_lazy_smp(self):
+
+        import agents.agent_minimax.minimax as minimax
+        import agents.agent_minimax.parallel as parallel
+        from agents.agent_minimax.parallel import lazySMPSearch, shutdown_pool
+
+        boardTemp = board.copy()
+        boardTemp[0:3, 0] = player
+        boardTemp[0:2, 1] = PLAYER2
+
+        #Helpers skip depths by their own pattern, depth 1 is always searched:
+        from agents.agent_minimax.stats import SearchStats
+        self.assertEqual(len(set(zip(parallel.SKIP_SIZE, parallel.SKIP_PHASE))), len(parallel.SKIP_SIZE))
+        for skip, depths in (((1, 0), [1, 2, 4, 6]), ((1, 1), [1, 3, 5]), ((2, 1), [1, 3, 4])):
+            minimax.stats = SearchStats()
+            try:
+                minimax.iterativeDeepingSearch(board, player, maxDepth=6, skip=skip)
+                self.assertEqual(minimax.stats.depths, depths)
+                self.assertEqual(minimax.completedDepth, depths[-1])
+            finally:
+                minimax.stats = None
+
+        size = minimax.transpo_size
+        try:
+            minimax.set_heuristic('threat')
+            #The winning move is found by every search:
+            scores, moves = lazySMPSearch(boardTemp, player, None, 4, 'kernel', 3)
+            self.assertEqual(moves[0], [0])
+
+            #The shared table must not leak into the private one:
+            self.assertIsNone(minimax.stopFlag)
+            self.assertEqual(minimax.heuristic, 'threat') #the private table was not touched
+            self.assertIs(minimax.evaluate, minimax.HEURISTICS['threat'])
+
+            #A bigger table replaces the shared memory, the old mapping is closed:
+            name = parallel.shared.name
+            minimax.transpo_size = 2 * size
+            lazySMPSearch(boardTemp, player, None, 2, 'kernel', 2)
+            self.assertNotEqual(parallel.shared.name, name)
+            self.assertEqual(list(parallel.attached), [parallel.shared.name])
+            minimax.transpo_size = size
+
+            minimax.set_heuristic('kernel')
+            self.assertEqual(minimax.iterativeDeepingSearch(boardTemp, player, maxDepth=4), (scores, moves))
+
+            move, _ = minimax.generate_move_alphaBeta(boardTemp, player, None, 300, workers=2, parallel='smp')
+            self.assertEqual(move, 0)
+
+            with self.assertRaises(ValueError):
+                minimax.generate_move_alphaBeta(boardTemp, player, None, 300, workers=2, parallel='gpu')
+
+        finally:
+            minimax.transpo_size = size
+            shutdown_pool()
+        self.assertEqual(parallel.attached, {})
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -34,6 +34,7 @@ class testNode(unittest.TestCase):
         root = Node.make_root(root_state)
         self.assertIsNone(root.parent)
         self.assertTrue(root==root.last_node)
+        self.assertIsInstance(root.last_node, Node)
         self.assertEqual(root.node_won, 0)
 
     def test_leaf(self, numTests: int = 8):
@@ -111,6 +112,60 @@ class testNode(unittest.TestCase):
             #self.assertTrue(np.array([tree.node_reached > child.node_reached for child in tree.children]).all())
             self.assertTrue(tree.node_won <= numIters)
 
+    def test_mcts_tree(self, numIters: int = 200):
+
+        from agents.agent_mcts.node import Node
+        from agents.agent_mcts.state import State
+
+        root = Node.make_root(State.root_state(cm.PLAYER1))
+        move, _ = root.mcts(numIters)
+
+        #The search walks the real tree and leaves the root state alone:
+        self.assertTrue(np.array_equal(root.state.board, cm.initialize_game_state()))
+        self.assertEqual(root.state.player, cm.PLAYER1)
+        self.assertGreater(root.depth(), 1)
+        self.assertEqual(sum(child.node_reached for child in root.children), numIters)
+        self.assertIn(move, range(7))
+
+        #Every child holds its own board, one piece more than its parent:
+        for child in root.children:
+            self.assertEqual(np.count_nonzero(child.state.board), 1)
+            self.assertEqual(child.state.board[0, child.move], cm.PLAYER1)
+            self.assertEqual(child.state.player, cm.PLAYER2)
+
+    def test_mcts_reuse(self, numIters: int = 100):
+
+        from agents.agent_mcts.mcts import generate_move
+        from agents.agent_mcts.state import MCTSState
+
+        board = cm.initialize_game_state()
+        move, saved_state = generate_move(board, cm.PLAYER1, None, numIters)
+        self.assertIsInstance(saved_state, MCTSState)
+        root = saved_state.tree
+
+        child = [child for child in root.children if child.move == move][0]
+        self.assertGreater(len(child.children), 0)
+        grandchild = child.children[0]
+        reached = grandchild.node_reached
+
+        cm.apply_player_action(board, move, cm.PLAYER1)
+        cm.apply_player_action(board, grandchild.move, cm.PLAYER2)
+        _, saved_state = generate_move(board, cm.PLAYER1, saved_state, numIters)
+
+        #The search went on from the grandchild:
+        self.assertIs(saved_state.tree, grandchild)
+        self.assertIsNone(grandchild.parent)
+        self.assertEqual(grandchild.node_reached, reached + numIters)
+
+        #Time budget only:
+        move, saved_state = generate_move(cm.initialize_game_state(), cm.PLAYER2, saved_state, time_limit=50)
+        self.assertIsNot(saved_state.tree, grandchild)
+        self.assertGreater(saved_state.tree.node_reached, 0)
+        self.assertIn(move, range(7))
+
+        #Parallel search needs the array engine:
+        self.assertRaises(ValueError, generate_move, cm.initialize_game_state(), cm.PLAYER1, None, 10, 'node', None, 2)
+
 
 if __name__ == '__main__':
     unittest.main()
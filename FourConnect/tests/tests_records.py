@@ -0,0 +1,119 @@
+import io
+import os
+import tempfile
+import numpy as np
+import unittest
+import agents.common as cm
+from agents.records import GameRecord, RecordWriter, read_records, pack_moves, unpack_moves, UNFINISHED
+from agents.vector_env import VectorEnv
+from errors.errors import RecordError
+
+'''
+Tests the game records
+'''
+
+def random_games(numGames: int, seed: int = 0):
+    '''
+    Plays random games to the end, returns a list of GameRecord
+    '''
+    rng = np.random.default_rng(seed)
+    games = []
+    for i in range(numGames):
+        board, moves, player = cm.initialize_game_state(), [], cm.PLAYER1
+        while True:
+            move = rng.choice(np.flatnonzero(board[-1] == cm.noPlayer))
+            cm.apply_player_action(board, move, player)
+            moves.append(move)
+            end_state = cm.check_end_state(board, player)
+            if end_state != cm.GameState.STILL_PLAYING:
+                games.append(GameRecord(moves, player if end_state == cm.GameState.IS_WIN else cm.noPlayer))
+                break
+            player = player % 2 + 1
+    return games
+
+
+class testRecords(unittest.TestCase):
+
+    def test_packing(self):
+
+        for n in (0, 1, 2, 7, 42):
+            moves = np.random.randint(0, 7, size=n)
+            self.assertEqual(len(pack_moves(moves)), (n + 1) // 2)
+            self.assertTrue(np.array_equal(unpack_moves(pack_moves(moves), n), moves))
+
+        self.assertRaises(RecordError, pack_moves, [16])
+
+    def test_round_trip(self, numGames: int = 200):
+
+        games = random_games(numGames)
+        games.append(GameRecord([], UNFINISHED))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'games.bin')
+            with RecordWriter(path) as writer:
+                for game in games:
+                    writer.write(game.moves, game.result)
+            self.assertEqual(writer.count, numGames + 1)
+
+            #A few bytes per game:
+            size = os.path.getsize(path)
+            self.assertEqual(size, 8 + sum(2 + (len(game) + 1) // 2 for game in games))
+            self.assertLess(size / len(games), 2 + 21 + 1)
+
+            #The reader is a generator:
+            records = read_records(path)
+            self.assertEqual(next(records), games[0])
+            self.assertEqual([games[0]] + list(records), games)
+
+            #A second writer appends to the file:
+            with RecordWriter(path) as writer:
+                writer.write(games[0].moves, games[0].result)
+            self.assertEqual(writer.count, 1)
+            self.assertEqual(list(read_records(path)), games + games[:1])
+
+            other = os.path.join(directory, 'other.bin')
+            with open(other, 'wb') as file:
+                file.write(b'not a record file')
+            self.assertRaises(RecordError, RecordWriter, other)
+
+        #Replay: the final board has the winner's connectN, one piece per move
+        for game in games[:50]:
+            boards = game.boards()
+            first = next(boards)
+            self.assertEqual(np.count_nonzero(first), 1)
+            self.assertEqual(first[0, game.moves[0]], cm.PLAYER1)
+
+            board = game.final_board()
+            self.assertEqual(np.count_nonzero(board), len(game))
+            if game.result != cm.noPlayer:
+                self.assertTrue(cm.connected_four(board, game.result))
+
+    def test_stream(self):
+
+        #Games from the vectorised environment, written to a buffer:
+        env = VectorEnv(1, seed=3)
+        buffer = io.BytesIO()
+        writer = RecordWriter(buffer)
+        moves = []
+        while writer.count < 5:
+            action = env.random_actions()
+            done, winners = env.step(action)
+            moves.append(int(action[0]))
+            if done[0]:
+                writer.write(moves, winners[0])
+                moves = []
+        writer.close()
+
+        buffer.seek(0)
+        records = list(read_records(buffer))
+        self.assertEqual(len(records), 5)
+
+        #Errors:
+        self.assertRaises(RecordError, list, read_records(io.BytesIO(b'not a record file')))
+        self.assertRaises(RecordError, list, read_records(io.BytesIO(b'abc'))) #shorter than the header
+        self.assertRaises(RecordError, list, read_records(io.BytesIO(buffer.getvalue()[:-1])))
+        self.assertRaises(RecordError, writer.write, [0], 7)
+
+
+if __name__ == '__main__':
+    unittest.main()
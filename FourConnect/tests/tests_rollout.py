@@ -0,0 +1,60 @@
+import numpy as np
+import unittest
+import agents.common as cm
+from agents.connect_four import connected_four_iter
+from agents.agent_mcts import rollout as ro
+
+'''
+Tests the compiled rollouts
+'''
+
+def draw_board() -> np.ndarray:
+    '''
+    A full board without connectN pieces in a row, with the top left cell free again
+    '''
+    rows, cols = np.indices((6, 7))
+    board = (1 + (cols + rows // 2) % 2).astype(cm.BoardPiece)
+    board[5, 0] = cm.noPlayer
+    return board
+
+
+class testRollout(unittest.TestCase):
+
+    def test_outcome(self):
+
+        board = draw_board()
+        self.assertFalse(connected_four_iter(board, cm.PLAYER1) or connected_four_iter(board, cm.PLAYER2))
+
+        for player in (cm.PLAYER1, cm.PLAYER2):
+            self.assertEqual(ro.rollout(board, player), cm.noPlayer)
+
+        #The board is not modified:
+        self.assertEqual(board[5, 0], cm.noPlayer)
+
+        #From the empty board, random games are won more often by the first player:
+        counts = ro.rollout_batch(cm.initialize_game_state(), cm.PLAYER1, 2000, seed=0)
+        self.assertEqual(counts.shape, (1, 3))
+        self.assertEqual(counts.sum(), 2000)
+        self.assertGreater(counts[0, cm.PLAYER1], counts[0, cm.PLAYER2])
+
+    def test_seed(self):
+
+        board = cm.initialize_game_state()
+        boards = np.stack([board, board, draw_board()])
+        players = np.array([cm.PLAYER1, cm.PLAYER2, cm.PLAYER1])
+
+        first = ro.rollout_batch(boards, players, 50, seed=42)
+        self.assertTrue(np.array_equal(first, ro.rollout_batch(boards, players, 50, seed=42)))
+        self.assertFalse(np.array_equal(first, ro.rollout_batch(boards, players, 50, seed=43)))
+        self.assertTrue(np.array_equal(first.sum(axis=1), [50, 50, 50]))
+        self.assertEqual(first[2, cm.noPlayer], 50)
+
+        #The shared generator:
+        ro.seed(7)
+        games = [ro.rollout(board, cm.PLAYER1) for i in range(20)]
+        ro.seed(7)
+        self.assertEqual(games, [ro.rollout(board, cm.PLAYER1) for i in range(20)])
+
+
+if __name__ == '__main__':
+    unittest.main()
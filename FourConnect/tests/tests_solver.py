@@ -0,0 +1,114 @@
+import numpy as np
+import unittest
+import agents.common as cm
+from agents.bitboard import BitBoard
+from agents.agent_solver.solver import Solver, CELLS, generate_move_solver, position_key
+
+'''
+Tests the perfect-play solver against a full-width search of endgames
+'''
+
+def random_position(numMoves: int, rng: np.random.Generator):
+    '''
+    Plays numMoves random moves, retrying until nobody has won yet
+    '''
+    while True:
+        position, player = BitBoard(), cm.PLAYER1
+        for i in range(numMoves):
+            position.play(rng.choice(position.legal_moves()), player)
+            if position.connected_four(player):
+                break
+            player = player % 2 + 1
+        else:
+            return position, player
+
+
+def full_width(position: BitBoard, player: cm.BoardPiece) -> int:
+    '''
+    Negamax without pruning, scored like the solver
+    '''
+    if position.nMoves == CELLS:
+        return 0
+
+    best = -CELLS
+    for action in position.legal_moves():
+        position.play(action, player)
+        if position.connected_four(player):
+            score = (CELLS + 2 - position.nMoves) // 2
+        else:
+            score = -full_width(position, player % 2 + 1)
+        position.undo(action)
+        best = max(best, score)
+
+    return best
+
+
+class testSolver(unittest.TestCase):
+
+    def test_endgames(self, numTests: int = 30):
+
+        rng = np.random.default_rng(0)
+        solver = Solver(tableSize=2**12)
+
+        for i in range(numTests):
+            position, player = random_position(36 + i % 3, rng)
+            expected = full_width(position, player)
+
+            solver.reset()
+            self.assertEqual(solver.solve(position, player), expected)
+            self.assertEqual(np.sign(solver.solve(position, player, weak=True)), np.sign(expected))
+
+    def test_generate_move(self, numTests: int = 10):
+
+        board = cm.initialize_game_state()
+        move, _ = generate_move_solver(board, cm.PLAYER1, None)
+        self.assertEqual(move, 3)
+
+        #The move has the best score (a direct win has the best score of all):
+        rng = np.random.default_rng(2)
+        for i in range(numTests):
+            position, player = random_position(37, rng)
+
+            scores = {}
+            for action in position.legal_moves():
+                position.play(action, player)
+                scores[action] = (CELLS + 2 - position.nMoves) // 2 if position.connected_four(player) \
+                                 else -full_width(position, player % 2 + 1)
+                position.undo(action)
+
+            move, _ = generate_move_solver(position.to_board(), player, None, None)
+            self.assertEqual(scores[move], max(scores.values()))
+
+    def test_time_limit(self):
+
+        import time
+
+        #Too early to solve: the minimax agent plays within the budget
+        board = cm.moves_to_board('3433424')
+        t0 = time.perf_counter()
+        move, _ = generate_move_solver(board, cm.PLAYER2, None, 300)
+        elapsed = time.perf_counter() - t0
+
+        self.assertIn(move, range(7))
+        self.assertEqual(board[-1, move], cm.noPlayer)
+        self.assertLess(elapsed, 2.)
+
+    def test_book(self):
+
+        rng = np.random.default_rng(1)
+        position, player = random_position(36, rng)
+        while Solver().solve(position, player) == (CELLS + 1 - position.nMoves) // 2: #direct win
+            position, player = random_position(36, rng)
+        current, occupied = position.get_mask(player), position.get_occupied()
+
+        #A book entry replaces the search below the position:
+        solver = Solver(book={position_key(position, player): 7})
+        self.assertEqual(solver.negamax(current, occupied, position.nMoves, -CELLS, CELLS), 7)
+
+        solver.bookDepth = position.nMoves - 1
+        self.assertEqual(solver.negamax(current, occupied, position.nMoves, -CELLS, CELLS),
+                         full_width(position, player))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import numpy as np
+import unittest
+from agents.transposition import TranspositionTable, Bound, NO_MOVE
+
+'''
+Tests the TranspositionTable class
+'''
+
+class testTranspositionTable(unittest.TestCase):
+
+    def test_size(self):
+
+        table = TranspositionTable(1000)
+        self.assertEqual(table.size, 1024) #rounded up to a power of two
+        self.assertEqual(table.table.shape, (1024, 2))
+        self.assertEqual(table.table.nbytes, TranspositionTable.nbytes(1000))
+
+    def test_store_and_probe(self):
+
+        table = TranspositionTable(64)
+        self.assertIsNone(table.probe(0)) #empty buckets are not hits
+        self.assertIsNone(table.probe(12345))
+
+        table.store(12345, 3, -7.5, Bound.LOWER, 2)
+        self.assertEqual(table.probe(12345), (-7.5, 3, Bound.LOWER, 2))
+        self.assertIsNone(table.probe(12345 + 64)) #same index, different key
+
+        #Same position searched again: replaced in place
+        table.store(12345, 1, 4., Bound.EXACT)
+        self.assertEqual(table.probe(12345), (4., 1, Bound.EXACT, NO_MOVE))
+
+    def test_replacement(self):
+
+        table = TranspositionTable(64)
+        deep, shallow, other = 5, 5 + 64, 5 + 128 #all map to the same index
+
+        table.store(deep, 6, 1., Bound.EXACT, 3)
+        table.store(shallow, 2, 2., Bound.UPPER, 4)
+
+        #shallow result goes into the always-replace bucket:
+        self.assertEqual(table.probe(deep), (1., 6, Bound.EXACT, 3))
+        self.assertEqual(table.probe(shallow), (2., 2, Bound.UPPER, 4))
+
+        table.store(other, 1, 3., Bound.LOWER, 5)
+        self.assertIsNotNone(table.probe(deep))
+        self.assertIsNone(table.probe(shallow))
+        self.assertIsNotNone(table.probe(other))
+
+        #deeper result takes over the depth-preferred bucket:
+        table.store(shallow, 7, 4., Bound.EXACT, 0)
+        self.assertIsNone(table.probe(deep))
+        self.assertEqual(table.probe(shallow), (4., 7, Bound.EXACT, 0))
+
+    def test_buffer(self):
+
+        buffer = bytearray(TranspositionTable.nbytes(16))
+        table = TranspositionTable(16, buffer).clear()
+        table.store(7, 2, 1., Bound.EXACT, 1)
+
+        #a second table on the same memory sees the entry:
+        self.assertEqual(TranspositionTable(16, buffer).probe(7), (1., 2, Bound.EXACT, 1))
+
+    def test_torn_entry(self):
+
+        table = TranspositionTable(64)
+        table.store(5, 4, 1., Bound.EXACT, 3)
+        table.store(5 + 64, 2, -9., Bound.LOWER, 6)
+        self.assertEqual(table.probe(5 + 64), (-9., 2, Bound.LOWER, 6))
+
+        #Another process wrote half of a new entry of key 5 into bucket 1: both keys miss
+        table.bits[5, 1] = table.bits[5, 0]
+        self.assertIsNone(table.probe(5 + 64))
+        table.locks[5, 1] = table.locks[5, 0]
+        self.assertIsNone(table.probe(5 + 64))
+        self.assertEqual(table.probe(5), (1., 4, Bound.EXACT, 3))
+
+        table.data[5, 1] = table.data[5, 0]
+        self.assertEqual(table.probe(5), (1., 4, Bound.EXACT, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import numpy as np
+import unittest
+import agents.common as cm
+from agents.vector_env import VectorEnv, connected_four_masks
+from agents.bitboard import board_to_mask, connected_four_mask
+from errors.errors import ColumnError
+
+'''
+Tests the vectorised environment
+'''
+
+class testVectorEnv(unittest.TestCase):
+
+    def test_step(self, numEnvs: int = 50, numSteps: int = 120):
+
+        #Every game follows apply_player_action and check_end_state:
+        env = VectorEnv(numEnvs, seed=1)
+        boards = np.stack([cm.initialize_game_state() for i in range(numEnvs)])
+
+        for step in range(numSteps):
+            players = env.players()
+            actions = env.random_actions()
+            self.assertTrue(np.all(boards[np.arange(numEnvs), -1, actions] == cm.noPlayer))
+
+            done, winners = env.step(actions)
+            for i in range(numEnvs):
+                cm.apply_player_action(boards[i], actions[i], players[i])
+                end_state = cm.check_end_state(boards[i], players[i])
+
+                self.assertEqual(done[i], end_state != cm.GameState.STILL_PLAYING)
+                self.assertEqual(winners[i], players[i] if end_state == cm.GameState.IS_WIN else cm.noPlayer)
+                if done[i]:
+                    boards[i] = cm.initialize_game_state()
+
+            self.assertTrue(np.array_equal(env.to_boards(), boards))
+
+    def test_boards(self):
+
+        env = VectorEnv(200, seed=2, autoReset=False)
+        for i in range(12):
+            env.step(env.random_actions())
+
+        boards = env.to_boards()
+        copy = VectorEnv.from_boards(boards)
+        self.assertTrue(np.array_equal(copy.masks, env.masks))
+        self.assertTrue(np.array_equal(copy.heights, env.heights))
+        self.assertTrue(np.array_equal(copy.players(), env.players()))
+
+        for board, masks in zip(boards[:20], env.masks[:20]):
+            self.assertEqual(masks[0], board_to_mask(board, cm.PLAYER1))
+            self.assertEqual(masks[1], board_to_mask(board, cm.PLAYER2))
+            self.assertTrue(np.array_equal(connected_four_masks(masks),
+                                           [connected_four_mask(int(mask)) for mask in masks]))
+
+    def test_reset_and_errors(self):
+
+        #A vertical win of PLAYER1 in game 0, game 1 plays along:
+        env = VectorEnv(2)
+        for action in (0, 1) * 3:
+            done, _ = env.step([action, 6])
+            self.assertFalse(done.any())
+        done, winners = env.step([0, 5])
+        self.assertEqual(list(done), [True, False])
+        self.assertEqual(winners[0], cm.PLAYER1)
+
+        #Game 0 starts over:
+        self.assertEqual(env.nMoves[0], 0)
+        self.assertFalse(env.to_boards()[0].any())
+        self.assertEqual(env.players()[0], cm.PLAYER1)
+        self.assertEqual(np.count_nonzero(env.to_boards()[1]), 7)
+
+        self.assertRaises(ColumnError, env.step, [0, 6])
+        self.assertGreaterEqual(env.play_random(400).sum(), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()